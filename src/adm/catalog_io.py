@@ -0,0 +1,359 @@
+"""
+Bulk import and export of the bar catalog.
+
+Includes:
+- iter_csv_records / iter_json_records: stream-parse catalog files row by row.
+- import_catalog: validate rows and write them in chunks with bulk_create and
+  bulk_update, each chunk in its own transaction, collecting per-row errors.
+  Search vectors of the written items are refreshed per chunk.
+- export_csv / export_json: generators producing the catalog chunk by chunk.
+
+Every record has a `type` (cocktail, food or water_pipe) and the columns
+listed in CATALOG_COLUMNS. Categories and ingredients are referenced by name;
+missing ones are created. Existing items are matched by type and name (by name
+and category for food and water pipes, whose names are not unique) and updated
+in place. Rows matching several existing items are reported as errors.
+"""
+
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from bar.cache import bump_catalog_version
+from bar.models import Category, Cocktail, CocktailIngredient, Food, WaterPipe
+from bar.search import refresh_search_vectors
+from bar.snapshots import rebuild_all_menu_snapshots
+
+
+CATALOG_COLUMNS = [
+    'type',
+    'name',
+    'price',
+    'description',
+    'category',
+    'base_alcohol',
+    'ingredients',
+    'flavour',
+    'tobacco',
+]
+
+CATALOG_TYPES = {
+    'cocktail': (Cocktail, ['name', 'price', 'description', 'category', 'base_alcohol']),
+    'food': (Food, ['name', 'price', 'description', 'category']),
+    'water_pipe': (WaterPipe, ['name', 'price', 'flavour', 'tobacco', 'category']),
+}
+
+INGREDIENT_SEPARATOR = ';'
+DEFAULT_CHUNK_SIZE = 500
+
+
+class ImportReport:
+    """
+    Summary of a catalog import: counts of written rows and per-row errors.
+    """
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    def __str__(self):
+        return f"Created: {self.created}, updated: {self.updated}, errors: {len(self.errors)}"
+
+
+def iter_csv_records(stream):
+    """
+    Yield catalog records from a text stream with a CSV header row.
+
+    Raises:
+        ValueError: If the stream is not valid CSV.
+    """
+    reader = csv.DictReader(stream)
+    try:
+        yield from reader
+    except csv.Error as error:
+        raise ValueError(f"Invalid CSV catalog file (line {reader.line_num}): {error}")
+
+
+def iter_json_records(stream, read_size=64 * 1024):
+    """
+    Yield catalog records from a text stream holding a JSON array of objects
+    or JSON Lines, decoding one object at a time.
+
+    Raises:
+        ValueError: If the stream is not valid JSON.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n[,]')
+        if not buffer:
+            if eof:
+                return
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError("Invalid JSON catalog file.")
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield record
+
+
+def _parse_ingredients(value):
+    """
+    Return ingredient names from a list or a separator-delimited string.
+    """
+    if isinstance(value, list):
+        names = value
+    else:
+        names = (value or '').split(INGREDIENT_SEPARATOR)
+    return [str(name).strip() for name in names if str(name).strip()]
+
+
+def _format_error(error):
+    """
+    Return a one-line description of a ValidationError, with field names if known.
+    """
+    if hasattr(error, 'error_dict'):
+        return '; '.join(f"{field}: {' '.join(messages)}" for field, messages in error.message_dict.items())
+    return ' '.join(error.messages)
+
+
+def _build_item(record):
+    """
+    Return an unsaved model instance for a record, without its category.
+
+    Raises:
+        ValidationError: If the record is invalid.
+    """
+    item_type = (record.get('type') or '').strip()
+    if item_type not in CATALOG_TYPES:
+        raise ValidationError(f"Unknown type '{item_type}'.")
+    model, fields = CATALOG_TYPES[item_type]
+
+    name = (record.get('name') or '').strip()
+    if len(name) < 3:
+        raise ValidationError("The name must have at least 3 characters.")
+    try:
+        price = Decimal(str(record.get('price', '')).strip())
+    except InvalidOperation:
+        raise ValidationError("Price must be a number.")
+    if not price.is_finite():
+        raise ValidationError("Price must be a number.")
+    if price <= 0:
+        raise ValidationError("Price must be greater than 0.")
+
+    category = (record.get('category') or '').strip()
+    if not category:
+        raise ValidationError("Category is required.")
+    names_max_length = Category._meta.get_field('name').max_length
+    if len(category) > names_max_length:
+        raise ValidationError(f"Category name must have at most {names_max_length} characters.")
+    if any(len(name) > names_max_length for name in _parse_ingredients(record.get('ingredients'))):
+        raise ValidationError(f"Ingredient names must have at most {names_max_length} characters.")
+
+    values = {'name': name, 'price': price}
+    for field in fields:
+        if field not in values and field != 'category':
+            values[field] = (record.get(field) or '').strip()
+    item = model(**values)
+    item.clean_fields(exclude=['id', 'category', 'image', 'updated_at'])
+    return item
+
+
+def _ensure_named(model, lookup, names):
+    """
+    Create missing objects of a named model and add them to the lookup map.
+    """
+    missing = {name for name in names if name and name not in lookup}
+    if missing:
+        model.objects.bulk_create([model(name=name) for name in missing], ignore_conflicts=True)
+        lookup.update(model.objects.filter(name__in=missing).in_bulk(field_name='name'))
+
+
+def _match_key(model, name, category_id):
+    """
+    Return the key matching an imported item with an existing one: its name
+    when names are unique, otherwise its name and category.
+    """
+    if model._meta.get_field('name').unique:
+        return name
+    return name, category_id
+
+
+def _write_chunk(rows, categories, ingredients, report):
+    """
+    Validate and write one chunk of (row_number, record) pairs in a transaction.
+    """
+    valid = []
+    for row_number, record in rows:
+        try:
+            valid.append((_build_item(record), record, row_number))
+        except ValidationError as error:
+            report.add_error(row_number, _format_error(error))
+
+    _ensure_named(Category, categories, {record['category'].strip() for _, record, _ in valid})
+    _ensure_named(CocktailIngredient, ingredients, {
+        name for item, record, _ in valid if isinstance(item, Cocktail)
+        for name in _parse_ingredients(record.get('ingredients'))
+    })
+
+    # Keyed like the existing items, so a key repeated within a chunk keeps its last row.
+    items = {item_type: {} for item_type in CATALOG_TYPES}
+    for item, record, row_number in valid:
+        item.category = categories[record['category'].strip()]
+        item_ingredients = []
+        if isinstance(item, Cocktail):
+            item_ingredients = [ingredients[name] for name in _parse_ingredients(record.get('ingredients'))]
+        items[record['type'].strip()][_match_key(type(item), item.name, item.category_id)] = (
+            item, item_ingredients, row_number,
+        )
+
+    now = timezone.now()
+    for item_type, keyed_items in items.items():
+        if not keyed_items:
+            continue
+        model, fields = CATALOG_TYPES[item_type]
+        existing = {}
+        names = {item.name for item, _, _ in keyed_items.values()}
+        for pk, name, category_id in model.objects.filter(name__in=names).values_list('pk', 'name', 'category_id'):
+            existing.setdefault(_match_key(model, name, category_id), []).append(pk)
+        pairs, to_create, to_update = [], [], []
+        for key, (item, item_ingredients, row_number) in keyed_items.items():
+            matches = existing.get(key, [])
+            if len(matches) > 1:
+                report.add_error(row_number, f"{len(matches)} existing items match '{item.name}'.")
+                continue
+            if matches:
+                item.pk = matches[0]
+                item.updated_at = now
+                to_update.append(item)
+            else:
+                to_create.append(item)
+            pairs.append((item, item_ingredients))
+        model.objects.bulk_create(to_create)
+        model.objects.bulk_update(to_update, fields + ['updated_at'])
+        report.created += len(to_create)
+        report.updated += len(to_update)
+
+        if model is Cocktail:
+            through = Cocktail.ingredients.through
+            through.objects.filter(cocktail_id__in=[item.pk for item in to_update]).delete()
+            through.objects.bulk_create([
+                through(cocktail_id=item.pk, cocktailingredient_id=ingredient.pk)
+                for item, item_ingredients in pairs
+                for ingredient in {ingredient.pk: ingredient for ingredient in item_ingredients}.values()
+            ])
+        refresh_search_vectors(model.objects.filter(pk__in=[item.pk for item, _ in pairs]))
+
+
+def import_catalog(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Import catalog records in chunks and return an ImportReport.
+
+    Each chunk is written in its own transaction, so a failing chunk does not
+    roll back the ones before it. Invalid rows are skipped and reported with
+    their 1-based row number. The menu snapshots are rebuilt and the catalog
+    version is bumped once at the end.
+    """
+    report = ImportReport()
+    categories = Category.objects.in_bulk(field_name='name')
+    ingredients = CocktailIngredient.objects.in_bulk(field_name='name')
+
+    rows = []
+    for row_number, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            report.add_error(row_number, "Record must be an object.")
+            continue
+        rows.append((row_number, record))
+        if len(rows) >= chunk_size:
+            with transaction.atomic():
+                _write_chunk(rows, categories, ingredients, report)
+            rows = []
+    if rows:
+        with transaction.atomic():
+            _write_chunk(rows, categories, ingredients, report)
+
+    rebuild_all_menu_snapshots()
+    transaction.on_commit(bump_catalog_version)
+    return report
+
+
+def iter_catalog_records(chunk_size=2000):
+    """
+    Yield every catalog item as a record dict, reading the tables in chunks.
+    """
+    for cocktail in Cocktail.objects.with_menu_relations().order_by('pk').iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'cocktail',
+            'name': cocktail.name,
+            'price': str(cocktail.price),
+            'description': cocktail.description,
+            'category': cocktail.category.name,
+            'base_alcohol': cocktail.base_alcohol,
+            'ingredients': [ingredient.name for ingredient in cocktail.ingredients.all()],
+        }
+    for food in Food.objects.select_related('category').order_by('pk').iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'food',
+            'name': food.name,
+            'price': str(food.price),
+            'description': food.description,
+            'category': food.category.name,
+        }
+    for pipe in WaterPipe.objects.select_related('category').order_by('pk').iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'water_pipe',
+            'name': pipe.name,
+            'price': str(pipe.price),
+            'flavour': pipe.flavour,
+            'tobacco': pipe.tobacco,
+            'category': pipe.category.name,
+        }
+
+
+class _Echo:
+    """
+    File-like object whose write() returns the written value, for csv.writer.
+    """
+    def write(self, value):
+        return value
+
+
+def export_csv():
+    """
+    Yield the catalog as CSV lines, starting with the header row.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CATALOG_COLUMNS)
+    for record in iter_catalog_records():
+        if 'ingredients' in record:
+            record['ingredients'] = INGREDIENT_SEPARATOR.join(record['ingredients'])
+        yield writer.writerow([record.get(column, '') for column in CATALOG_COLUMNS])
+
+
+def export_json():
+    """
+    Yield the catalog as a JSON array, one object per line.
+    """
+    yield '['
+    separator = '\n'
+    for record in iter_catalog_records():
+        yield separator + json.dumps(record)
+        separator = ',\n'
+    yield '\n]\n'
@@ -1,6 +1,7 @@
 from django import forms
 from django.core.exceptions import ValidationError
 
+from adm.widgets import IngredientAutocompleteWidget
 from bar.models import (
     Category,
     Cocktail,
@@ -11,7 +12,8 @@ from bar.models import (
 
 """
 Forms for creating and validating Category, CocktailIngredient, Cocktail, Food,
-and WaterPipe objects. Includes custom validation rules for names and prices.
+and WaterPipe objects. Includes custom validation rules for names and prices,
+and the upload form of the catalog import.
 """
 
 class CategoryForm(forms.ModelForm):
@@ -75,7 +77,9 @@ class CocktailForm(forms.ModelForm):
     Form for creating or updating a Cocktail.
 
     Validates that the name is at least 3 characters long and the price
-    is greater than zero. Uses custom widgets for description and ingredients.
+    is greater than zero. Uses custom widgets for description and ingredients;
+    the ingredient widget renders only the selected ingredients and finds
+    others through the ingredient search endpoint.
     """
     class Meta:
         model = Cocktail
@@ -90,7 +94,7 @@ class CocktailForm(forms.ModelForm):
         ]
         widgets = {
             'description': forms.Textarea(attrs={'rows': 2}),
-            'ingredients': forms.CheckboxSelectMultiple(),
+            'ingredients': IngredientAutocompleteWidget(),
         }
 
     def clean_name(self):
@@ -232,3 +236,29 @@ class WaterPipeForm(forms.ModelForm):
                 "Price must be greater than 0."
             )
         return price
+
+
+class CatalogImportForm(forms.Form):
+    """
+    Form for uploading a CSV or JSON catalog file.
+
+    Validates that the file has a .csv, .json or .jsonl extension.
+    """
+    file = forms.FileField()
+
+    def clean_file(self):
+        """
+        Ensure the uploaded file is a CSV or JSON catalog.
+
+        Returns:
+            UploadedFile: The uploaded file.
+
+        Raises:
+            ValidationError: If the file extension is not supported.
+        """
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith(('.csv', '.json', '.jsonl')):
+            raise ValidationError(
+                "Upload a .csv, .json or .jsonl file."
+            )
+        return file
@@ -0,0 +1,29 @@
+"""
+Management command exporting the catalog as CSV or JSON.
+
+Usage:
+    python manage.py export_catalog --format csv > menu.csv
+    python manage.py export_catalog --format json --output menu.json
+"""
+
+from django.core.management.base import BaseCommand
+
+from adm.catalog_io import export_csv, export_json
+
+
+class Command(BaseCommand):
+    help = "Export cocktails, food and water pipes as a CSV or JSON catalog file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'json'], default='csv',
+                            help="Output format.")
+        parser.add_argument('--output', help="Output file; standard output by default.")
+
+    def handle(self, *args, **options):
+        lines = export_csv() if options['format'] == 'csv' else export_json()
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as stream:
+                stream.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
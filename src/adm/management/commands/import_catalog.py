@@ -0,0 +1,36 @@
+"""
+Management command importing a CSV or JSON catalog file.
+
+Usage:
+    python manage.py import_catalog menu.csv
+    python manage.py import_catalog menu.json --chunk-size 1000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from adm.catalog_io import DEFAULT_CHUNK_SIZE, import_catalog, iter_csv_records, iter_json_records
+
+
+class Command(BaseCommand):
+    help = "Import cocktails, food and water pipes from a CSV or JSON catalog file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to the catalog file.")
+        parser.add_argument('--format', choices=['csv', 'json'],
+                            help="File format; guessed from the file extension by default.")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Number of rows written per transaction.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'json')
+        parse = iter_csv_records if file_format == 'csv' else iter_json_records
+        try:
+            with open(path, encoding='utf-8', newline='') as stream:
+                report = import_catalog(parse(stream), chunk_size=options['chunk_size'])
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        for row_number, message in report.errors:
+            self.stderr.write(f"Row {row_number}: {message}")
+        self.stdout.write(self.style.SUCCESS(str(report)))
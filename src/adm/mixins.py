@@ -0,0 +1,153 @@
+"""
+Reusable view mixins for the ADM section of the application.
+
+Includes:
+- PaginatedListMixin: page-number (`?page=`) and keyset (`?after=<name>,<pk>`)
+  pagination for the administration list views, with the item counts kept
+  in the shared catalog cache namespace (see bar.cache).
+- SearchListMixin: full-text search (`?q=`) for the cocktail, food and water
+  pipe lists.
+- CocktailImageJobMixin: queue a new or cleared cocktail image for the media
+  worker instead of uploading it during the request.
+"""
+
+from hashlib import md5
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.query import EmptyQuerySet
+from django.http import Http404
+
+from bar.cache import CATALOG_NAMESPACE
+from bar.media_jobs import enqueue_image_job
+from bar.models import Cocktail
+from bar.search import search_queryset
+from main.cache import get_or_compute, namespaced_key
+
+
+class PaginatedListMixin:
+    """
+    Paginate a ListView ordered by name and primary key.
+
+    By default the list is split into numbered pages (`?page=`). When the
+    `after` parameter is present, the next page is selected with a keyset
+    condition on (name, pk) instead of an OFFSET, so deep pages cost the
+    same as the first one. The cursor of the following page is exposed to
+    templates as `next_after`.
+    """
+    paginate_by = 50
+    keyset_param = 'after'
+
+    def get_queryset(self):
+        """
+        Return the queryset in the stable (name, pk) order used by both modes.
+        """
+        return super().get_queryset().order_by('name', 'pk')
+
+    def get_keyset_cursor(self):
+        """
+        Return the (name, pk) pair parsed from the `after` parameter, or None.
+
+        Raises:
+            Http404: If the cursor is malformed.
+        """
+        after = self.request.GET.get(self.keyset_param)
+        if after is None:
+            return None
+        name, _, pk = after.rpartition(',')
+        try:
+            return name, int(pk)
+        except ValueError:
+            raise Http404("Invalid cursor.")
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        """
+        Return a paginator whose item count is cached for the current catalog
+        version, so paging through a list costs one COUNT per catalog change.
+
+        Empty querysets (a search without matches) are counted without a query
+        and are not cached: their SQL cannot be rendered into a cache key.
+        """
+        paginator = super().get_paginator(queryset, per_page, orphans, allow_empty_first_page, **kwargs)
+        if isinstance(queryset, EmptyQuerySet):
+            return paginator
+        key = f"adm:list-count:{md5(str(queryset.query).encode()).hexdigest()}"
+        paginator.count = get_or_compute(namespaced_key(CATALOG_NAMESPACE, key), queryset.count)
+        return paginator
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Paginate by page number, or by keyset when a cursor is given.
+        """
+        cursor = self.get_keyset_cursor()
+        if cursor is None:
+            paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+            self.next_after = None
+            return paginator, page, object_list, is_paginated
+
+        name, pk = cursor
+        rows = list(queryset.filter(Q(name__gt=name) | Q(name=name, pk__gt=pk))[:page_size + 1])
+        object_list = rows[:page_size]
+        if len(rows) > page_size:
+            last = object_list[-1]
+            self.next_after = f"{last.name},{last.pk}"
+        else:
+            self.next_after = None
+        return None, None, object_list, True
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['keyset_mode'] = self.get_keyset_cursor() is not None
+        context['next_after'] = self.next_after
+        return context
+
+
+class SearchListMixin:
+    """
+    Filter a ListView by the `q` parameter with bar.search.
+
+    Place it after PaginatedListMixin, which orders the matches by name.
+    The query is exposed to templates as `search_query`.
+    """
+    search_param = 'q'
+
+    def get_search_query(self):
+        return self.request.GET.get(self.search_param, '').strip()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        query = self.get_search_query()
+        if query:
+            queryset = search_queryset(queryset, query)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_query'] = self.get_search_query()
+        return context
+
+
+class CocktailImageJobMixin:
+    """
+    Save a cocktail without uploading its new image.
+
+    When the image field changed, the current image is kept and the cocktail
+    is marked as processing; the upload, the renditions and the removal of
+    the replaced image are left to the media worker (see bar.media_jobs).
+    """
+    def form_valid(self, form):
+        if 'image' not in form.changed_data:
+            return super().form_valid(form)
+
+        upload = form.cleaned_data['image']
+        form.instance.image_status = "processing"
+        with transaction.atomic():
+            current_image = ''
+            if form.instance.pk is not None:
+                # Locked, so a job finishing meanwhile cannot have its image overwritten.
+                current_image = (Cocktail.objects.select_for_update().filter(pk=form.instance.pk)
+                                 .values_list('image', flat=True).get())
+            form.instance.image = current_image
+            response = super().form_valid(form)
+            enqueue_image_job(self.object, upload or None)
+        return response
@@ -1,3 +1,515 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from django.urls import reverse
+
+from adm.catalog_io import import_catalog, iter_json_records
+from adm.forms import CocktailForm
+from bar.media_jobs import MAX_ATTEMPTS, claim_next_job, run_job
+from bar.models import (
+    Category,
+    Cocktail,
+    CocktailIngredient,
+    Food,
+    MediaJob,
+    WaterPipe,
+)
+from main.metrics import registry
+
+"""
+Tests for views in the `adm` application.
+Validate the number of queries issued by the administration pages,
+the pagination of the list views, the cocktail ingredient picker,
+the catalog import / export, the background processing of cocktail images
+and the request metrics endpoint.
+"""
+
+class CocktailDetailViewTest(TestCase):
+    """TestCase for the administration cocktail detail view."""
+
+    def setUp(self):
+        """Create a logged-in user and a cocktail with ingredients."""
+        self.user = get_user_model().objects.create_user(username="admin", password="pass")
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name="Cat")
+        self.cocktail = Cocktail.objects.create(
+            name="Negroni",
+            price="9.00",
+            description="Bitter",
+            category=self.category,
+            base_alcohol="Gin",
+        )
+        self.cocktail.ingredients.set([
+            CocktailIngredient.objects.create(name="Campari"),
+            CocktailIngredient.objects.create(name="Vermouth"),
+        ])
+
+    def test_query_count(self):
+        """Ensure user, cocktail with category and ingredients take three queries
+        (the session is read from the session cache)."""
+        url = reverse('cocktail-detail', kwargs={'pk': self.cocktail.pk})
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, "Campari")
+        self.assertContains(response, "Cat")
+
+
+class SessionBackendTest(TestCase):
+    """TestCase for the session backends of the administration panel."""
+
+    def setUp(self):
+        """Create an administrator."""
+        self.user = get_user_model().objects.create_user(username="admin", password="pass")
+
+    def assertNoSessionQueries(self):
+        """Ensure an administration page is served without touching the session table."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('main'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'django_session' in query['sql']])
+
+    def test_cached_db_sessions(self):
+        """Ensure logged-in requests read the session from the session cache."""
+        self.client.login(username="admin", password="pass")
+        self.assertNoSessionQueries()
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        """Ensure signed-cookie sessions keep administrators logged in without storage."""
+        self.client.login(username="admin", password="pass")
+        self.assertNoSessionQueries()
+
+
+class MetricsViewTest(TestCase):
+    """TestCase for the Prometheus endpoint of the request metrics."""
+
+    def setUp(self):
+        """Serve a public page, so there is something to report."""
+        registry.clear()
+        self.client.get(reverse('cocktails'))
+
+    def test_requires_login(self):
+        """Ensure anonymous users are redirected to the login page."""
+        response = self.client.get(reverse('metrics'))
+        self.assertRedirects(response, f"{reverse('login')}?next={reverse('metrics')}")
+
+    def test_prometheus_text(self):
+        """Ensure logged-in users get histograms per view in the Prometheus text format."""
+        self.client.force_login(get_user_model().objects.create_user(username="admin", password="pass"))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertContains(response, '# TYPE http_request_duration_seconds histogram')
+        self.assertContains(response, f'http_request_duration_seconds_count{{view="cocktails",process="{os.getpid()}"}} 1')
+        self.assertContains(response, 'http_request_db_queries_bucket{view="cocktails"')
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_bearer_token(self):
+        """Ensure scrapers are let in with the token only."""
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertContains(response, 'view="cocktails"')
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 302)
+
+
+class PaginatedListViewTest(TestCase):
+    """TestCase for page-number and keyset pagination of list views."""
+
+    def setUp(self):
+        """Create a logged-in user and more food items than fit on one page."""
+        self.user = get_user_model().objects.create_user(username="admin", password="pass")
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name="FoodCat")
+        self.foods = [
+            Food.objects.create(name=f"Food {i:03}", price="5.00", description="Tasty", category=self.category)
+            for i in range(60)
+        ]
+
+    def test_page_number(self):
+        """Ensure ?page= returns the requested page."""
+        response = self.client.get(reverse('list-food'), {'page': 2})
+        self.assertEqual(len(response.context['foods']), 10)
+        self.assertEqual(response.context['foods'][0], self.foods[50])
+
+    def test_keyset(self):
+        """Ensure ?after= continues after the cursor and exposes the next one."""
+        cursor = f"{self.foods[9].name},{self.foods[9].pk}"
+        response = self.client.get(reverse('list-food'), {'after': cursor})
+        foods = list(response.context['foods'])
+        self.assertEqual(foods, self.foods[10:60])
+        self.assertIsNone(response.context['next_after'])
+
+        cursor = f"{self.foods[0].name},{self.foods[0].pk}"
+        response = self.client.get(reverse('list-food'), {'after': cursor})
+        self.assertEqual(response.context['next_after'], f"{self.foods[50].name},{self.foods[50].pk}")
+
+        response = self.client.get(reverse('list-food'), {'after': ","})
+        self.assertEqual(response.status_code, 404)
+
+    def test_count_cached_until_catalog_changes(self):
+        """Ensure the item count is queried once per catalog version."""
+        cache.clear()
+        self.client.get(reverse('list-food'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('list-food'), {'page': 2})
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+        self.assertEqual(response.context['paginator'].count, 60)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Food.objects.create(name="Food 060", price="5.00", description="Tasty", category=self.category)
+        response = self.client.get(reverse('list-food'), {'page': 2})
+        self.assertEqual(response.context['paginator'].count, 61)
+
+    def test_search(self):
+        """Ensure the search box filters the list and is kept by the pagination links."""
+        response = self.client.get(reverse('list-food'), {'q': 'Food 007'})
+        self.assertEqual([food.name for food in response.context['foods']], ["Food 007"])
+        self.assertContains(response, 'value="Food 007"')
+
+    def test_search_without_match(self):
+        """Ensure a search matching nothing renders an empty list of every searchable model."""
+        for name in ('list-food', 'list-cocktail', 'list-water_pipe'):
+            response = self.client.get(reverse(name), {'q': 'zzzzzz'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['paginator'].count, 0)
+
+
+class CocktailFormIngredientsTest(TestCase):
+    """TestCase for the ingredient search endpoint and the cocktail form picker."""
+
+    def setUp(self):
+        """Create a logged-in user, ingredients and a cocktail using one of them."""
+        self.user = get_user_model().objects.create_user(username="admin", password="pass")
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name="Cat")
+        self.lime = CocktailIngredient.objects.create(name="Lime")
+        self.lemon = CocktailIngredient.objects.create(name="Lemon")
+        self.mint = CocktailIngredient.objects.create(name="Mint")
+        self.cocktail = Cocktail.objects.create(
+            name="Mojito",
+            price="6.00",
+            description="Fresh",
+            category=self.category,
+            base_alcohol="Rum",
+        )
+        self.cocktail.ingredients.set([self.mint])
+
+    def test_search_prefix(self):
+        """Ensure the search endpoint returns a case-insensitive prefix match."""
+        response = self.client.get(reverse('ingredient-search'), {'q': 'le'})
+        self.assertEqual(response.json(), {'results': [{'id': self.lemon.pk, 'name': "Lemon"}]})
+
+    def test_update_form_renders_only_selected(self):
+        """Ensure the update page renders the selected ingredients only."""
+        response = self.client.get(reverse('update-cocktail', kwargs={'pk': self.cocktail.pk}))
+        self.assertContains(response, "Mint")
+        self.assertNotContains(response, "Lime")
+
+    def test_ingredients_validated_with_one_query(self):
+        """Ensure the submitted ingredient set is validated with a single IN query."""
+        form = CocktailForm(data={
+            'name': "Mojito",
+            'price': "6.00",
+            'description': "Fresh",
+            'ingredients': [self.lime.pk, self.lemon.pk],
+            'category': self.category.pk,
+            'base_alcohol': "Rum",
+        }, instance=self.cocktail)
+        with self.assertNumQueries(1):
+            form.fields['ingredients'].clean([self.lime.pk, self.lemon.pk])
+        self.assertTrue(form.is_valid())
+
+
+class CatalogImportExportTest(TestCase):
+    """TestCase for the bulk catalog import and export."""
+
+    CSV = (
+        "type,name,price,description,category,base_alcohol,ingredients,flavour,tobacco\n"
+        "cocktail,Mojito,6.00,Fresh,Cocktails,Rum,Mint;Lime,,\n"
+        "food,Bread,2.50,Tasty,Food,,,,\n"
+        "water_pipe,Hookah,50.00,,Pipes,,,Apple,Light\n"
+        "food,X,1.00,Short,Food,,,,\n"
+        "cocktail,Negroni,-1,Bitter,Cocktails,Gin,,,\n"
+    )
+
+    def setUp(self):
+        """Create a logged-in user and an existing cocktail to be updated."""
+        self.user = get_user_model().objects.create_user(username="admin", password="pass")
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name="Cocktails")
+        self.mojito = Cocktail.objects.create(
+            name="Mojito",
+            price="5.00",
+            description="Old",
+            category=self.category,
+            base_alcohol="Rum",
+        )
+        self.mojito.ingredients.set([CocktailIngredient.objects.create(name="Sugar")])
+
+    def test_upload_csv(self):
+        """Ensure an uploaded CSV creates, updates and reports invalid rows."""
+        upload = SimpleUploadedFile("menu.csv", self.CSV.encode(), content_type="text/csv")
+        response = self.client.post(reverse('import-catalog'), {'file': upload})
+        report = response.context['report']
+        self.assertEqual((report.created, report.updated), (2, 1))
+        self.assertEqual([row for row, _ in report.errors], [4, 5])
+
+        self.mojito.refresh_from_db()
+        self.assertEqual(self.mojito.price, 6)
+        self.assertEqual([i.name for i in self.mojito.ingredients.all()], ["Lime", "Mint"])
+        self.assertTrue(Food.objects.filter(name="Bread", category__name="Food").exists())
+        self.assertTrue(WaterPipe.objects.filter(name="Hookah", tobacco="Light").exists())
+
+    def test_ambiguous_and_same_named_items(self):
+        """Ensure food is matched by name and category, and ambiguous rows are reported."""
+        drinks = Category.objects.create(name="Drinks")
+        Food.objects.create(name="Fries", price="3.00", description="Old", category=drinks)
+        Food.objects.create(name="Fries", price="3.00", description="Old", category=drinks)
+        soup = Food.objects.create(name="Soup", price="4.00", description="Old", category=drinks)
+        report = import_catalog([
+            {'type': 'food', 'name': "Fries", 'price': "5.00", 'description': "New", 'category': "Drinks"},
+            {'type': 'food', 'name': "Soup", 'price': "6.00", 'description': "New", 'category': "Drinks"},
+            {'type': 'food', 'name': "Soup", 'price': "7.00", 'description': "New", 'category': "Starters"},
+        ])
+        self.assertEqual((report.created, report.updated), (1, 1))
+        self.assertEqual([row for row, _ in report.errors], [1])
+        self.assertFalse(Food.objects.filter(name="Fries", description="New").exists())
+        soup.refresh_from_db()
+        self.assertEqual(soup.price, 6)
+        self.assertTrue(Food.objects.filter(name="Soup", category__name="Starters", price=7).exists())
+
+    def test_malformed_csv(self):
+        """Ensure a malformed CSV file is reported on the form instead of failing."""
+        content = b'type,name,description\nfood,Bread,"' + b'x' * (csv.field_size_limit() + 1) + b'"\n'
+        upload = SimpleUploadedFile("menu.csv", content, content_type="text/csv")
+        response = self.client.post(reverse('import-catalog'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Invalid CSV catalog file', str(response.context['form'].errors['file']))
+
+    def test_json_records(self):
+        """Ensure JSON arrays and JSON Lines are parsed record by record."""
+        records = list(iter_json_records(io.StringIO('[{"a": 1},\n{"b": "]"}]'), read_size=4))
+        self.assertEqual(records, [{"a": 1}, {"b": "]"}])
+        records = list(iter_json_records(io.StringIO('{"a": 1}\n{"b": 2}\n')))
+        self.assertEqual(records, [{"a": 1}, {"b": 2}])
+
+        report = import_catalog([{
+            'type': 'food', 'name': "Soup", 'price': "4.00", 'description': "Hot", 'category': "Food",
+        }])
+        self.assertEqual(report.created, 1)
+
+    def test_export_csv(self):
+        """Ensure the export streams a CSV with the cocktail ingredients."""
+        response = self.client.get(reverse('export-catalog'))
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn("cocktail,Mojito,5.00,Old,Cocktails,Rum,Sugar,,", content)
+
+
+class CocktailImageRenditionTest(TestCase):
+    """TestCase for the queued processing of cocktail images."""
+
+    def setUp(self):
+        """Create a logged-in user and use a temporary local media storage."""
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        storage = override_settings(
+            DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+            MEDIA_ROOT=self.media_root,
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+        self.user = get_user_model().objects.create_user(username="admin", password="pass")
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name="Cat")
+
+    def upload_image(self, **data):
+        """Post the create cocktail form with a 1200x800 image."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 800), 'red').save(buffer, 'PNG')
+        upload = SimpleUploadedFile("mojito.png", buffer.getvalue(), content_type="image/png")
+        return self.client.post(reverse('create-cocktail'), {
+            'name': "Mojito",
+            'price': "6.00",
+            'description': "Fresh",
+            'ingredients': [CocktailIngredient.objects.create(name="Mint").pk],
+            'category': self.category.pk,
+            'base_alcohol': "Rum",
+            'image': upload,
+            **data,
+        })
+
+    def test_upload_is_processed_in_background(self):
+        """Ensure the form only queues the image and the worker stores it."""
+        self.upload_image()
+        cocktail = Cocktail.objects.get(name="Mojito")
+        self.assertEqual(cocktail.image_status, "processing")
+        self.assertFalse(cocktail.image)
+        self.assertEqual(MediaJob.objects.get().status, "pending")
+
+        call_command('process_media_jobs', '--once', '--allow-local-cache', stdout=io.StringIO())
+        cocktail.refresh_from_db()
+        self.assertEqual(cocktail.image_status, "ready")
+        self.assertTrue(cocktail.image.storage.exists(cocktail.image.name))
+        job = MediaJob.objects.get()
+        self.assertEqual((job.status, job.payload), ("done", None))
+
+    def test_upload_generates_renditions(self):
+        """Ensure a processed image is resized and rendered with srcset, width and height."""
+        self.upload_image()
+        call_command('process_media_jobs', '--once', '--allow-local-cache', stdout=io.StringIO())
+        cocktail = Cocktail.objects.get(name="Mojito")
+        card = cocktail.image_renditions['formats']['jpeg']['card']
+        self.assertEqual((card['width'], card['height']), (480, 320))
+        self.assertIn('webp', cocktail.image_renditions['formats'])
+
+        response = self.client.get(reverse('cocktail-details', kwargs={'pk': cocktail.pk}))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, f"{card['url']} 480w")
+        self.assertContains(response, 'width="960"')
+
+    def test_replaced_image_is_deleted(self):
+        """Ensure clearing the image removes the stored file and its renditions."""
+        self.upload_image()
+        call_command('process_media_jobs', '--once', '--allow-local-cache', stdout=io.StringIO())
+        cocktail = Cocktail.objects.get(name="Mojito")
+        old_name = cocktail.image.name
+
+        self.client.post(reverse('update-cocktail', kwargs={'pk': cocktail.pk}), {
+            'name': "Mojito",
+            'price': "6.00",
+            'description': "Fresh",
+            'ingredients': list(cocktail.ingredients.values_list('pk', flat=True)),
+            'category': self.category.pk,
+            'base_alcohol': "Rum",
+            'image-clear': 'on',
+        })
+        cocktail.refresh_from_db()
+        self.assertEqual((cocktail.image.name, cocktail.image_status), (old_name, "processing"))
+        old_card = cocktail.image_renditions['formats']['jpeg']['card']['name']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_media_jobs', '--once', '--allow-local-cache', stdout=io.StringIO())
+        cocktail.refresh_from_db()
+        self.assertFalse(cocktail.image)
+        self.assertEqual(cocktail.image_renditions, {})
+        self.assertFalse(cocktail.image.storage.exists(old_name))
+        self.assertFalse(cocktail.image.storage.exists(old_card))
+
+    def update_image(self, cocktail, name):
+        """Post the update cocktail form with a new image."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 400), 'blue').save(buffer, 'PNG')
+        return self.client.post(reverse('update-cocktail', kwargs={'pk': cocktail.pk}), {
+            'name': "Mojito",
+            'price': "6.00",
+            'description': "Fresh",
+            'ingredients': list(cocktail.ingredients.values_list('pk', flat=True)),
+            'category': self.category.pk,
+            'base_alcohol': "Rum",
+            'image': SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png"),
+        })
+
+    def test_image_replaced_while_job_runs(self):
+        """Ensure an upload queued while a job is storing its image leaves no orphaned file."""
+        self.upload_image()
+        cocktail = Cocktail.objects.get(name="Mojito")
+        test = self
+
+        class ReplacingStorage(FileSystemStorage):
+            def save(self, name, content, max_length=None):
+                if name.startswith("images/mojito"):
+                    test.update_image(cocktail, "daiquiri.png")
+                return super().save(name, content, max_length)
+
+        storage = ReplacingStorage(location=self.media_root)
+        self.assertTrue(run_job(claim_next_job(), storage))
+        self.assertEqual(MediaJob.objects.get(filename="mojito.png").status, "superseded")
+        self.assertTrue(run_job(claim_next_job(), storage))
+
+        cocktail.refresh_from_db()
+        self.assertTrue(cocktail.image.name.startswith("images/daiquiri"))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.media_root, 'images'))),
+                         sorted([os.path.basename(cocktail.image.name), 'renditions']))
+
+    def test_job_uses_one_storage(self):
+        """Ensure the image and its renditions are stored, read and replaced through the given storage."""
+        other_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other_root, ignore_errors=True)
+        storage = FileSystemStorage(location=other_root)
+        self.upload_image()
+        self.assertTrue(run_job(claim_next_job(), storage))
+        cocktail = Cocktail.objects.get(name="Mojito")
+        old_name = cocktail.image.name
+        self.assertTrue(storage.exists(old_name))
+        self.assertTrue(storage.exists(cocktail.image_renditions['formats']['jpeg']['card']['name']))
+
+        self.update_image(cocktail, "daiquiri.png")
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertTrue(run_job(claim_next_job(), storage))
+        self.assertTrue(storage.exists(old_name), "Replaced files are kept until the new image is committed.")
+        for callback in callbacks:
+            callback()
+        cocktail.refresh_from_db()
+        self.assertFalse(storage.exists(old_name))
+        self.assertTrue(storage.exists(cocktail.image.name))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'images')))
+
+    def test_cocktail_deleted_during_job(self):
+        """Ensure a job whose cocktail is deleted while it runs is skipped without leaving files."""
+        self.upload_image()
+        cocktail = Cocktail.objects.get(name="Mojito")
+
+        class DeletingStorage(FileSystemStorage):
+            def save(self, name, content, max_length=None):
+                name = super().save(name, content, max_length)
+                Cocktail.objects.filter(pk=cocktail.pk).delete()
+                return name
+
+        self.assertTrue(run_job(claim_next_job(), DeletingStorage(location=self.media_root)))
+        self.assertFalse(MediaJob.objects.exists())
+        self.assertEqual([files for _, _, files in os.walk(self.media_root) if files], [])
+
+    def test_worker_survives_failing_job(self):
+        """Ensure an unexpected error of one job is reported and the worker keeps running."""
+        self.upload_image()
+        stderr = io.StringIO()
+        with mock.patch('bar.management.commands.process_media_jobs.run_job', side_effect=DatabaseError("gone")):
+            call_command('process_media_jobs', '--once', '--allow-local-cache', stdout=io.StringIO(), stderr=stderr)
+        self.assertIn("could not be processed: DatabaseError: gone", stderr.getvalue())
+
+    def test_worker_requires_shared_cache(self):
+        """Ensure the worker refuses to start with a per-process cache."""
+        with self.assertRaisesMessage(CommandError, "needs a cache shared with the web processes"):
+            call_command('process_media_jobs', '--once', stdout=io.StringIO())
+
+    def test_failed_job_is_retried(self):
+        """Ensure a failing job is rescheduled, then marked failed after the last attempt."""
+        self.upload_image()
+        job = claim_next_job()
+        with mock.patch('bar.media_jobs.store_renditions', side_effect=OSError("broken")):
+            self.assertFalse(run_job(job))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ("pending", 1))
+            self.assertGreater(job.run_after, timezone.now())
+            self.assertIsNone(claim_next_job())
+
+            MediaJob.objects.update(run_after=timezone.now(), attempts=MAX_ATTEMPTS - 1)
+            self.assertFalse(run_job(claim_next_job()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), ("failed", "OSError: broken"))
+        self.assertEqual(Cocktail.objects.get().image_status, "failed")
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'images')), [])
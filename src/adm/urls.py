@@ -14,6 +14,12 @@ Each section contains:
 - Update View
 - Detail View
 - Delete View
+
+Catalog import (CSV/JSON upload) and export (streamed download) have their own routes.
+
+Request metrics are served in the Prometheus text format.
+
+Cocktail ingredients also have a JSON search route used by the cocktail forms.
 """
 
 from django.urls import path
@@ -25,7 +31,8 @@ from adm.views import (AMDMainPageView, CreateCategoryView, UpdateCategoryView,
                        UpdateFoodView, DeleteFoodView, WaterPipeListView, CreateWaterPipeView,
                        UpdateWaterPipeView, DeleteWaterPipeView, CocktailDetailView,
                        CategoryDetailView, CocktailIngredientDetailView, FoodDetailView,
-                       WaterPipeDetailView)
+                       WaterPipeDetailView, IngredientSearchView, CatalogImportView,
+                       CatalogExportView, MetricsView)
 
 
 urlpatterns = [
@@ -45,6 +52,7 @@ urlpatterns = [
     path('adm_cocktail_ing/', CocktailIngredientListView.as_view() , name='list-ingredient'),
     path('adm_create_cocktail_ing/', CreateCocktailIngredientView.as_view() , name='create-ingredient'),
     path('adm_update_cocktail_ing/<int:pk>/update/', UpdateCocktailIngredientView.as_view() , name='update-ingredient'),
+    path('ingredients/search/', IngredientSearchView.as_view(), name='ingredient-search'),
     path('ingredients/<int:pk>/', CocktailIngredientDetailView.as_view(), name='ingredient-detail'),
     path('ingredients/<int:pk>/delete/', DeleteCocktailIngredientsView.as_view() , name='delete-ingredient'),
 # Cocktail ingredients CRUD paths END
@@ -73,4 +81,13 @@ urlpatterns = [
     path('water_pipes/<int:pk>/delete/', DeleteWaterPipeView.as_view(), name='delete-water_pipe'),
 # Water pipes CRUD paths END
 
+# Catalog import / export paths
+    path('adm_catalog_import/', CatalogImportView.as_view(), name='import-catalog'),
+    path('adm_catalog_export/', CatalogExportView.as_view(), name='export-catalog'),
+# Catalog import / export paths END
+
+# Request metrics path
+    path('metrics', MetricsView.as_view(), name='metrics'),
+# Request metrics path END
+
 ]
\ No newline at end of file
@@ -1,26 +1,40 @@
 """
 Administration views for CRUD operations on Category, CocktailIngredient,
-Cocktail, Food, and WaterPipe models. All views require user authentication.
+Cocktail, Food, and WaterPipe models, plus bulk catalog import and export.
+All views require user authentication.
+List views are paginated by page number or by keyset, and the cocktail, food
+and water pipe lists can be searched (see adm.mixins).
+The request metrics of the worker are served for Prometheus (see main.metrics).
 """
 
+import io
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.urls import reverse, reverse_lazy
+from django.utils.crypto import constant_time_compare
 from django.views.generic import (
     CreateView,
     DeleteView,
     DetailView,
+    FormView,
     ListView,
     TemplateView,
     UpdateView,
+    View,
 )
 
+from adm.catalog_io import export_csv, export_json, import_catalog, iter_csv_records, iter_json_records
 from adm.forms import (
+    CatalogImportForm,
     CategoryForm,
     CocktailForm,
     CocktailIngredientForm,
     FoodForm,
     WaterPipeForm,
 )
+from adm.mixins import CocktailImageJobMixin, PaginatedListMixin, SearchListMixin
 from bar.models import (
     Category,
     Cocktail,
@@ -28,6 +42,7 @@ from bar.models import (
     Food,
     WaterPipe,
 )
+from main.metrics import PROMETHEUS_CONTENT_TYPE, render_prometheus
 
 
 # Admin main page
@@ -38,10 +53,11 @@ class AMDMainPageView(LoginRequiredMixin, TemplateView):
     login_url = 'login'
     redirect_field_name = 'next'
     template_name = 'adm/adm_main_page.html'
+    query_budget = 1
 
 
 # Category CRUD
-class CategoryListView(LoginRequiredMixin, ListView):
+class CategoryListView(LoginRequiredMixin, PaginatedListMixin, ListView):
     """
     List all categories in the system. Requires user login.
     """
@@ -50,6 +66,7 @@ class CategoryListView(LoginRequiredMixin, ListView):
     model = Category
     template_name = 'adm/category/adm_category_list.html'
     context_object_name = 'categories'
+    query_budget = 3
 
 
 class CategoryDetailView(LoginRequiredMixin, DetailView):
@@ -61,6 +78,7 @@ class CategoryDetailView(LoginRequiredMixin, DetailView):
     model = Category
     template_name = 'adm/category/adm_category_detail.html'
     context_object_name = 'category'
+    query_budget = 2
 
 
 class CreateCategoryView(LoginRequiredMixin, CreateView):
@@ -73,6 +91,7 @@ class CreateCategoryView(LoginRequiredMixin, CreateView):
     model = Category
     form_class = CategoryForm
     template_name = 'adm/category/adm_category_create.html'
+    query_budget = 1
 
     def get_success_url(self):
         """
@@ -91,6 +110,7 @@ class UpdateCategoryView(LoginRequiredMixin, UpdateView):
     model = Category
     form_class = CategoryForm
     template_name = 'adm/category/adm_category_update.html'
+    query_budget = 2
 
     def get_success_url(self):
         """
@@ -109,10 +129,11 @@ class DeleteCategoryView(LoginRequiredMixin, DeleteView):
     model = Category
     template_name = 'adm/category/adm_category_delete.html'
     success_url = reverse_lazy('list-category')
+    query_budget = 2
 
 
 # Cocktail ingredients CRUD
-class CocktailIngredientListView(LoginRequiredMixin, ListView):
+class CocktailIngredientListView(LoginRequiredMixin, PaginatedListMixin, ListView):
     """
     List all cocktail ingredients. Requires user login.
     """
@@ -121,6 +142,33 @@ class CocktailIngredientListView(LoginRequiredMixin, ListView):
     model = CocktailIngredient
     template_name = 'adm/cocktail_ingredient/adm_cocktail_ing_list.html'
     context_object_name = 'cocktail_ingredients'
+    query_budget = 3
+
+
+class IngredientSearchView(LoginRequiredMixin, View):
+    """
+    Return cocktail ingredients whose name starts with `?q=` as JSON. Requires user login.
+
+    Used by the ingredient picker of the cocktail forms. The case-insensitive
+    prefix match is served by an index on UPPER(name).
+    """
+    login_url = 'login'
+    redirect_field_name = 'next'
+    limit = 20
+    query_budget = 2
+
+    def get(self, request):
+        """
+        Return up to `limit` matching ingredients ordered by name.
+        """
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return JsonResponse({'results': []})
+        ingredients = (CocktailIngredient.objects
+                       .filter(name__istartswith=query)
+                       .order_by('name')
+                       .values('id', 'name')[:self.limit])
+        return JsonResponse({'results': list(ingredients)})
 
 
 class CocktailIngredientDetailView(LoginRequiredMixin, DetailView):
@@ -132,6 +180,7 @@ class CocktailIngredientDetailView(LoginRequiredMixin, DetailView):
     model = CocktailIngredient
     template_name = 'adm/cocktail_ingredient/adm_cocktail_ing_detail.html'
     context_object_name = 'ingredient'
+    query_budget = 2
 
 
 class CreateCocktailIngredientView(LoginRequiredMixin, CreateView):
@@ -144,6 +193,7 @@ class CreateCocktailIngredientView(LoginRequiredMixin, CreateView):
     model = CocktailIngredient
     form_class = CocktailIngredientForm
     template_name = 'adm/cocktail_ingredient/adm_cocktail_ing_create.html'
+    query_budget = 1
 
     def get_success_url(self):
         """
@@ -162,6 +212,7 @@ class UpdateCocktailIngredientView(LoginRequiredMixin, UpdateView):
     model = CocktailIngredient
     form_class = CocktailIngredientForm
     template_name = 'adm/cocktail_ingredient/adm_cocktail_ing_update.html'
+    query_budget = 2
 
     def get_success_url(self):
         """
@@ -180,18 +231,21 @@ class DeleteCocktailIngredientsView(LoginRequiredMixin, DeleteView):
     model = CocktailIngredient
     template_name = 'adm/cocktail_ingredient/adm_cocktail_ing_delete.html'
     success_url = reverse_lazy('list-ingredient')
+    query_budget = 2
 
 
 # Cocktail CRUD
-class CocktailListView(LoginRequiredMixin, ListView):
+class CocktailListView(LoginRequiredMixin, PaginatedListMixin, SearchListMixin, ListView):
     """
-    List all cocktails. Requires user login.
+    List all cocktails, optionally matching a search query (`?q=`).
+    Requires user login.
     """
     login_url = 'login'
     redirect_field_name = 'next'
     model = Cocktail
     template_name = 'adm/cocktail/adm_cocktail_list.html'
     context_object_name = 'cocktails'
+    query_budget = 3
 
 
 class CocktailDetailView(LoginRequiredMixin, DetailView):
@@ -201,20 +255,23 @@ class CocktailDetailView(LoginRequiredMixin, DetailView):
     login_url = 'login'
     redirect_field_name = 'next'
     model = Cocktail
+    queryset = Cocktail.objects.with_menu_relations()
     template_name = 'adm/cocktail/adm_cocktail_detail.html'
     context_object_name = 'cocktail'
+    query_budget = 3
 
 
-class CreateCocktailView(LoginRequiredMixin, CreateView):
+class CreateCocktailView(LoginRequiredMixin, CocktailImageJobMixin, CreateView):
     """
     Provide a form to create a new cocktail. Redirects to cocktail detail on success.
-    Requires user login.
+    An uploaded image is processed in the background. Requires user login.
     """
     login_url = 'login'
     redirect_field_name = 'next'
     model = Cocktail
     form_class = CocktailForm
     template_name = 'adm/cocktail/adm_cocktail_create.html'
+    query_budget = 2
 
     def get_success_url(self):
         """
@@ -223,16 +280,17 @@ class CreateCocktailView(LoginRequiredMixin, CreateView):
         return reverse('cocktail-detail', kwargs={'pk': self.object.pk})
 
 
-class UpdateCocktailView(LoginRequiredMixin, UpdateView):
+class UpdateCocktailView(LoginRequiredMixin, CocktailImageJobMixin, UpdateView):
     """
     Provide a form to update an existing cocktail. Redirects to cocktail detail on success.
-    Requires user login.
+    A new image is processed in the background. Requires user login.
     """
     login_url = 'login'
     redirect_field_name = 'next'
     model = Cocktail
     form_class = CocktailForm
     template_name = 'adm/cocktail/adm_cocktail_update.html'
+    query_budget = 5
 
     def get_success_url(self):
         """
@@ -251,18 +309,21 @@ class DeleteCocktailView(LoginRequiredMixin, DeleteView):
     model = Cocktail
     template_name = 'adm/cocktail/adm_cocktail_delete.html'
     success_url = reverse_lazy('list-cocktail')
+    query_budget = 2
 
 
 # Food CRUD
-class FoodListView(LoginRequiredMixin, ListView):
+class FoodListView(LoginRequiredMixin, PaginatedListMixin, SearchListMixin, ListView):
     """
-    List all food items. Requires user login.
+    List all food items, optionally matching a search query (`?q=`).
+    Requires user login.
     """
     login_url = 'login'
     redirect_field_name = 'next'
     model = Food
     template_name = 'adm/food/adm_food_list.html'
     context_object_name = 'foods'
+    query_budget = 3
 
 
 class FoodDetailView(LoginRequiredMixin, DetailView):
@@ -272,8 +333,10 @@ class FoodDetailView(LoginRequiredMixin, DetailView):
     login_url = 'login'
     redirect_field_name = 'next'
     model = Food
+    queryset = Food.objects.select_related('category')
     template_name = 'adm/food/adm_food_detail.html'
     context_object_name = 'food'
+    query_budget = 2
 
 
 class CreateFoodView(LoginRequiredMixin, CreateView):
@@ -286,6 +349,7 @@ class CreateFoodView(LoginRequiredMixin, CreateView):
     model = Food
     form_class = FoodForm
     template_name = 'adm/food/adm_food_create.html'
+    query_budget = 2
 
     def get_success_url(self):
         """
@@ -304,6 +368,7 @@ class UpdateFoodView(LoginRequiredMixin, UpdateView):
     model = Food
     form_class = FoodForm
     template_name = 'adm/food/adm_food_update.html'
+    query_budget = 3
 
     def get_success_url(self):
         """
@@ -322,18 +387,21 @@ class DeleteFoodView(LoginRequiredMixin, DeleteView):
     model = Food
     template_name = 'adm/food/adm_food_delete.html'
     success_url = reverse_lazy('list-food')
+    query_budget = 2
 
 
 # Water pipe CRUD
-class WaterPipeListView(LoginRequiredMixin, ListView):
+class WaterPipeListView(LoginRequiredMixin, PaginatedListMixin, SearchListMixin, ListView):
     """
-    List all water pipe products. Requires user login.
+    List all water pipe products, optionally matching a search query (`?q=`).
+    Requires user login.
     """
     login_url = 'login'
     redirect_field_name = 'next'
     model = WaterPipe
     template_name = 'adm/water_pipes/adm_water_pipes_list.html'
     context_object_name = 'water_pipes'
+    query_budget = 3
 
 
 class WaterPipeDetailView(LoginRequiredMixin, DetailView):
@@ -343,8 +411,10 @@ class WaterPipeDetailView(LoginRequiredMixin, DetailView):
     login_url = 'login'
     redirect_field_name = 'next'
     model = WaterPipe
+    queryset = WaterPipe.objects.select_related('category')
     template_name = 'adm/water_pipes/adm_water_pipes_detail.html'
     context_object_name = 'pipe'
+    query_budget = 2
 
 
 class CreateWaterPipeView(LoginRequiredMixin, CreateView):
@@ -357,6 +427,7 @@ class CreateWaterPipeView(LoginRequiredMixin, CreateView):
     model = WaterPipe
     form_class = WaterPipeForm
     template_name = 'adm/water_pipes/adm_water_pipes_create.html'
+    query_budget = 2
 
     def get_success_url(self):
         """
@@ -375,6 +446,7 @@ class UpdateWaterPipeView(LoginRequiredMixin, UpdateView):
     model = WaterPipe
     form_class = WaterPipeForm
     template_name = 'adm/water_pipes/adm_water_pipes_update.html'
+    query_budget = 3
 
     def get_success_url(self):
         """
@@ -393,4 +465,72 @@ class DeleteWaterPipeView(LoginRequiredMixin, DeleteView):
     model = WaterPipe
     template_name = 'adm/water_pipes/adm_water_pipes_delete.html'
     success_url = reverse_lazy('list-water_pipe')
+    query_budget = 2
+
+
+# Catalog import / export
+class CatalogImportView(LoginRequiredMixin, FormView):
+    """
+    Upload a CSV or JSON catalog file and display the import report.
+    Requires user login.
+    """
+    login_url = 'login'
+    redirect_field_name = 'next'
+    form_class = CatalogImportForm
+    template_name = 'adm/catalog/adm_catalog_import.html'
+    query_budget = 1
+
+    def form_valid(self, form):
+        """
+        Stream-parse the uploaded file, import it and render the report.
+        """
+        upload = form.cleaned_data['file']
+        parse = iter_csv_records if upload.name.lower().endswith('.csv') else iter_json_records
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        try:
+            report = import_catalog(parse(stream))
+        except (UnicodeDecodeError, ValueError) as error:
+            form.add_error('file', str(error))
+            return self.form_invalid(form)
+        return self.render_to_response(self.get_context_data(form=form, report=report))
+
+
+class CatalogExportView(LoginRequiredMixin, View):
+    """
+    Stream the whole catalog as a CSV (default) or JSON (`?format=json`) download.
+    Requires user login.
+    """
+    login_url = 'login'
+    redirect_field_name = 'next'
+
+    def get(self, request):
+        """
+        Return a streaming response that reads the catalog in chunks.
+        """
+        if request.GET.get('format') == 'json':
+            response = StreamingHttpResponse(export_json(), content_type='application/json')
+            filename = 'catalog.json'
+        else:
+            response = StreamingHttpResponse(export_csv(), content_type='text/csv')
+            filename = 'catalog.csv'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class MetricsView(LoginRequiredMixin, View):
+    """
+    Serve the request metrics of this worker in the Prometheus text format.
+    Requires user login, or `Authorization: Bearer <METRICS_TOKEN>` for scrapers.
+    """
+    login_url = 'login'
+    redirect_field_name = 'next'
+    query_budget = 1
+
+    def dispatch(self, request, *args, **kwargs):
+        token = settings.METRICS_TOKEN
+        if token and constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            return super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
 
+    def get(self, request):
+        return HttpResponse(render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
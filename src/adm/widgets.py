@@ -0,0 +1,41 @@
+from django import forms
+from django.urls import reverse_lazy
+
+"""
+Custom form widgets for the ADM section of the application.
+"""
+
+class IngredientAutocompleteWidget(forms.CheckboxSelectMultiple):
+    """
+    Checkbox list that renders only the selected ingredients.
+
+    Further ingredients are found with the JSON search endpoint
+    (`ingredient-search`) and added on the client side, so rendering the
+    form does not load the whole CocktailIngredient table.
+    """
+    template_name = 'adm/widgets/ingredient_autocomplete.html'
+    search_url = reverse_lazy('ingredient-search')
+
+    class Media:
+        js = ['adm/js/ingredient_autocomplete.js']
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['search_url'] = self.search_url
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        """
+        Return options for the selected ingredients only, loaded with one query.
+        """
+        pks = [pk for pk in value if str(pk).isdigit()]
+        if not pks:
+            return []
+        field = self.choices.field
+        options = [
+            self.create_option(
+                name, field.prepare_value(obj), field.label_from_instance(obj), True, index, attrs=attrs
+            )
+            for index, obj in enumerate(self.choices.queryset.filter(pk__in=pks))
+        ]
+        return [(None, options, 0)]
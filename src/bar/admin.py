@@ -1,11 +1,11 @@
 """
 Admin site registrations for bar application models.
-Includes Category, Cocktail, CocktailIngredient, WaterPipe, and Food.
+Includes Category, Cocktail, CocktailIngredient, WaterPipe, Food and MediaJob.
 """
 
 
 from django.contrib import admin
-from bar.models import Category, Cocktail, CocktailIngredient, WaterPipe, Food
+from bar.models import Category, Cocktail, CocktailIngredient, WaterPipe, Food, MediaJob
 
 
 admin.site.register(Category)
@@ -13,3 +13,4 @@ admin.site.register(Cocktail)
 admin.site.register(CocktailIngredient)
 admin.site.register(WaterPipe)
 admin.site.register(Food)
+admin.site.register(MediaJob)
@@ -0,0 +1,283 @@
+"""
+Read-only JSON API over the bar catalog, for menu boards and mobile apps.
+
+Includes:
+- CatalogApiView: base view returning `{"results": [...], "next": ...}`
+  with sparse fieldsets (`?fields=id,name,price`), keyset pagination on the
+  primary key (`?after=<pk>&limit=<n>`) and price filters (`?min_price=`,
+  `?max_price=`).
+- CocktailApiView (`?base_alcohol=`), FoodApiView, WaterPipeApiView
+  (`?tobacco=`) and CategoryApiView.
+
+Rows are read with `.values()`, so no model instances are built. Responses
+are cached and answer conditional GET requests like the menu pages, and are
+compressed with brotli (when the `brotli` package is installed) or gzip.
+"""
+
+import gzip
+
+from django.core.exceptions import BadRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+
+from bar.cache import MenuPageCacheMixin
+from bar.conditional import ConditionalGetMixin
+from bar.forms import PriceRangeForm
+from bar.models import CHOICES_COCKTAIL, CHOICES_TOBACCO, Category, Cocktail, CocktailIngredient, Food, WaterPipe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+MIN_COMPRESS_LENGTH = 200
+
+
+class CompressedResponseMixin:
+    """
+    Compresses the response body with brotli or gzip, following the
+    request's Accept-Encoding header.
+
+    The compressed response is a new object, so a response kept in the page
+    cache is never modified.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if response.streaming or response.has_header('Content-Encoding') or len(response.content) < MIN_COMPRESS_LENGTH:
+            return response
+
+        accept_encoding = request.headers.get('Accept-Encoding', '')
+        if brotli is not None and 'br' in accept_encoding:
+            encoding, content = 'br', brotli.compress(response.content)
+        elif 'gzip' in accept_encoding:
+            encoding, content = 'gzip', gzip.compress(response.content, mtime=0)
+        else:
+            return response
+
+        compressed = HttpResponse(content, status=response.status_code)
+        for header, value in response.items():
+            compressed[header] = value
+        compressed['Content-Encoding'] = encoding
+        compressed['Content-Length'] = str(len(content))
+        return compressed
+
+
+class CatalogApiView(CompressedResponseMixin, ConditionalGetMixin, MenuPageCacheMixin, View):
+    """
+    Lists a catalog model as JSON.
+
+    `fields` maps public field names to `.values()` lookups; a lookup of
+    None marks a field computed by add_computed_fields().
+    """
+    model = None
+    fields = {}
+    default_page_size = 100
+    max_page_size = 500
+    json_separators = (',', ':')
+
+    def get_queryset(self):
+        return self.model.objects.all()
+
+    def get_validator_querysets(self):
+        return [self.model.objects.all()]
+
+    def get_fields(self):
+        """
+        Returns the requested field names, or all fields by default.
+
+        Raises:
+            BadRequest: If an unknown field is requested.
+        """
+        requested = self.request.GET.get('fields')
+        if not requested:
+            return list(self.fields)
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise BadRequest(f"Unknown fields: {', '.join(unknown)}.")
+        return names
+
+    def get_page(self):
+        """
+        Returns the (after, limit) pagination parameters.
+
+        Raises:
+            BadRequest: If either parameter is not a valid number.
+        """
+        try:
+            after = int(self.request.GET.get('after', 0))
+            limit = int(self.request.GET.get('limit', self.default_page_size))
+        except ValueError:
+            raise BadRequest("after and limit must be integers.")
+        if not 1 <= limit <= self.max_page_size:
+            raise BadRequest(f"limit must be between 1 and {self.max_page_size}.")
+        return after, limit
+
+    def filter_queryset(self, queryset):
+        return queryset
+
+    def add_computed_fields(self, rows, fields):
+        pass
+
+    def get_next_url(self, last_pk):
+        query = self.request.GET.copy()
+        query['after'] = last_pk
+        return f"{self.request.path}?{query.urlencode()}"
+
+    def render_json(self, data, status=200):
+        response = JsonResponse(data, status=status, encoder=DjangoJSONEncoder,
+                                json_dumps_params={'separators': self.json_separators})
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def get(self, request):
+        """
+        Returns one page of rows with the requested fields.
+        """
+        try:
+            fields = self.get_fields()
+            after, limit = self.get_page()
+            queryset = self.filter_queryset(self.get_queryset())
+        except BadRequest as error:
+            return self.render_json({'error': str(error)}, status=400)
+
+        lookups = {self.fields[name] for name in fields if self.fields[name]} - {'pk'}
+        records = list(queryset.filter(pk__gt=after).order_by('pk').values('pk', *lookups)[:limit + 1])
+        has_next = len(records) > limit
+        records = records[:limit]
+
+        rows = [
+            {name: record[self.fields[name]] for name in fields if self.fields[name]}
+            for record in records
+        ]
+        self.add_computed_fields([(record['pk'], row) for record, row in zip(records, rows)], fields)
+        return self.render_json({
+            'results': rows,
+            'next': self.get_next_url(records[-1]['pk']) if has_next else None,
+        })
+
+
+class PriceRangeApiMixin:
+    """
+    Filters the rows by the `min_price` and `max_price` query parameters.
+    """
+    def filter_queryset(self, queryset):
+        form = PriceRangeForm(self.request.GET)
+        if not form.is_valid():
+            raise BadRequest(form.errors.as_text())
+        return super().filter_queryset(
+            queryset.price_range(form.cleaned_data['min_price'], form.cleaned_data['max_price'])
+        )
+
+
+def _choice_filter(request, parameter, choices):
+    """
+    Returns the value of a choice query parameter, or None when absent.
+
+    Raises:
+        BadRequest: If the value is not one of the choices.
+    """
+    value = request.GET.get(parameter)
+    if value is not None and value not in dict(choices):
+        raise BadRequest(f"Unknown {parameter} '{value}'.")
+    return value
+
+
+class CocktailApiView(PriceRangeApiMixin, CatalogApiView):
+    """
+    Lists cocktails, optionally filtered by `?base_alcohol=`.
+    """
+    model = Cocktail
+    fields = {
+        'id': 'pk',
+        'name': 'name',
+        'price': 'price',
+        'description': 'description',
+        'base_alcohol': 'base_alcohol',
+        'category': 'category__name',
+        'ingredients': None,
+    }
+    query_budget = 5
+
+    def get_validator_querysets(self):
+        return [Cocktail.objects.all(), CocktailIngredient.objects.all(), Category.objects.all()]
+
+    def filter_queryset(self, queryset):
+        base_alcohol = _choice_filter(self.request, 'base_alcohol', CHOICES_COCKTAIL)
+        if base_alcohol is not None:
+            queryset = queryset.with_base_alcohol(base_alcohol)
+        return super().filter_queryset(queryset)
+
+    def add_computed_fields(self, rows, fields):
+        """
+        Adds ingredient names to the rows with one query for the whole page.
+        """
+        if 'ingredients' not in fields:
+            return
+        by_pk = {pk: row for pk, row in rows}
+        for row in by_pk.values():
+            row['ingredients'] = []
+        pairs = (Cocktail.ingredients.through.objects
+                 .filter(cocktail_id__in=by_pk)
+                 .order_by('cocktailingredient__name')
+                 .values_list('cocktail_id', 'cocktailingredient__name'))
+        for cocktail_pk, name in pairs:
+            by_pk[cocktail_pk]['ingredients'].append(name)
+
+
+class FoodApiView(PriceRangeApiMixin, CatalogApiView):
+    """
+    Lists food items.
+    """
+    model = Food
+    fields = {
+        'id': 'pk',
+        'name': 'name',
+        'price': 'price',
+        'description': 'description',
+        'category': 'category__name',
+    }
+    query_budget = 3
+
+    def get_validator_querysets(self):
+        return [Food.objects.all(), Category.objects.all()]
+
+
+class WaterPipeApiView(PriceRangeApiMixin, CatalogApiView):
+    """
+    Lists water pipes, optionally filtered by `?tobacco=`.
+    """
+    model = WaterPipe
+    fields = {
+        'id': 'pk',
+        'name': 'name',
+        'price': 'price',
+        'flavour': 'flavour',
+        'tobacco': 'tobacco',
+        'category': 'category__name',
+    }
+    query_budget = 3
+
+    def get_validator_querysets(self):
+        return [WaterPipe.objects.all(), Category.objects.all()]
+
+    def filter_queryset(self, queryset):
+        tobacco = _choice_filter(self.request, 'tobacco', CHOICES_TOBACCO)
+        if tobacco is not None:
+            queryset = queryset.with_tobacco(tobacco)
+        return super().filter_queryset(queryset)
+
+
+class CategoryApiView(CatalogApiView):
+    """
+    Lists categories.
+    """
+    model = Category
+    fields = {
+        'id': 'pk',
+        'name': 'name',
+    }
+    query_budget = 2
@@ -0,0 +1,100 @@
+"""
+Rendered-page cache for the public menu pages.
+
+Includes:
+- Catalog version: the version of the "catalog" cache namespace (see
+  main.cache), shared by every worker.
+- bump_catalog_version: invalidates every cached menu page (and every
+  other entry of the catalog namespace) at once.
+- MenuPageCacheMixin: serves a cached response for GET/HEAD requests,
+  keyed on the catalog version and the full request path. Works with
+  synchronous and async views alike.
+
+The version is bumped by the signal receivers in bar.signals whenever
+catalog data changes, so old page entries are never read again and simply
+expire from the cache. A page missing from the cache is rendered by one
+request only; concurrent requests for it wait for that render.
+"""
+
+from django.conf import settings
+
+from main.cache import aget_or_compute, anamespace_version, get_or_compute, invalidate_namespace, namespace_version
+
+
+CATALOG_NAMESPACE = 'catalog'
+MENU_PAGE_KEY_PREFIX = 'bar:menu-page'
+
+
+def get_catalog_version():
+    """
+    Returns the current catalog version, initialising it when missing.
+    """
+    return namespace_version(CATALOG_NAMESPACE)
+
+
+async def aget_catalog_version():
+    """
+    Async version of get_catalog_version().
+    """
+    return await anamespace_version(CATALOG_NAMESPACE)
+
+
+def bump_catalog_version():
+    """
+    Increments the catalog version so that all cached menu pages become stale.
+    """
+    invalidate_namespace(CATALOG_NAMESPACE)
+
+
+def menu_page_cache_key(request):
+    """
+    Returns the cache key of a menu page for the current catalog version.
+    """
+    return f"{MENU_PAGE_KEY_PREFIX}:{get_catalog_version()}:{request.get_full_path()}"
+
+
+async def amenu_page_cache_key(request):
+    return f"{MENU_PAGE_KEY_PREFIX}:{await aget_catalog_version()}:{request.get_full_path()}"
+
+
+def get_menu_page_cache_timeout():
+    return getattr(settings, 'MENU_PAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def is_cacheable_response(response):
+    return response.status_code == 200 and not response.streaming
+
+
+class MenuPageCacheMixin:
+    """
+    Caches the rendered response of a public menu view.
+
+    Only successful GET and HEAD responses are stored. The timeout is taken
+    from the MENU_PAGE_CACHE_TIMEOUT setting (one day by default); entries
+    are invalidated earlier by bumping the catalog version. Template
+    responses are rendered before they are stored.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self.cached_async_dispatch(request, *args, **kwargs)
+
+        def render():
+            response = super(MenuPageCacheMixin, self).dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            return response
+
+        return get_or_compute(menu_page_cache_key(request), render, get_menu_page_cache_timeout(),
+                              cacheable=is_cacheable_response)
+
+    async def cached_async_dispatch(self, request, *args, **kwargs):
+        """
+        Async version of dispatch(), used when the view handlers are async.
+        """
+        async def render():
+            return await super(MenuPageCacheMixin, self).dispatch(request, *args, **kwargs)
+
+        return await aget_or_compute(await amenu_page_cache_key(request), render, get_menu_page_cache_timeout(),
+                                     cacheable=is_cacheable_response)
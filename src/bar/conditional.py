@@ -0,0 +1,123 @@
+"""
+Conditional GET support for the public bar pages.
+
+Includes:
+- catalog_validators / acatalog_validators: ETag and Last-Modified values
+  computed from an aggregate Max('updated_at') and Count('pk') over one or
+  more querysets.
+- ConditionalGetMixin: answers 304 Not Modified before the view renders
+  anything and sets the validator headers on full responses, for
+  synchronous and async views.
+
+Validators are memoized per catalog version (see bar.cache), so between
+catalog writes a revalidation costs no database queries, and computed by
+one request at a time (see main.cache.get_or_compute).
+"""
+
+from hashlib import md5
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from bar.cache import aget_catalog_version, get_catalog_version
+from main.cache import aget_or_compute, get_or_compute
+
+
+VALIDATORS_KEY_PREFIX = 'bar:validators'
+
+
+def _validators_key(version, label):
+    return f"{VALIDATORS_KEY_PREFIX}:{version}:{label}"
+
+
+def _build_validators(label, states):
+    """
+    Returns the (etag, last_modified) pair of aggregated queryset states.
+    """
+    parts = []
+    last_modified = None
+    for state in states:
+        parts.append(f"{state['total']}:{state['last'].isoformat() if state['last'] else ''}")
+        if state['last'] and (last_modified is None or state['last'] > last_modified):
+            last_modified = state['last']
+    etag = 'W/' + quote_etag(md5(f"{label}|{'|'.join(parts)}".encode()).hexdigest())
+    return etag, last_modified
+
+
+def catalog_validators(label, *querysets):
+    """
+    Returns an (etag, last_modified) pair describing the given querysets.
+
+    The ETag is weak because it identifies the catalog state rather than the
+    exact bytes of the rendered page. `last_modified` is a datetime, or None
+    when all the querysets are empty.
+    """
+    return get_or_compute(_validators_key(get_catalog_version(), label), lambda: _build_validators(label, [
+        queryset.order_by().aggregate(last=Max('updated_at'), total=Count('pk')) for queryset in querysets
+    ]))
+
+
+async def acatalog_validators(label, *querysets):
+    """
+    Async version of catalog_validators().
+    """
+    async def build():
+        return _build_validators(label, [
+            await queryset.order_by().aaggregate(last=Max('updated_at'), total=Count('pk')) for queryset in querysets
+        ])
+
+    return await aget_or_compute(_validators_key(await aget_catalog_version(), label), build)
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag / Last-Modified handling to a view.
+
+    Subclasses implement get_validator_querysets() and may override
+    get_validator_label() when the validated data depends on URL arguments.
+    """
+    def get_validator_label(self):
+        return f"{self.__class__.__name__}:{self.request.get_full_path()}"
+
+    def get_validator_querysets(self):
+        raise NotImplementedError
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self.conditional_async_dispatch(request, *args, **kwargs)
+
+        self.request, self.args, self.kwargs = request, args, kwargs
+        etag, last_modified = catalog_validators(
+            self.get_validator_label(), *self.get_validator_querysets()
+        )
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            return response
+        return self.add_validator_headers(super().dispatch(request, *args, **kwargs), etag, timestamp)
+
+    async def conditional_async_dispatch(self, request, *args, **kwargs):
+        """
+        Async version of dispatch(), used when the view handlers are async.
+        """
+        self.request, self.args, self.kwargs = request, args, kwargs
+        etag, last_modified = await acatalog_validators(
+            self.get_validator_label(), *self.get_validator_querysets()
+        )
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            return response
+        return self.add_validator_headers(await super().dispatch(request, *args, **kwargs), etag, timestamp)
+
+    def add_validator_headers(self, response, etag, timestamp):
+        if response.status_code == 200:
+            response.headers.setdefault('ETag', etag)
+            if timestamp is not None:
+                response.headers.setdefault('Last-Modified', http_date(timestamp))
+        return response
@@ -0,0 +1,39 @@
+from django import forms
+from django.core.exceptions import ValidationError
+
+"""
+Forms for validating query parameters of the public bar pages.
+"""
+
+class PriceRangeForm(forms.Form):
+    """
+    Form for parsing the `min_price` and `max_price` query parameters.
+
+    Prices are parsed as Decimal with the precision of the model price fields
+    and must not be negative. When `default_max_price` is given, it is used
+    as the maximum if none is sent, so a minimum above it is rejected.
+    """
+    min_price = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2)
+    max_price = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2)
+
+    def __init__(self, *args, default_max_price=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_max_price = default_max_price
+
+    def clean(self):
+        """
+        Ensure the minimum price is not greater than the maximum price.
+
+        Raises:
+            ValidationError: If min_price is greater than max_price.
+        """
+        cleaned_data = super().clean()
+        min_price = cleaned_data.get('min_price')
+        max_price = cleaned_data.get('max_price')
+        if max_price is None and self.default_max_price is not None and 'max_price' not in self.errors:
+            max_price = cleaned_data['max_price'] = self.default_max_price
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise ValidationError(
+                "The minimum price must not be greater than the maximum price."
+            )
+        return cleaned_data
@@ -0,0 +1,116 @@
+"""
+Cached markup of the menu items listed on the public pages.
+
+Includes:
+- bulk_reverse: the URLs of a view for many primary keys with a single
+  resolver walk.
+- render_menu_items: the markup of a list of menu items (model instances or
+  menu snapshot items), rendered with bar/includes/menu_item.html.
+
+Each item is rendered once and cached in the MENU_FRAGMENT_CACHE cache under
+(model, pk, updated_at), plus the rendering options and a digest of the
+template, so an edited item or a changed template is simply rendered again.
+A list costs one get_many() for all its items and one set_many() for the
+items rendered anew. Old entries are never read again and expire.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+
+MENU_ITEM_TEMPLATE = 'bar/includes/menu_item.html'
+MENU_FRAGMENT_KEY_PREFIX = 'bar:menu-item'
+
+# Any pk the URL converters accept, replaced by the real ones in bulk_reverse().
+_PK_PLACEHOLDER = 2147483647
+
+_template_digests = {}
+
+
+def bulk_reverse(viewname, pks):
+    """
+    Returns {pk: url} for a view taking a single `pk` argument.
+    """
+    prefix, _, suffix = reverse(viewname, kwargs={'pk': _PK_PLACEHOLDER}).rpartition(str(_PK_PLACEHOLDER))
+    return {pk: f"{prefix}{pk}{suffix}" for pk in pks}
+
+
+def get_fragment_cache():
+    return caches[getattr(settings, 'MENU_FRAGMENT_CACHE', 'default')]
+
+
+def _template_digest(template):
+    source = template.template.source
+    if source not in _template_digests:
+        _template_digests[source] = hashlib.md5(source.encode()).hexdigest()[:8]
+    return _template_digests[source]
+
+
+def _item_version(item):
+    if isinstance(item, dict):
+        return item.get('id'), item.get('updated_at')
+    return item.pk, item.updated_at.isoformat()
+
+
+def _item_fields(item, description):
+    """
+    Returns the fields a menu item shows, for a snapshot item or a model instance.
+    """
+    if isinstance(item, dict):
+        return item
+    fields = {'id': item.pk, 'name': item.name, 'price': item.price}
+    if description == 'ingredients':
+        fields['ingredients'] = ', '.join(ingredient.name for ingredient in item.ingredients.all())
+    elif description:
+        fields[description] = getattr(item, description)
+    return fields
+
+
+def render_menu_items(items, model, url_name=None, description=None, label='', empty=''):
+    """
+    Returns the markup of `items`, served from the fragment cache where possible.
+
+    `model` is the label of the items' model (e.g. "bar.cocktail"). Items
+    are links to `url_name` when given (snapshot items bring their own
+    resolved "url"). `description` names the field shown under the price,
+    after `label`, or `empty` when it is blank.
+
+    Items without an `updated_at` (snapshots written by an older release)
+    are rendered without caching.
+    """
+    template = get_template(MENU_ITEM_TEMPLATE)
+    options = hashlib.md5(repr((url_name, description, label, empty)).encode()).hexdigest()[:8]
+    prefix = f"{MENU_FRAGMENT_KEY_PREFIX}:{_template_digest(template)}:{options}:{model}"
+    keys = []
+    for item in items:
+        pk, updated_at = _item_version(item)
+        keys.append(f"{prefix}:{pk}:{updated_at}" if updated_at else None)
+
+    fragment_cache = get_fragment_cache()
+    fragments = fragment_cache.get_many([key for key in keys if key])
+    missing = [(key, item) for key, item in zip(keys, items) if key not in fragments]
+    if missing:
+        urls = {}
+        if url_name:
+            urls = bulk_reverse(url_name, [item.pk for _, item in missing if not isinstance(item, dict)])
+        rendered = {}
+        for key, item in missing:
+            fields = _item_fields(item, description)
+            fragment = template.render({
+                'item': fields,
+                'url': (fields.get('url') or urls.get(fields['id'])) if url_name else None,
+                'description': fields.get(description, '') if description else None,
+                'description_field': description,
+                'label': label,
+                'empty': empty,
+            })
+            if key:
+                rendered[key] = fragment
+            fragments[key or id(item)] = fragment
+        fragment_cache.set_many(rendered)
+    return mark_safe(''.join(fragments[key or id(item)] for key, item in zip(keys, items)))
@@ -0,0 +1,326 @@
+"""
+Live menu updates for menu boards, pushed with Server-Sent Events.
+
+Includes:
+- diff_menu_documents: compact change events ("added", "removed",
+  "changed") between two versions of a menu snapshot.
+- MenuEventBroadcaster: in-process fan-out of events to the open event
+  streams. Recent events are kept, so a reconnecting client resumes from
+  its Last-Event-ID instead of reloading the page.
+- publish_menu_events: deliver events to this process once the current
+  transaction commits or, with LIVE_MENU_NOTIFY enabled on PostgreSQL, to
+  every process through NOTIFY (each process LISTENs in a background thread,
+  on a direct connection when LIVE_MENU_LISTEN_DATABASE is set).
+- MenuEventsView: the async `text/event-stream` endpoint. It needs the ASGI
+  application (main.asgi); under WSGI it answers 204 No Content, which tells
+  EventSource clients to stop reconnecting.
+
+Events are published by bar.snapshots whenever a menu section is rebuilt,
+so every committed catalog change reaches the boards, whichever view made it.
+"""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'bar_menu_events'
+NOTIFY_PAYLOAD_LIMIT = 7900
+MAX_EVENTS_PER_CHANGE = 50
+HISTORY_SIZE = 200
+QUEUE_SIZE = 100
+KEEPALIVE_INTERVAL = 15
+STREAM_LIFETIME = 5 * 60
+RECONNECT_DELAY_MS = 3000
+
+
+def _document_items(document):
+    """
+    Returns {id: (group, item)} of a snapshot document, with the items of
+    each group in menu order. Food has a single group, None.
+
+    `updated_at` is left out of the items: it is not shown on the boards.
+    """
+    if 'items' in document:
+        groups = [(None, document['items'])]
+    elif isinstance(document['sections'], dict):
+        groups = document['sections'].items()
+    else:
+        groups = document['sections']
+    return {
+        item['id']: (group, {field: value for field, value in item.items() if field != 'updated_at'})
+        for group, items in groups for item in items
+    }
+
+
+def diff_menu_documents(section, old, new):
+    """
+    Returns the events turning the `old` document of a menu section into
+    the `new` one.
+
+    An added item carries its group and the id of the item it is shown
+    before (None at the end of the group). A renamed or regrouped item moves,
+    so it is sent as removed and added again. When more than
+    MAX_EVENTS_PER_CHANGE items changed (e.g. a catalog import), a single
+    "reload" event is returned instead.
+    """
+    old_items = _document_items(old)
+    new_items = _document_items(new)
+    next_ids = {}
+    previous = {}
+    for pk, (group, _) in new_items.items():
+        if group in previous:
+            next_ids[previous[group]] = pk
+        previous[group] = pk
+
+    events = []
+    for pk, (group, item) in old_items.items():
+        moved = pk in new_items and (new_items[pk][0] != group or new_items[pk][1]['name'] != item['name'])
+        if pk not in new_items or moved:
+            events.append({'section': section, 'type': 'removed', 'id': pk})
+    for pk, (group, item) in new_items.items():
+        old_group, old_item = old_items.get(pk, (None, None))
+        if old_item is None or old_group != group or old_item['name'] != item['name']:
+            events.append({'section': section, 'type': 'added', 'id': pk, 'group': group,
+                           'before': next_ids.get(pk), 'item': item})
+        elif old_item != item:
+            events.append({'section': section, 'type': 'changed', 'id': pk, 'item': item})
+
+    if len(events) > MAX_EVENTS_PER_CHANGE:
+        return [{'section': section, 'type': 'reload'}]
+    return events
+
+
+class Subscription:
+    """
+    Event queue of one open stream, bound to the event loop serving it.
+
+    When the client falls QUEUE_SIZE events behind, the queue is replaced
+    by a single "reload" event.
+    """
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def deliver(self, batch):
+        self.loop.call_soon_threadsafe(self._put, batch)
+
+    def _put(self, batch):
+        for event_id, event in batch:
+            if self.queue.full():
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                event = {'section': event['section'], 'type': 'reload'}
+            self.queue.put_nowait((event_id, event))
+
+
+class MenuEventBroadcaster:
+    """
+    Fans published events out to the subscriptions of this process.
+
+    Event ids are "<process token>-<sequence>", so an id issued by another
+    process (or before a restart) is recognised as unknown.
+    """
+    def __init__(self, history_size=HISTORY_SIZE):
+        self.token = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._history = deque(maxlen=history_size)
+        self._sequence = 0
+
+    def publish(self, events):
+        with self._lock:
+            batch = []
+            for event in events:
+                self._sequence += 1
+                batch.append((f"{self.token}-{self._sequence}", event))
+            self._history.extend(batch)
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(batch)
+            except RuntimeError:
+                self.unsubscribe(subscription)
+
+    def subscribe(self, last_event_id=None):
+        """
+        Returns a new subscription for the running event loop.
+
+        The events published after `last_event_id` are queued right away; if
+        that id is not in the history any more, a "reload" event is queued.
+        """
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+            missed = self._events_after(last_event_id) if last_event_id else []
+        if missed is None:
+            missed = [(last_event_id, {'section': None, 'type': 'reload'})]
+        subscription._put(missed)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def _events_after(self, last_event_id):
+        token, _, sequence = last_event_id.partition('-')
+        if token != self.token or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        oldest = int(self._history[0][0].partition('-')[2]) if self._history else self._sequence + 1
+        if sequence < oldest - 1:
+            return None
+        return [(event_id, event) for event_id, event in self._history
+                if int(event_id.partition('-')[2]) > sequence]
+
+
+broadcaster = MenuEventBroadcaster()
+
+
+def _notify_enabled(connection):
+    return getattr(settings, 'LIVE_MENU_NOTIFY', False) and connection.vendor == 'postgresql'
+
+
+def publish_menu_events(events, using=DEFAULT_DB_ALIAS):
+    """
+    Publishes events once the current transaction commits.
+    """
+    if not events:
+        return
+    connection = connections[using]
+    if not _notify_enabled(connection):
+        transaction.on_commit(lambda: broadcaster.publish(events), using=using)
+        return
+
+    payload = json.dumps(events, separators=(',', ':'))
+    if len(payload) > NOTIFY_PAYLOAD_LIMIT:
+        payload = json.dumps([{'section': events[0]['section'], 'type': 'reload'}])
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [NOTIFY_CHANNEL, payload])
+
+
+def listen_connection():
+    """
+    Returns a new connection for LISTEN: the default database settings with
+    LIVE_MENU_LISTEN_DATABASE (e.g. the HOST and PORT of PostgreSQL itself)
+    applied. A LISTEN session must stay on one server connection, which
+    PgBouncer in transaction pooling does not guarantee.
+    """
+    connection = connections.create_connection(DEFAULT_DB_ALIAS)
+    overrides = getattr(settings, 'LIVE_MENU_LISTEN_DATABASE', None)
+    if overrides:
+        connection.settings_dict = {**connection.settings_dict, **overrides}
+    return connection
+
+
+class NotifyListener(threading.Thread):
+    """
+    Background thread publishing the events received with PostgreSQL
+    LISTEN on a connection of its own (see listen_connection). Lost
+    connections are reopened.
+    """
+    reconnect_delay = 5
+    poll_timeout = 60
+
+    def __init__(self):
+        super().__init__(name='menu-events-listener', daemon=True)
+
+    def run(self):
+        while True:
+            try:
+                self.listen()
+            except Exception:
+                logger.exception("Menu event listener failed, reconnecting.")
+                time.sleep(self.reconnect_delay)
+
+    def listen(self):
+        connection = listen_connection()
+        try:
+            connection.ensure_connection()
+            connection.set_autocommit(True)
+            raw = connection.connection
+            with raw.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            while True:
+                if select.select([raw], [], [], self.poll_timeout) == ([], [], []):
+                    continue
+                raw.poll()
+                while raw.notifies:
+                    broadcaster.publish(json.loads(raw.notifies.pop(0).payload))
+        finally:
+            connection.close()
+
+
+_listener = {'thread': None}
+_listener_lock = threading.Lock()
+
+
+def ensure_notify_listener():
+    """
+    Starts the NOTIFY listener of this process when NOTIFY is enabled.
+    """
+    if not _notify_enabled(connections[DEFAULT_DB_ALIAS]):
+        return
+    with _listener_lock:
+        if _listener['thread'] is None:
+            _listener['thread'] = NotifyListener()
+            _listener['thread'].start()
+
+
+def format_event(event_id, event):
+    return f"id: {event_id}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+async def event_stream(subscription, lifetime=STREAM_LIFETIME):
+    """
+    Yields the queued events of a subscription as SSE messages, with a
+    comment every KEEPALIVE_INTERVAL seconds.
+
+    The stream ends after `lifetime` seconds and the client reconnects with
+    its Last-Event-ID, so streams of vanished clients do not pile up.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + lifetime
+    try:
+        yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event_id, event = await asyncio.wait_for(subscription.queue.get(),
+                                                         min(KEEPALIVE_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(event_id, event)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+class MenuEventsView(View):
+    """
+    Streams live menu events to EventSource clients.
+    """
+    async def get(self, request):
+        """
+        Returns the event stream, or 204 No Content when not served by ASGI.
+        """
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+        ensure_notify_listener()
+        subscription = broadcaster.subscribe(request.headers.get('Last-Event-ID'))
+        response = StreamingHttpResponse(event_stream(subscription), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -0,0 +1,166 @@
+"""
+Management command comparing WSGI and ASGI serving under a slow database.
+
+Every query is delayed by --latency milliseconds (an execute wrapper added to
+each new connection), imitating a distant or overloaded database. Then
+--clients concurrent clients request the menu pages through:
+- wsgi: the WSGI handler with --threads server threads, like a gunicorn worker
+  with GUNICORN_THREADS threads;
+- asgi: the ASGI handler on one event loop, like a uvicorn worker.
+
+The page cache is replaced by a dummy cache for the run, so every request
+reaches the database. Run it against a throwaway database that several
+threads can share, e.g. a local PostgreSQL or a file-based SQLite database
+(not `:memory:`).
+
+Usage:
+    python manage.py benchmark_concurrency --latency 20 --clients 1 10 50 --threads 1 4
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from bar.models import Cocktail
+
+
+class QueryDelay:
+    """
+    Execute wrapper sleeping before every query.
+    """
+    def __init__(self, latency_ms):
+        self.latency = latency_ms / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.latency)
+        return execute(sql, params, many, context)
+
+    def install(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+async def asgi_get(handler, path):
+    """
+    Sends a GET request for `path` through the ASGI handler and returns the body.
+    """
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver')], 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    body = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            body.append(message.get('body', b''))
+
+    await handler(scope, receive, send)
+    return b''.join(body)
+
+
+class Command(BaseCommand):
+    help = "Compare menu throughput of the WSGI and ASGI handlers with injected database latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--latency', type=float, default=20,
+                            help="Delay added to every query, in milliseconds.")
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Requests per handler and concurrency level.")
+        parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 50],
+                            help="Numbers of concurrent clients to compare.")
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 4],
+                            help="WSGI server thread counts to compare.")
+
+    def get_paths(self):
+        paths = [reverse('cocktails'), reverse('cheap-cocktails'), reverse('food'), reverse('water-pipe')]
+        cocktail = Cocktail.objects.first()
+        if cocktail is not None:
+            paths.append(cocktail.get_absolute_url())
+        return paths
+
+    def run_wsgi(self, paths, clients, total, threads):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        server_threads = threading.BoundedSemaphore(threads)
+
+        def start_response(status, headers, exc_info=None):
+            pass
+
+        def request(path):
+            start = time.perf_counter()
+            with server_threads:
+                response = handler(factory.get(path).environ, start_response)
+                b''.join(response)
+                response.close()
+            return (time.perf_counter() - start) * 1000
+
+        with ThreadPoolExecutor(clients) as pool:
+            return list(pool.map(request, islice(cycle(paths), total)))
+
+    def run_asgi(self, paths, clients, total):
+        handler = ASGIHandler()
+        pending = islice(cycle(paths), total)
+
+        async def client():
+            timings = []
+            for path in pending:
+                start = time.perf_counter()
+                await asgi_get(handler, path)
+                timings.append((time.perf_counter() - start) * 1000)
+            return timings
+
+        async def run():
+            return await asyncio.gather(*(client() for _ in range(clients)))
+
+        return [timing for timings in asyncio.run(run()) for timing in timings]
+
+    def report(self, label, clients, timings, elapsed):
+        timings.sort()
+        self.stdout.write(
+            f"{label:<16} clients={clients:<4} "
+            f"{len(timings) / elapsed:8.1f} req/s   "
+            f"p50 {statistics.median(timings):8.2f} ms   "
+            f"p99 {timings[min(len(timings) - 1, int(len(timings) * 0.99))]:8.2f} ms"
+        )
+
+    def handle(self, *args, **options):
+        paths = self.get_paths()
+        delay = QueryDelay(options['latency'])
+        original_max_age = connection.settings_dict['CONN_MAX_AGE']
+        dummy_cache = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = 0
+        connection_created.connect(delay.install)
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver'], CACHES=dummy_cache):
+                # Untimed warm-up, so template compilation is not measured.
+                self.run_wsgi(paths, 1, len(paths), 1)
+                for clients in options['clients']:
+                    for threads in options['threads']:
+                        start = time.perf_counter()
+                        timings = self.run_wsgi(paths, clients, options['requests'], threads)
+                        self.report(f"wsgi threads={threads}", clients, timings, time.perf_counter() - start)
+                    start = time.perf_counter()
+                    timings = self.run_asgi(paths, clients, options['requests'])
+                    self.report("asgi", clients, timings, time.perf_counter() - start)
+        finally:
+            connection_created.disconnect(delay.install)
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = original_max_age
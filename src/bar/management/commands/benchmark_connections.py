@@ -0,0 +1,74 @@
+"""
+Management command comparing menu latency with fresh and persistent connections.
+
+Requests go through the WSGI handler, so connections are opened and closed
+exactly as under gunicorn. The page cache is cleared before every request so
+each one reaches the database. Run it against a throwaway database and cache,
+e.g. a local PostgreSQL or a file-based SQLite database (not `:memory:`).
+
+Usage:
+    python manage.py benchmark_connections --requests 200 --max-age 0 60
+"""
+
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from bar.models import Cocktail
+
+
+class Command(BaseCommand):
+    help = "Measure menu endpoint latency for several CONN_MAX_AGE values."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Requests per endpoint and CONN_MAX_AGE value.")
+        parser.add_argument('--max-age', type=int, nargs='+', default=[0, 60],
+                            help="CONN_MAX_AGE values to compare.")
+
+    def get_paths(self):
+        paths = [reverse('cocktails'), reverse('cheap-cocktails'), reverse('food'), reverse('water-pipe')]
+        cocktail = Cocktail.objects.first()
+        if cocktail is not None:
+            paths.append(cocktail.get_absolute_url())
+        return paths
+
+    def handle(self, *args, **options):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        paths = self.get_paths()
+        original_max_age = connection.settings_dict['CONN_MAX_AGE']
+
+        def start_response(status, headers, exc_info=None):
+            pass
+
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                for max_age in options['max_age']:
+                    connection.close()
+                    connection.settings_dict['CONN_MAX_AGE'] = max_age
+                    for path in paths:
+                        timings = []
+                        for _ in range(options['requests']):
+                            cache.clear()
+                            environ = factory.get(path).environ
+                            start = time.perf_counter()
+                            response = handler(environ, start_response)
+                            b''.join(response)
+                            response.close()
+                            timings.append((time.perf_counter() - start) * 1000)
+                        self.stdout.write(
+                            f"CONN_MAX_AGE={max_age:<5} {path:<24} "
+                            f"mean {statistics.mean(timings):7.2f} ms   "
+                            f"p50 {statistics.median(timings):7.2f} ms"
+                        )
+        finally:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = original_max_age
@@ -0,0 +1,30 @@
+"""
+Management command generating image renditions for existing cocktails.
+
+Usage:
+    python manage.py generate_renditions          # cocktails without renditions
+    python manage.py generate_renditions --all    # regenerate every cocktail
+"""
+
+from django.core.management.base import BaseCommand
+
+from bar.models import Cocktail
+from bar.renditions import generate_renditions
+
+
+class Command(BaseCommand):
+    help = "Generate resized image renditions for cocktails with an image."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Regenerate renditions of cocktails that already have them.")
+
+    def handle(self, *args, **options):
+        cocktails = Cocktail.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            cocktails = cocktails.filter(image_renditions={})
+        count = 0
+        for cocktail in cocktails.iterator():
+            generate_renditions(cocktail)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Generated renditions for {count} cocktails."))
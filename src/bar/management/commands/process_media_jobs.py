@@ -0,0 +1,61 @@
+"""
+Management command running the media worker.
+
+Processes queued cocktail image uploads (see bar.media_jobs) until stopped,
+or until the queue is empty with --once. A job raising an unexpected error is
+reported and the worker moves on to the next one.
+
+The worker bumps the catalog version (bar.cache) when it updates a cocktail,
+so it needs the cache shared with the web processes: it refuses to start with
+CACHE_BACKEND=locmem, unless --allow-local-cache is given (e.g. when it runs
+in the same process as the pages, as in the test suite).
+
+Usage:
+    python manage.py process_media_jobs
+    python manage.py process_media_jobs --once
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from bar.media_jobs import claim_next_job, run_job
+from main.cache import is_shared_between_processes
+
+
+class Command(BaseCommand):
+    help = "Upload queued cocktail images and generate their renditions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Exit when no job is due instead of polling.")
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help="Seconds to wait before polling an empty queue again.")
+        parser.add_argument('--allow-local-cache', action='store_true',
+                            help="Run with a per-process cache, whose invalidations the web processes do not see.")
+
+    def handle(self, *args, **options):
+        if not options['allow_local_cache'] and not is_shared_between_processes():
+            raise CommandError(
+                "The media worker needs a cache shared with the web processes "
+                "(CACHE_BACKEND=file or redis), or cached pages keep showing old images."
+            )
+        while True:
+            # Respect CONN_MAX_AGE and health checks as the request cycle does.
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            try:
+                succeeded = run_job(job)
+            except Exception as error:
+                self.stderr.write(f"Media job {job.pk} could not be processed: {type(error).__name__}: {error}")
+                continue
+            if succeeded:
+                self.stdout.write(f"Processed media job {job.pk} for cocktail {job.cocktail_id}.")
+            else:
+                self.stderr.write(f"Media job {job.pk} failed (attempt {job.attempts}): {job.last_error}")
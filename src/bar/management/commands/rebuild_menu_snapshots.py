@@ -0,0 +1,23 @@
+"""
+Management command rebuilding the precomputed menu sections.
+
+Needed only after catalog changes that bypass Django signals, such as raw
+SQL or database restores; regular writes rebuild their section themselves.
+
+Usage:
+    python manage.py rebuild_menu_snapshots
+"""
+
+from django.core.management.base import BaseCommand
+
+from bar.cache import bump_catalog_version
+from bar.snapshots import rebuild_all_menu_snapshots
+
+
+class Command(BaseCommand):
+    help = "Rebuild the menu snapshots served by the public menu pages."
+
+    def handle(self, *args, **options):
+        rebuild_all_menu_snapshots()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS("Menu snapshots rebuilt."))
@@ -0,0 +1,69 @@
+"""
+Management command running the route benchmark suite (see main.benchmarks).
+
+The suite runs in a separate test database, seeded for every catalog size,
+and fails when a route regresses against the checked-in baseline.
+
+Usage:
+    python manage.py run_benchmarks
+    python manage.py run_benchmarks --sizes 100 10000 --repeat 5
+    python manage.py run_benchmarks --update-baseline
+"""
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from main.benchmarks import find_regressions, run_suite
+
+
+class Command(BaseCommand):
+    help = "Measure query count, render time and response size of every bar and adm route."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10000, 100000],
+                            help="Catalog sizes to seed (number of items).")
+        parser.add_argument('--repeat', type=int, default=10,
+                            help="Requests per route and size.")
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'benchmark_baseline.json'),
+                            help="Baseline file to compare with.")
+        parser.add_argument('--tolerance', type=float, default=2.0,
+                            help="Allowed growth factor of render time and response size.")
+        parser.add_argument('--update-baseline', action='store_true',
+                            help="Write the results to the baseline file instead of comparing.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = run_suite(options['sizes'], repeat=options['repeat'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        for size, routes in results.items():
+            self.stdout.write(f"Catalog size {size}")
+            for name, result in routes.items():
+                self.stdout.write(
+                    f"  {name:<22} {result['status']}  {result['queries']:>4} queries  "
+                    f"p50 {result['p50_ms']:>9.2f} ms  p99 {result['p99_ms']:>9.2f} ms  {result['bytes']:>10} B"
+                )
+
+        if options['update_baseline']:
+            with open(options['baseline'], 'w') as stream:
+                json.dump(results, stream, indent=2, sort_keys=True)
+                stream.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}"))
+            return
+
+        try:
+            with open(options['baseline']) as stream:
+                baseline = json.load(stream)
+        except FileNotFoundError:
+            raise CommandError(f"Baseline {options['baseline']} not found, run with --update-baseline.")
+        regressions = find_regressions(results, baseline, tolerance=options['tolerance'])
+        if regressions:
+            raise CommandError("Benchmark regressions:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
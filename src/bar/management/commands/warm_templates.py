@@ -0,0 +1,27 @@
+"""
+Management command compiling the bar and adm templates.
+
+gunicorn workers warm their template cache themselves (post_worker_init in
+gunicorn.conf.py); this command runs the same step, e.g. to check that every
+template still compiles or to see how long warming takes.
+
+Usage:
+    python manage.py warm_templates
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.templating import warm_templates
+
+
+class Command(BaseCommand):
+    help = "Compile every bar and adm template into the cached template loader."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        names = warm_templates()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(names)} templates compiled in {(time.perf_counter() - start) * 1000:.1f} ms."
+        ))
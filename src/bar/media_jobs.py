@@ -0,0 +1,166 @@
+"""
+Database-backed queue for cocktail image uploads.
+
+Includes:
+- enqueue_image_job: store an uploaded (or cleared) image as a MediaJob, so
+  the request finishes without uploading anything to the media storage.
+- claim_next_job: lock the next due job, also reclaiming jobs whose worker
+  died (running for longer than JOB_LEASE).
+- run_job: upload the image to the media storage, generate its renditions,
+  delete the replaced image and mark the cocktail ready. Failed attempts are
+  retried with exponential backoff up to MAX_ATTEMPTS.
+
+Jobs are processed by `python manage.py process_media_jobs`.
+"""
+
+import os
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from bar.models import Cocktail, MediaJob
+from bar.renditions import delete_renditions, store_renditions
+
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(seconds=30)
+JOB_LEASE = timedelta(minutes=10)
+
+
+def enqueue_image_job(cocktail, upload):
+    """
+    Queue the upload of a new cocktail image, or the removal of the current
+    one when `upload` is None, and supersede older pending jobs.
+    """
+    MediaJob.objects.filter(cocktail=cocktail, status="pending").update(status="superseded", payload=None)
+    job = MediaJob(cocktail=cocktail)
+    if upload:
+        job.filename = os.path.basename(upload.name)
+        job.payload = b''.join(upload.chunks())
+    job.save()
+    return job
+
+
+def claim_next_job():
+    """
+    Mark the next due job as running and return it, or None if there is none.
+
+    Rows are locked with SKIP LOCKED where the database supports it, so
+    several workers can share the queue.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (MediaJob.objects
+               .select_for_update(skip_locked=True)
+               .filter(Q(status="pending", run_after__lte=now) | Q(status="running", locked_at__lt=now - JOB_LEASE))
+               .order_by('run_after', 'pk')
+               .first())
+        if job is None:
+            return None
+        job.status = "running"
+        job.locked_at = now
+        job.attempts += 1
+        job.save(update_fields=['status', 'locked_at', 'attempts', 'updated_at'])
+    return job
+
+
+def _update(job, **fields):
+    """
+    Update fields of the job. A job deleted meanwhile (with its cocktail)
+    is left alone.
+    """
+    for name, value in fields.items():
+        setattr(job, name, value)
+    MediaJob.objects.filter(pk=job.pk).update(updated_at=timezone.now(), **fields)
+
+
+def _finish(job, status, error=''):
+    _update(job, status=status, last_error=error, payload=None)
+
+
+def _superseded(job):
+    return MediaJob.objects.filter(cocktail=job.cocktail_id, pk__gt=job.pk).exists()
+
+
+def _delete_files(storage, image_name, renditions):
+    if image_name:
+        storage.delete(image_name)
+    delete_renditions(renditions, storage)
+
+
+def process_job(job, storage=None):
+    """
+    Store the job's image on the cocktail, regenerate the renditions and
+    delete the replaced image. Jobs superseded by a newer upload, and jobs
+    of cocktails deleted meanwhile, are skipped.
+
+    The image is uploaded and resized outside any transaction; the result is
+    then written with the cocktail row locked. The replaced image is the one
+    the cocktail holds at that point, so an image stored by an earlier job
+    that finished after this one was queued is deleted as well. Replaced
+    files are deleted only once that write has committed. Every read, write
+    and delete goes through `storage` (the image field's storage by default).
+
+    Returns:
+        str: The final status of the job, "done" or "superseded".
+    """
+    storage = storage or Cocktail._meta.get_field('image').storage
+    cocktail = Cocktail.objects.filter(pk=job.cocktail_id).first()
+    if cocktail is None or _superseded(job):
+        _finish(job, "superseded")
+        return "superseded"
+
+    new_name, renditions = '', {}
+    try:
+        if job.payload is not None:
+            field = cocktail.image.field
+            new_name = storage.save(field.generate_filename(cocktail, job.filename),
+                                    ContentFile(bytes(job.payload)), max_length=field.max_length)
+        renditions = store_renditions(new_name, storage)
+
+        with transaction.atomic():
+            cocktail = Cocktail.objects.select_for_update().filter(pk=job.cocktail_id).first()
+            superseded = cocktail is None or _superseded(job)
+            if not superseded:
+                replaced = (cocktail.image.name, cocktail.image_renditions)
+                cocktail.image = new_name
+                cocktail.image_renditions = renditions
+                cocktail.image_status = "ready"
+                cocktail.save(update_fields=['image', 'image_renditions', 'image_status', 'updated_at'])
+                transaction.on_commit(lambda: _delete_files(storage, *replaced))
+    except Exception:
+        _delete_files(storage, new_name, renditions)
+        raise
+
+    if superseded:
+        _delete_files(storage, new_name, renditions)
+        _finish(job, "superseded")
+        return "superseded"
+    _finish(job, "done")
+    return "done"
+
+
+def run_job(job, storage=None):
+    """
+    Process a claimed job. A failure schedules a retry after
+    RETRY_DELAY * 2 ** (attempts - 1); after MAX_ATTEMPTS the job and the
+    cocktail image are marked as failed.
+
+    Returns:
+        bool: Whether the job succeeded.
+    """
+    try:
+        process_job(job, storage)
+    except Exception as error:
+        message = f"{type(error).__name__}: {error}"
+        if job.attempts >= MAX_ATTEMPTS:
+            _finish(job, "failed", message)
+            Cocktail.objects.filter(pk=job.cocktail_id).update(image_status="failed", updated_at=timezone.now())
+        else:
+            _update(job, status="pending", last_error=message,
+                    run_after=timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1))
+        return False
+    return True
@@ -0,0 +1,91 @@
+"""
+Lean request path for anonymous visitors of the public bar pages.
+
+Includes:
+- is_public_request: a GET or HEAD request for a bar.urls route that carries
+  no session cookie, i.e. a visitor who is not logged in.
+- PublicRequestMiddleware: flags public requests as `request.is_public`.
+- PublicSessionMiddleware, PublicAuthenticationMiddleware and
+  PublicMessageMiddleware: the Django middleware, skipped for flagged
+  requests. They get an AnonymousUser and no session or message storage.
+
+The auth and messages context processors stay cheap on public requests:
+`user` is the AnonymousUser set here and `messages` is empty without a
+storage. A public page never touches the session, so its response carries
+no `Vary: Cookie` and can be shared by caches and CDNs. Logged-in users
+(who have a session cookie) and every other URL go through the full
+middleware stack.
+"""
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.urls import Resolver404, resolve
+
+
+# Resolved on its own, as bar.urls is mounted at the site root (main/urls.py).
+PUBLIC_URLCONF = 'bar.urls'
+
+
+def is_public_request(request):
+    if request.method not in ('GET', 'HEAD') or settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return False
+    try:
+        resolve(request.path_info, urlconf=PUBLIC_URLCONF)
+    except Resolver404:
+        return False
+    return True
+
+
+class PublicRequestMiddleware:
+    """
+    Sets `request.is_public`. Place it before the session middleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.is_public = is_public_request(request)
+        return self.get_response(request)
+
+
+class PublicSessionMiddleware(SessionMiddleware):
+    """
+    SessionMiddleware that leaves public requests without a session.
+    """
+    def process_request(self, request):
+        if not getattr(request, 'is_public', False):
+            super().process_request(request)
+
+    def process_response(self, request, response):
+        if getattr(request, 'is_public', False):
+            return response
+        return super().process_response(request, response)
+
+
+class PublicAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware giving public requests an AnonymousUser
+    without looking at the session.
+    """
+    def process_request(self, request):
+        if getattr(request, 'is_public', False):
+            request.user = AnonymousUser()
+        else:
+            super().process_request(request)
+
+
+class PublicMessageMiddleware(MessageMiddleware):
+    """
+    MessageMiddleware without message storage for public requests.
+    """
+    def process_request(self, request):
+        if not getattr(request, 'is_public', False):
+            super().process_request(request)
+
+    def process_response(self, request, response):
+        if getattr(request, 'is_public', False):
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bar', '0004_catalog_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cocktail',
+            index=models.Index(fields=['price', 'name'], name='bar_cocktail_price_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['price', 'name'], name='bar_food_price_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waterpipe',
+            index=models.Index(fields=['price', 'name'], name='bar_waterpipe_price_name_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 15:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bar', '0005_price_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['name', 'id'], name='bar_food_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waterpipe',
+            index=models.Index(fields=['name', 'id'], name='bar_waterpipe_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-18 16:02
+
+from django.db import migrations
+
+
+INDEX_NAME = 'bar_cocktailingredient_name_upper_idx'
+
+
+def create_index(apps, schema_editor):
+    """
+    Index UPPER(name) with text_pattern_ops so that case-insensitive prefix
+    searches (name__istartswith) become index range scans on PostgreSQL.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+            f'ON bar_cocktailingredient (UPPER(name::text) text_pattern_ops)'
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bar', '0006_name_id_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bar', '0007_cocktailingredient_name_upper_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cocktail',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-18 15:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bar', '0008_cocktail_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cocktail',
+            name='image_status',
+            field=models.CharField(choices=[('ready', 'Ready'), ('processing', 'Processing'), ('failed', 'Failed')], default='ready', editable=False, max_length=10),
+        ),
+        migrations.CreateModel(
+            name='MediaJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(blank=True, max_length=255)),
+                ('payload', models.BinaryField(null=True)),
+                ('replaced_name', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('superseded', 'Superseded')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cocktail', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media_jobs', to='bar.cocktail')),
+            ],
+            options={
+                'verbose_name_plural': 'Media Jobs',
+                'ordering': ['run_after', 'pk'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='mediajob',
+            index=models.Index(fields=['status', 'run_after'], name='bar_mediajob_status_run_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bar', '0009_media_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuSnapshot',
+            fields=[
+                ('section', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('document', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Menu Snapshots',
+            },
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2 on 2026-10-18 15:41
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+SEARCH_INDEXES = [
+    ('bar_cocktail_search_vector_idx', 'bar_cocktail USING gin (search_vector)'),
+    ('bar_food_search_vector_idx', 'bar_food USING gin (search_vector)'),
+    ('bar_waterpipe_search_vector_idx', 'bar_waterpipe USING gin (search_vector)'),
+    ('bar_cocktail_name_trgm_idx', 'bar_cocktail USING gin (name gin_trgm_ops)'),
+    ('bar_food_name_trgm_idx', 'bar_food USING gin (name gin_trgm_ops)'),
+    ('bar_waterpipe_name_trgm_idx', 'bar_waterpipe USING gin (name gin_trgm_ops)'),
+]
+
+BACKFILL = [
+    """
+    UPDATE bar_cocktail SET search_vector =
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM bar_cocktail_ingredients link
+            JOIN bar_cocktailingredient ingredient ON ingredient.id = link.cocktailingredient_id
+            WHERE link.cocktail_id = bar_cocktail.id
+        ), '')), 'C')
+    """,
+    """
+    UPDATE bar_food SET search_vector =
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    """,
+    """
+    UPDATE bar_waterpipe SET search_vector =
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(flavour, '')), 'B')
+    """,
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Fill the search vectors and index them (GIN), together with trigram
+    indexes on the names used for typo-tolerant matching. PostgreSQL only.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in BACKFILL:
+            schema_editor.execute(statement)
+        for name, definition in SEARCH_INDEXES:
+            schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name, _ in SEARCH_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bar', '0010_menu_snapshot'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='cocktail',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='food',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='waterpipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-18 16:57
+
+import bar.models
+import django.contrib.postgres.indexes
+from django.db import migrations
+import django.db.models.functions.text
+
+
+# Created with raw SQL by 0007, which left it out of the model state.
+RAW_INDEX_NAME = 'bar_cocktailingredient_name_upper_idx'
+
+
+def drop_raw_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {RAW_INDEX_NAME}')
+
+
+def create_raw_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {RAW_INDEX_NAME} '
+            f'ON bar_cocktailingredient (UPPER(name::text) text_pattern_ops)'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bar', '0011_search_vectors'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_raw_index, create_raw_index),
+        migrations.AddIndex(
+            model_name='cocktailingredient',
+            index=bar.models.OpClassIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='text_pattern_ops'), name='bar_ingredient_upper_name_idx'),
+        ),
+    ]
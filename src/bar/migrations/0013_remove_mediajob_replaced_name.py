@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 17:01
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bar', '0012_cocktailingredient_upper_name_index'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='mediajob',
+            name='replaced_name',
+        ),
+    ]
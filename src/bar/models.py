@@ -4,18 +4,57 @@ Models for the bar application.
 Includes:
 - Category: Represents categories for drinks, food and water pipes.
 - CocktailIngredient: Individual ingredients used in cocktails.
-- Cocktail: Cocktails with price, description, base alcohol, and ingredients.
+- Cocktail: Cocktails with price, description, base alcohol, and ingredients,
+  plus resized image renditions (see bar.renditions).
+- MediaJob: Queued cocktail image uploads processed by the media worker
+  (see bar.media_jobs).
+- MenuSnapshot: Precomputed menu sections served by the public menu pages
+  (see bar.snapshots).
 - Food: Food items with price and description.
 - WaterPipe: Water pipes with flavour and tobacco type.
 
+Every model tracks its last modification in `updated_at`, which is used to
+build the conditional GET validators in bar.conditional. Cocktail, Food and
+WaterPipe keep a full-text `search_vector`, maintained on PostgreSQL only
+(see bar.search).
+
 Also includes:
-- Custom model managers and querysets for filtering cheap cocktails and food.
+- Custom model managers and querysets for filtering cocktails, food and water
+  pipes by price range (backed by (price, name) indexes), for grouping the
+  cocktail menu by base alcohol and for loading cocktails together with their
+  category and ingredients, and for filtering cocktails by base alcohol and
+  water pipes by tobacco type.
 - Choice constants for base alcohol types and tobacco types.
+- OpClassIndex: expression index whose operator classes apply on PostgreSQL
+  only.
 """
 
 
+from itertools import groupby
+from operator import attrgetter
+
+from django.contrib.postgres.indexes import OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
 from django.urls import reverse
+from django.utils import timezone
+
+
+class OpClassIndex(models.Index):
+    """
+    Index whose OpClass() expressions keep their operator class on PostgreSQL.
+    Other databases, such as SQLite in tests, index the bare expressions.
+    """
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        index = self
+        if schema_editor.connection.vendor != 'postgresql':
+            index = self.clone()
+            index.expressions = tuple(
+                expression.get_source_expressions()[0] if isinstance(expression, OpClass) else expression
+                for expression in self.expressions
+            )
+        return super(OpClassIndex, index).create_sql(model, schema_editor, using, **kwargs)
 
 
 CHOICES_COCKTAIL = [
@@ -33,9 +72,24 @@ CHOICES_TOBACCO = [
     ("Dark", "Dark"),
 ]
 
+CHOICES_IMAGE_STATUS = [
+    ("ready", "Ready"),
+    ("processing", "Processing"),
+    ("failed", "Failed"),
+]
+
+CHOICES_JOB_STATUS = [
+    ("pending", "Pending"),
+    ("running", "Running"),
+    ("done", "Done"),
+    ("failed", "Failed"),
+    ("superseded", "Superseded"),
+]
+
 
 class Category(models.Model):
     name = models.CharField(max_length=50, unique=True, null=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def get_absolute_url(self):
         return reverse('category-detail', kwargs={'pk': self.pk})
@@ -50,6 +104,7 @@ class Category(models.Model):
 
 class CocktailIngredient(models.Model):
     name = models.CharField(max_length=50, unique=True, null=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def get_absolute_url(self):
         return reverse('ingredient-detail', kwargs={'pk': self.pk})
@@ -57,14 +112,60 @@ class CocktailIngredient(models.Model):
     class Meta:
         verbose_name_plural = "Cocktail Ingredients"
         ordering = ['name']
+        indexes = [
+            # Case-insensitive prefix searches (name__istartswith) of the
+            # ingredient picker become index range scans on PostgreSQL.
+            OpClassIndex(OpClass(Upper('name'), name='text_pattern_ops'), name='bar_ingredient_upper_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name}"
 
 
-class CocktailQuerySet(models.QuerySet):
+class PriceRangeQuerySet(models.QuerySet):
     def cheap(self, max_price):
-        return self.filter(price__lte=max_price)
+        return self.price_range(max_price=max_price)
+
+    def price_range(self, min_price=None, max_price=None):
+        """
+        Returns items priced within the given inclusive bounds, ordered by price and name
+        so that the (price, name) index serves both the filter and the ordering.
+        """
+        queryset = self
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+        return queryset.order_by('price', 'name')
+
+
+class CocktailQuerySet(PriceRangeQuerySet):
+
+    def menu_sections(self):
+        """
+        Returns cocktails grouped by base alcohol as a list of (label, cocktails) pairs.
+
+        All cocktails are fetched in a single query ordered by base alcohol and grouped
+        in Python. Sections follow CHOICES_COCKTAIL order (without "None") and are kept
+        even when empty, so a new spirit only needs a new choice.
+        """
+        sections = {value: [] for value, _ in CHOICES_COCKTAIL if value != "None"}
+        cocktails = self.filter(base_alcohol__in=sections).order_by('base_alcohol', 'name')
+        for base_alcohol, group in groupby(cocktails, key=attrgetter('base_alcohol')):
+            sections[base_alcohol].extend(group)
+        return [(label, sections[value]) for value, label in CHOICES_COCKTAIL if value in sections]
+
+    def with_base_alcohol(self, base_alcohol):
+        return self.filter(base_alcohol=base_alcohol)
+
+    def with_menu_relations(self):
+        """
+        Returns cocktails with their category joined and ingredients prefetched by name,
+        so rendering a cocktail with its relations costs no extra queries.
+        """
+        return self.select_related('category').prefetch_related(
+            models.Prefetch('ingredients', queryset=CocktailIngredient.objects.order_by('name'))
+        )
 
 
 class CocktailManager(models.Manager):
@@ -74,6 +175,18 @@ class CocktailManager(models.Manager):
     def cheap(self, max_price):
         return self.get_queryset().cheap(max_price)
 
+    def price_range(self, min_price=None, max_price=None):
+        return self.get_queryset().price_range(min_price, max_price)
+
+    def menu_sections(self):
+        return self.get_queryset().menu_sections()
+
+    def with_base_alcohol(self, base_alcohol):
+        return self.get_queryset().with_base_alcohol(base_alcohol)
+
+    def with_menu_relations(self):
+        return self.get_queryset().with_menu_relations()
+
 
 class Cocktail(models.Model):
     name = models.CharField(max_length=50, unique=True, null=False)
@@ -83,6 +196,10 @@ class Cocktail(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     base_alcohol = models.CharField(choices=CHOICES_COCKTAIL, max_length=9, null=False)
     image = models.ImageField(upload_to="images/", null=True, blank=True)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    image_status = models.CharField(choices=CHOICES_IMAGE_STATUS, max_length=10, default="ready", editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     objects = CocktailManager()
 
@@ -92,14 +209,16 @@ class Cocktail(models.Model):
     class Meta:
         verbose_name_plural = "Cocktails"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['price', 'name'], name='bar_cocktail_price_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - Price: {self.price}$ - Base alcohol: {self.base_alcohol}"
 
 
-class FoodQuerySet(models.QuerySet):
-    def cheap(self, max_price):
-        return self.filter(price__lte=max_price)
+class FoodQuerySet(PriceRangeQuerySet):
+    pass
 
 
 class FoodManager(models.Manager):
@@ -109,12 +228,17 @@ class FoodManager(models.Manager):
     def cheap(self, max_price):
         return self.get_queryset().cheap(max_price)
 
+    def price_range(self, min_price=None, max_price=None):
+        return self.get_queryset().price_range(min_price, max_price)
+
 
 class Food(models.Model):
     name = models.CharField(max_length=50, null=False)
     price = models.DecimalField(max_digits=10, decimal_places=2, null=False)
     description = models.TextField(null=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     objects = FoodManager()
 
@@ -124,17 +248,44 @@ class Food(models.Model):
     class Meta:
         verbose_name_plural = "Food"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['price', 'name'], name='bar_food_price_name_idx'),
+            models.Index(fields=['name', 'id'], name='bar_food_name_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - Price: {self.price}$"
 
 
+class WaterPipeQuerySet(PriceRangeQuerySet):
+    def with_tobacco(self, tobacco):
+        return self.filter(tobacco=tobacco)
+
+
+class WaterPipeManager(models.Manager):
+    def get_queryset(self):
+        return WaterPipeQuerySet(self.model, using=self._db)
+
+    def cheap(self, max_price):
+        return self.get_queryset().cheap(max_price)
+
+    def price_range(self, min_price=None, max_price=None):
+        return self.get_queryset().price_range(min_price, max_price)
+
+    def with_tobacco(self, tobacco):
+        return self.get_queryset().with_tobacco(tobacco)
+
+
 class WaterPipe(models.Model):
     name = models.CharField(max_length=50, null=False)
     price = models.DecimalField(max_digits=10, decimal_places=2, null=False)
     flavour = models.CharField(max_length=150, null=False)
     tobacco = models.CharField(choices=CHOICES_TOBACCO, max_length=7, null=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = WaterPipeManager()
 
     def get_absolute_url(self):
         return reverse('water-pipe-detail', kwargs={'pk': self.pk})
@@ -142,7 +293,57 @@ class WaterPipe(models.Model):
     class Meta:
         verbose_name_plural = "Water Pipes"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['price', 'name'], name='bar_waterpipe_price_name_idx'),
+            models.Index(fields=['name', 'id'], name='bar_waterpipe_name_id_idx'),
+        ]
 
     def __str__(self):
         return (f"{self.name} - Price: {self.price}$ - "
                 f"Flavour: {self.flavour} - Tobacco: {self.tobacco}")
+
+
+class MediaJob(models.Model):
+    """
+    A cocktail image upload waiting for the media worker.
+
+    The uploaded file is kept in `payload` until the worker has stored it,
+    so web and worker processes need no shared disk. An empty payload means
+    the image was cleared.
+    """
+    cocktail = models.ForeignKey(Cocktail, on_delete=models.CASCADE, related_name='media_jobs')
+    filename = models.CharField(max_length=255, blank=True)
+    payload = models.BinaryField(null=True)
+    status = models.CharField(choices=CHOICES_JOB_STATUS, max_length=10, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Media Jobs"
+        ordering = ['run_after', 'pk']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='bar_mediajob_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f"Media job {self.pk} for cocktail {self.cocktail_id} - {self.status}"
+
+
+class MenuSnapshot(models.Model):
+    """
+    One precomputed menu section (cocktails, food or water pipes) stored as
+    a JSON document with everything the menu page renders.
+    """
+    section = models.CharField(max_length=20, primary_key=True)
+    document = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Menu Snapshots"
+
+    def __str__(self):
+        return f"Menu snapshot: {self.section}"
@@ -0,0 +1,136 @@
+"""
+Resized image renditions for Cocktail.image.
+
+Includes:
+- RENDITION_WIDTHS: target widths of the thumbnail, card and detail variants.
+- available_formats: output formats supported by the installed Pillow
+  (AVIF and WebP when available, JPEG always).
+- encode_rendition: resize an image to a width and encode it in a format
+  (also used for the static background images, see main.storage).
+- store_renditions: resize a stored image and store every variant, returning
+  their URLs and dimensions.
+- generate_renditions: store the renditions of a cocktail image and record
+  them on the cocktail.
+- delete_renditions: remove stored variants.
+
+Renditions are stored as JSON in Cocktail.image_renditions:
+    {"width": ..., "height": ..., "formats": {"webp": {"card": {"name": ..., "url": ...,
+     "width": ..., "height": ...}, ...}, ...}}
+"""
+
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+
+RENDITION_WIDTHS = {
+    'thumbnail': 160,
+    'card': 480,
+    'detail': 960,
+}
+
+RENDITION_FORMATS = {
+    'avif': ('AVIF', 'image/avif', {'quality': 60}),
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def available_formats():
+    """
+    Return the rendition formats the installed Pillow can write, best first.
+    """
+    Image.init()
+    return [name for name, (pillow_format, _, _) in RENDITION_FORMATS.items() if pillow_format in Image.SAVE]
+
+
+def encode_rendition(original, target_width, extension):
+    """
+    Return (content, width, height) of `original` resized to `target_width`
+    and encoded as `extension`. Images are never upscaled.
+    """
+    width, height = original.size
+    target_width = min(target_width, width)
+    target_height = max(1, round(height * target_width / width))
+    pillow_format, _, save_options = RENDITION_FORMATS[extension]
+    resized = original.resize((target_width, target_height), Image.LANCZOS)
+    if pillow_format == 'JPEG' and resized.mode not in ('RGB', 'L'):
+        resized = resized.convert('RGB')
+    buffer = BytesIO()
+    resized.save(buffer, pillow_format, **save_options)
+    return buffer.getvalue(), target_width, target_height
+
+
+def _rendition_name(image_name, variant, extension):
+    path = PurePosixPath(image_name)
+    return f"images/renditions/{path.stem}-{variant}.{extension}"
+
+
+def delete_renditions(renditions, storage=None):
+    """
+    Delete every stored variant listed in a renditions document.
+    """
+    storage = storage or default_storage
+    for variants in (renditions or {}).get('formats', {}).values():
+        for variant in variants.values():
+            storage.delete(variant['name'])
+
+
+def store_renditions(image_name, storage):
+    """
+    Store the variants of the image `image_name` in `storage`, which the
+    image is read from as well, and return their renditions document ({} for
+    no image).
+
+    Variants are never upscaled: widths larger than the original are replaced
+    by the original width. If storing fails, the variants stored so far are
+    deleted.
+    """
+    if not image_name:
+        return {}
+    with storage.open(image_name, 'rb') as source, Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    width, height = original.size
+    renditions = {'width': width, 'height': height, 'formats': {}}
+    try:
+        for extension in available_formats():
+            variants = renditions['formats'][extension] = {}
+            for variant, target_width in RENDITION_WIDTHS.items():
+                content, target_width, target_height = encode_rendition(original, target_width, extension)
+                name = storage.save(_rendition_name(image_name, variant, extension), ContentFile(content))
+                variants[variant] = {
+                    'name': name,
+                    'url': storage.url(name),
+                    'width': target_width,
+                    'height': target_height,
+                }
+    except Exception:
+        delete_renditions(renditions, storage)
+        raise
+    return renditions
+
+
+def generate_renditions(cocktail, storage=None, save=True):
+    """
+    Generate, store and record the renditions of a cocktail image.
+
+    The image is read from, and the variants are written to, `storage` (the
+    image field's storage by default). Previously stored renditions are
+    deleted once the current transaction commits. Unless `save` is False,
+    the cocktail is saved with only `image_renditions` and `updated_at`
+    updated.
+    """
+    storage = storage or cocktail.image.storage
+    old_renditions = cocktail.image_renditions
+    renditions = store_renditions(cocktail.image.name, storage)
+    cocktail.image_renditions = renditions
+    if save:
+        cocktail.save(update_fields=['image_renditions', 'updated_at'])
+    transaction.on_commit(lambda: delete_renditions(old_renditions, storage))
+    return renditions
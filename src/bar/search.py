@@ -0,0 +1,212 @@
+"""
+Full-text search over cocktails, food and water pipes.
+
+Includes:
+- refresh_search_vectors: recompute the stored `search_vector` of a
+  queryset with one UPDATE (cocktail ingredient names included).
+- search_queryset: filter a Cocktail, Food or WaterPipe queryset by a search
+  query, ordered by relevance.
+- search_catalog: the best matches of every searchable model.
+
+On PostgreSQL the query is matched against the stored tsvector (GIN index)
+or, for typos, by trigram similarity of the name (pg_trgm GIN index). Other
+databases, such as SQLite in tests and local development, use
+MemorySearchIndex: an in-process token index with fuzzy matching, rebuilt
+whenever a menu snapshot changes (see bar.snapshots).
+"""
+
+import re
+from difflib import get_close_matches
+from functools import lru_cache
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.contrib.postgres.aggregates import StringAgg
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Q, Subquery, Value, When
+
+from bar.models import Cocktail, Food, MenuSnapshot, WaterPipe
+from main.queries import unbudgeted
+
+
+SEARCH_CONFIG = 'simple'
+MAX_RESULTS = 200
+FUZZY_CUTOFF = 0.8
+# Query tokens whose vocabulary matches each MemorySearchIndex remembers.
+CLOSE_MATCH_CACHE_SIZE = 1024
+
+# Searched fields of each model with their tsvector weights.
+SEARCH_FIELDS = {
+    Cocktail: [('name', 'A'), ('description', 'B')],
+    Food: [('name', 'A'), ('description', 'B')],
+    WaterPipe: [('name', 'A'), ('flavour', 'B')],
+}
+FIELD_SCORES = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def _uses_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def _ingredient_names():
+    """
+    Returns a subquery with the space-separated ingredient names of a cocktail.
+    """
+    through = Cocktail.ingredients.through
+    return Subquery(
+        through.objects
+        .filter(cocktail_id=OuterRef('pk'))
+        .values('cocktail_id')
+        .annotate(names=StringAgg('cocktailingredient__name', ' '))
+        .values('names')
+    )
+
+
+def refresh_search_vectors(queryset):
+    """
+    Recomputes the search vector of every object in the queryset.
+
+    Does nothing outside PostgreSQL, where MemorySearchIndex is used instead.
+    """
+    if not _uses_postgres(queryset):
+        return
+    vector = None
+    for field, weight in SEARCH_FIELDS[queryset.model]:
+        part = SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    if queryset.model is Cocktail:
+        vector = vector + SearchVector(_ingredient_names(), weight='C', config=SEARCH_CONFIG)
+    queryset.update(search_vector=vector)
+
+
+class MemorySearchIndex:
+    """
+    Token index of the searchable fields, used when PostgreSQL is not.
+
+    Every query token must match a document token, either exactly or as a
+    close match (difflib ratio of at least FUZZY_CUTOFF). Matches in the name
+    score more than matches in other fields. The matches of the last
+    CLOSE_MATCH_CACHE_SIZE query tokens are cached.
+
+    Documents are stored as postings ({token: {pk: score}} per model), so a
+    search only looks at the documents of its rarest query token.
+    """
+    def __init__(self):
+        self.postings = {model: {} for model in SEARCH_FIELDS}
+        self.vocabulary = set()
+        self.candidates = lru_cache(maxsize=CLOSE_MATCH_CACHE_SIZE)(self._candidates)
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        for model, fields in SEARCH_FIELDS.items():
+            names = [field for field, _ in fields]
+            for pk, *values in model.objects.values_list('pk', *names).order_by():
+                index.add(model, pk, [(value, weight) for value, (_, weight) in zip(values, fields)])
+        ingredients = Cocktail.ingredients.through.objects.values_list('cocktail_id', 'cocktailingredient__name')
+        for pk, name in ingredients:
+            index.add(Cocktail, pk, [(name, 'C')])
+        return index
+
+    def add(self, model, pk, weighted_texts):
+        postings = self.postings[model]
+        for text, weight in weighted_texts:
+            for token in _tokens(text):
+                documents = postings.setdefault(token, {})
+                documents[pk] = max(documents.get(pk, 0), FIELD_SCORES[weight])
+                self.vocabulary.add(token)
+
+    def _candidates(self, token):
+        """
+        Returns the vocabulary tokens matching a query token, with a score factor.
+        """
+        matches = {match: 0.5 for match in get_close_matches(token, self.vocabulary, n=3, cutoff=FUZZY_CUTOFF)}
+        if token in self.vocabulary:
+            matches[token] = 1.0
+        return matches
+
+    def _token_scores(self, model, candidates):
+        """
+        Returns [(postings, factor), ...] of the candidates of a query token in a model.
+        """
+        postings = self.postings[model]
+        return [(postings[token], factor) for token, factor in candidates.items() if token in postings]
+
+    def search(self, model, query):
+        """
+        Returns {pk: score} of the documents of a model matching every query token.
+        """
+        token_scores = [self._token_scores(model, self.candidates(token)) for token in _tokens(query)]
+        if not token_scores or not all(token_scores):
+            return {}
+        token_scores.sort(key=lambda matches: sum(len(documents) for documents, _ in matches))
+        scores = {}
+        for documents, factor in token_scores[0]:
+            for pk, score in documents.items():
+                scores[pk] = max(scores.get(pk, 0), score * factor)
+        for matches in token_scores[1:]:
+            for pk in list(scores):
+                best = max((documents.get(pk, 0) * factor for documents, factor in matches), default=0)
+                if best:
+                    scores[pk] += best
+                else:
+                    del scores[pk]
+        return scores
+
+
+_memory_index = {'key': None, 'index': None}
+
+
+def get_memory_index():
+    """
+    Returns the in-process index, rebuilt when the menu snapshots changed.
+
+    Its queries are left out of query budgets, which are set for PostgreSQL.
+    """
+    with unbudgeted():
+        key = MenuSnapshot.objects.aggregate(last=Max('updated_at'))['last']
+        if _memory_index['index'] is None or _memory_index['key'] != key:
+            _memory_index['index'] = MemorySearchIndex.build()
+            _memory_index['key'] = key
+    return _memory_index['index']
+
+
+def search_queryset(queryset, query):
+    """
+    Returns the objects of the queryset matching the query, best first.
+
+    Outside PostgreSQL a query without matches returns `queryset.none()`: it
+    is evaluated without a query, but its SQL (`str(queryset.query)`) raises
+    EmptyResultSet, so callers keying on the SQL must check for EmptyQuerySet.
+    """
+    if _uses_postgres(queryset):
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return (queryset
+                .annotate(rank=SearchRank(F('search_vector'), search_query),
+                          similarity=TrigramSimilarity('name', query))
+                .filter(Q(search_vector=search_query) | Q(name__trigram_similar=query))
+                .order_by('-rank', '-similarity', 'name'))
+
+    scores = get_memory_index().search(queryset.model, query)
+    ranked = sorted(scores, key=lambda pk: -scores[pk])[:MAX_RESULTS]
+    if not ranked:
+        return queryset.none()
+    position = Case(*[When(pk=pk, then=Value(i)) for i, pk in enumerate(ranked)], output_field=IntegerField())
+    return queryset.filter(pk__in=ranked).annotate(search_position=position).order_by('search_position')
+
+
+def search_catalog(query, limit=20):
+    """
+    Returns {'cocktails': [...], 'food': [...], 'water_pipes': [...]} with
+    up to `limit` best matches of each model.
+    """
+    return {
+        'cocktails': list(search_queryset(Cocktail.objects.all(), query)[:limit]),
+        'food': list(search_queryset(Food.objects.all(), query)[:limit]),
+        'water_pipes': list(search_queryset(WaterPipe.objects.all(), query)[:limit]),
+    }
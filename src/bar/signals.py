@@ -0,0 +1,115 @@
+"""
+Signal receivers for the bar application.
+
+Any write to the catalog models bumps the catalog version once the
+surrounding transaction commits, which invalidates the cached menu pages.
+Ingredient changes (including renaming or deleting an ingredient) also
+touch `updated_at` of the affected cocktails so that their conditional GET
+validators and cached menu item markup change.
+
+Saving a cocktail, food item or water pipe, or changing cocktail
+ingredients, refreshes the full-text search vectors (see bar.search).
+
+Writes also rebuild the precomputed menu section they affect (see
+bar.snapshots) on commit. The rebuild is registered before the version
+bump, so a page rendered for the new version never reads an old snapshot.
+"""
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from bar.cache import bump_catalog_version
+from bar.models import Category, Cocktail, CocktailIngredient, Food, WaterPipe
+from bar.search import refresh_search_vectors
+from bar.snapshots import schedule_menu_snapshot_rebuild
+
+
+CATALOG_MODELS = (Category, Cocktail, CocktailIngredient, Food, WaterPipe)
+
+SEARCHABLE_MODELS = (Cocktail, Food, WaterPipe)
+
+SNAPSHOT_SECTIONS = {
+    Cocktail: 'cocktails',
+    CocktailIngredient: 'cocktails',
+    Food: 'food',
+    WaterPipe: 'water_pipes',
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_catalog_on_write(sender, **kwargs):
+    """
+    Bumps the catalog version after a catalog object is saved or deleted
+    and rebuilds the menu section showing it.
+    """
+    if sender in SNAPSHOT_SECTIONS:
+        schedule_menu_snapshot_rebuild(SNAPSHOT_SECTIONS[sender])
+    if sender in CATALOG_MODELS:
+        transaction.on_commit(bump_catalog_version)
+
+
+@receiver(m2m_changed, sender=Cocktail.ingredients.through)
+def invalidate_catalog_on_ingredients_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Touches the affected cocktails, rebuilds the cocktail menu section and
+    bumps the catalog version after the ingredients of a cocktail change.
+    """
+    if reverse and action == 'pre_clear':
+        cocktail_pks = list(instance.cocktail_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove') or (action == 'post_clear' and not reverse):
+        cocktail_pks = pk_set if reverse else [instance.pk]
+    else:
+        return
+    Cocktail.objects.filter(pk__in=cocktail_pks).update(updated_at=timezone.now())
+    schedule_menu_snapshot_rebuild('cocktails')
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=CocktailIngredient)
+def touch_cocktails_on_ingredient_save(sender, instance, created, **kwargs):
+    """
+    Touches the cocktails using a renamed ingredient, whose menu item
+    markup is cached under their `updated_at` (see bar.fragments).
+    """
+    if not created:
+        Cocktail.objects.filter(ingredients=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save)
+def refresh_search_vector_on_save(sender, instance, **kwargs):
+    """
+    Refreshes the search vector of a saved item, or of the cocktails using
+    a saved ingredient.
+    """
+    if sender in SEARCHABLE_MODELS:
+        refresh_search_vectors(sender.objects.filter(pk=instance.pk))
+    elif sender is CocktailIngredient and not kwargs.get('created'):
+        refresh_search_vectors(Cocktail.objects.filter(ingredients=instance))
+
+
+@receiver(pre_delete, sender=CocktailIngredient)
+def remember_cocktails_of_deleted_ingredient(sender, instance, **kwargs):
+    instance._search_cocktail_pks = list(instance.cocktail_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=CocktailIngredient)
+def refresh_search_vectors_on_ingredient_delete(sender, instance, **kwargs):
+    cocktails = Cocktail.objects.filter(pk__in=getattr(instance, '_search_cocktail_pks', []))
+    cocktails.update(updated_at=timezone.now())
+    refresh_search_vectors(cocktails)
+
+
+@receiver(m2m_changed, sender=Cocktail.ingredients.through)
+def refresh_search_vectors_on_ingredients_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Refreshes the search vectors of cocktails whose ingredients changed.
+    """
+    if reverse and action == 'pre_clear':
+        instance._search_cocktail_pks = list(instance.cocktail_set.values_list('pk', flat=True))
+    elif reverse and action == 'post_clear':
+        refresh_search_vectors(Cocktail.objects.filter(pk__in=instance._search_cocktail_pks))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        refresh_search_vectors(Cocktail.objects.filter(pk__in=pk_set if reverse else [instance.pk]))
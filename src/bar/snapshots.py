@@ -0,0 +1,160 @@
+"""
+Precomputed menu sections for the public menu pages.
+
+Includes:
+- SECTION_BUILDERS: functions building the JSON document of each section
+  ("cocktails", "food" and "water_pipes") from the catalog tables.
+- rebuild_menu_snapshot / rebuild_all_menu_snapshots: store fresh documents.
+- schedule_menu_snapshot_rebuild: rebuild a section once the current
+  transaction commits.
+- get_menu_snapshot / aget_menu_snapshot: load a section with a single
+  primary-key lookup, building it first when it does not exist yet.
+
+Rebuilding a section that already had a snapshot publishes the differences
+to the live menu boards (see bar.live). Items carry their `updated_at`,
+which keys their cached markup (see bar.fragments).
+
+Snapshots are rebuilt by the signal receivers in bar.signals. Bulk writes
+that bypass signals (the catalog import) call rebuild_all_menu_snapshots
+themselves; `python manage.py rebuild_menu_snapshots` does the same after
+changes made outside Django.
+"""
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from bar.fragments import bulk_reverse
+from bar.live import diff_menu_documents, publish_menu_events
+from bar.models import CHOICES_TOBACCO, Cocktail, Food, MenuSnapshot, WaterPipe
+from main.queries import unbudgeted
+
+
+def build_cocktails_document():
+    """
+    Returns cocktails grouped by base alcohol as [label, items] pairs, with
+    prices as strings, ingredient names joined and detail URLs resolved.
+    """
+    sections = Cocktail.objects.with_menu_relations().menu_sections()
+    urls = bulk_reverse('cocktail-details', [cocktail.pk for _, cocktails in sections for cocktail in cocktails])
+    return {
+        'sections': [
+            [label, [
+                {
+                    'id': cocktail.pk,
+                    'name': cocktail.name,
+                    'price': str(cocktail.price),
+                    'ingredients': ', '.join(ingredient.name for ingredient in cocktail.ingredients.all()),
+                    'url': urls[cocktail.pk],
+                    'updated_at': cocktail.updated_at.isoformat(),
+                }
+                for cocktail in cocktails
+            ]]
+            for label, cocktails in sections
+        ],
+    }
+
+
+def build_food_document():
+    """
+    Returns every food item ordered by name.
+    """
+    return {
+        'items': [
+            {'id': pk, 'name': name, 'price': str(price), 'description': description,
+             'updated_at': updated_at.isoformat()}
+            for pk, name, price, description, updated_at
+            in Food.objects.values_list('pk', 'name', 'price', 'description', 'updated_at')
+        ],
+    }
+
+
+def build_water_pipes_document():
+    """
+    Returns water pipes ordered by name and grouped by tobacco type.
+    """
+    sections = {value: [] for value, _ in CHOICES_TOBACCO if value != "None"}
+    pipes = WaterPipe.objects.filter(tobacco__in=sections).values_list(
+        'pk', 'name', 'price', 'flavour', 'tobacco', 'updated_at')
+    for pk, name, price, flavour, tobacco, updated_at in pipes:
+        sections[tobacco].append({'id': pk, 'name': name, 'price': str(price), 'flavour': flavour,
+                                  'updated_at': updated_at.isoformat()})
+    return {'sections': sections}
+
+
+SECTION_BUILDERS = {
+    'cocktails': build_cocktails_document,
+    'food': build_food_document,
+    'water_pipes': build_water_pipes_document,
+}
+
+
+def rebuild_menu_snapshot(section):
+    """
+    Builds and stores the document of one menu section, publishes the
+    changes since the previous document and returns it.
+    """
+    previous = MenuSnapshot.objects.filter(pk=section).values_list('document', flat=True).first()
+    document = SECTION_BUILDERS[section]()
+    MenuSnapshot.objects.update_or_create(section=section, defaults={'document': document})
+    if previous is not None:
+        publish_menu_events(diff_menu_documents(section, previous, document))
+    return document
+
+
+def rebuild_all_menu_snapshots():
+    for section in SECTION_BUILDERS:
+        rebuild_menu_snapshot(section)
+
+
+class _SnapshotRebuild:
+    """
+    On-commit callback rebuilding one section. `pending` is set while the
+    callback waits for a commit, so scheduling can skip duplicates.
+    """
+    def __init__(self, section):
+        self.section = section
+        self.pending = False
+
+    def __call__(self):
+        self.pending = False
+        rebuild_menu_snapshot(self.section)
+
+
+_REBUILD_CALLBACKS = {section: _SnapshotRebuild(section) for section in SECTION_BUILDERS}
+
+
+def schedule_menu_snapshot_rebuild(section):
+    """
+    Rebuilds a menu section when the current transaction commits.
+
+    The rebuild is registered once per transaction, so deleting a category
+    with hundreds of cascaded items rebuilds each section only once.
+    """
+    callback = _REBUILD_CALLBACKS[section]
+    if callback.pending and any(func is callback for _, func, *_ in transaction.get_connection().run_on_commit):
+        return
+    callback.pending = True
+    transaction.on_commit(callback)
+
+
+def get_menu_snapshot(section):
+    """
+    Returns the stored document of a menu section, building it when missing
+    (outside the query budget of the view).
+    """
+    document = MenuSnapshot.objects.filter(pk=section).values_list('document', flat=True).first()
+    if document is None:
+        with unbudgeted():
+            document = rebuild_menu_snapshot(section)
+    return document
+
+
+async def aget_menu_snapshot(section):
+    """
+    Async version of get_menu_snapshot().
+    """
+    document = await MenuSnapshot.objects.filter(pk=section).values_list('document', flat=True).afirst()
+    if document is None:
+        with unbudgeted():
+            document = await sync_to_async(rebuild_menu_snapshot)(section)
+    return document
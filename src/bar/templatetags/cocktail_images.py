@@ -0,0 +1,53 @@
+"""
+Template tags rendering responsive cocktail images.
+
+Usage:
+    {% load cocktail_images %}
+    {% cocktail_picture cocktail sizes="(max-width: 768px) 100vw, 50vw" %}
+"""
+
+from django import template
+
+from bar.renditions import RENDITION_FORMATS
+
+
+register = template.Library()
+
+
+def _srcset(variants):
+    """
+    Return a srcset value listing each distinct width of a format once.
+    """
+    widths = {}
+    for variant in variants.values():
+        widths.setdefault(variant['width'], variant['url'])
+    return ', '.join(f"{url} {width}w" for width, url in sorted(widths.items()))
+
+
+@register.inclusion_tag('bar/includes/cocktail_picture.html')
+def cocktail_picture(cocktail, variant='detail', sizes='100vw', lazy=False, style=''):
+    """
+    Render a <picture> with AVIF/WebP sources and a JPEG <img> carrying
+    srcset, sizes, width and height. Cocktails without renditions fall back
+    to the original image URL.
+    """
+    formats = (cocktail.image_renditions or {}).get('formats', {})
+    fallback_format = 'jpeg' if 'jpeg' in formats else next(iter(formats), None)
+    context = {
+        'cocktail': cocktail,
+        'sizes': sizes,
+        'lazy': lazy,
+        'style': style,
+        'fallback': None,
+    }
+    if fallback_format is None:
+        return context
+
+    context['sources'] = [
+        {'type': RENDITION_FORMATS[name][1], 'srcset': _srcset(variants)}
+        for name, variants in formats.items() if name != fallback_format
+    ]
+    variants = formats[fallback_format]
+    context['fallback'] = variants.get(variant) or next(iter(variants.values()))
+    context['fallback_srcset'] = _srcset(variants)
+    return context
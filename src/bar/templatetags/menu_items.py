@@ -0,0 +1,24 @@
+"""
+Template tag rendering lists of menu items with cached markup.
+
+Usage:
+    {% load menu_items %}
+    {% menu_items cocktails 'bar.cocktail' url_name='cocktail-details' %}
+    {% menu_items pipes 'bar.waterpipe' description='flavour' label='Flavour: ' %}
+"""
+
+from django import template
+
+from bar.fragments import render_menu_items
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def menu_items(items, model, url_name=None, description=None, label='', empty=''):
+    """
+    Render every item of a list with bar/includes/menu_item.html, reusing
+    the cached markup of unchanged items (see bar.fragments).
+    """
+    return render_menu_items(items, model, url_name, description, label, empty)
@@ -0,0 +1,46 @@
+"""
+Template tags for the assets built by collectstatic (see main.storage).
+
+Usage:
+    {% load static_assets %}
+    {% css_bundle 'bar/css/bundle.css' %}
+    {% static_picture 'bar/images/food_background.jpg' alt="Food" %}
+"""
+
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+
+from main.storage import static_image_sources
+
+
+register = template.Library()
+
+
+@register.inclusion_tag('bar/includes/css_bundle.html')
+def css_bundle(name):
+    """
+    Render a <link> to a stylesheet bundle, or to each of its sources in
+    DEBUG, where the bundle has not been built.
+    """
+    sources = [name]
+    if settings.DEBUG:
+        sources = settings.STATIC_CSS_BUNDLES[name]
+    return {'hrefs': [static(source) for source in sources]}
+
+
+@register.inclusion_tag('bar/includes/static_picture.html')
+def static_picture(name, alt='', sizes='(max-width: 768px) 100vw, 50vw'):
+    """
+    Render a <picture> with AVIF/WebP sources for a static image and the
+    original image as the <img> fallback.
+    """
+    return {
+        'src': static(name),
+        'alt': alt,
+        'sizes': sizes,
+        'sources': [
+            {'type': mime_type, 'srcset': ', '.join(f"{static(variant)} {width}w" for width, variant in variants)}
+            for mime_type, variants in static_image_sources(name)
+        ],
+    }
@@ -1,14 +1,47 @@
+import asyncio
+import gzip
+import json
 import tempfile
-from django.test import TestCase
+import time
+from concurrent.futures import ThreadPoolExecutor
+from difflib import get_close_matches
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.template import engines
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from bar.forms import PriceRangeForm
+from bar.fragments import bulk_reverse, get_fragment_cache, render_menu_items
+from bar.live import broadcaster, listen_connection
 from bar.models import (
     Category,
     CocktailIngredient,
     Cocktail,
     Food,
+    MenuSnapshot,
     WaterPipe,
 )
+from bar.search import CLOSE_MATCH_CACHE_SIZE, MemorySearchIndex, search_queryset
+from bar.views import CocktailsView
+from bar.snapshots import get_menu_snapshot, rebuild_menu_snapshot
+from main.benchmarks import find_regressions, run_suite
+from main.cache import WAIT_TIMEOUT, aget_or_compute, get_or_compute, invalidate_namespace, namespaced_key
+from main.metrics import Histogram, registry
+from main.queries import QueryAnalysisMiddleware, QueryBudgetExceeded, fingerprint
+from main.storage import StaticAssetsStorage, minify_css
+from main.templating import warm_templates
+from main.testing import QueryBudgetTestRunner
+from PIL import Image
 
 """
 Tests for models in the `bar` application.
@@ -54,26 +87,27 @@ class CocktailModelTest(TestCase):
     """TestCase for the Cocktail model, including the cheap() manager."""
 
     def setUp(self):
-        """Create categories, ingredients, and cocktails for testing."""
-        self.category = Category.objects.create(name="Cat")
-        self.ing1 = CocktailIngredient.objects.create(name="Gin")
-        self.ing2 = CocktailIngredient.objects.create(name="Vodka")
-        self.cocktail1 = Cocktail.objects.create(
-            name="CheapCocktail",
-            price="5.00",
-            description="Cheap",
-            category=self.category,
-            base_alcohol="Gin",
-        )
-        self.cocktail1.ingredients.set([self.ing1, self.ing2])
-        self.cocktail2 = Cocktail.objects.create(
-            name="ExpensiveCocktail",
-            price="15.00",
-            description="Expensive",
-            category=self.category,
-            base_alcohol="Vodka",
-        )
-        self.cocktail2.ingredients.set([self.ing1])
+        """Create and commit categories, ingredients, and cocktails for testing."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name="Cat")
+            self.ing1 = CocktailIngredient.objects.create(name="Gin")
+            self.ing2 = CocktailIngredient.objects.create(name="Vodka")
+            self.cocktail1 = Cocktail.objects.create(
+                name="CheapCocktail",
+                price="5.00",
+                description="Cheap",
+                category=self.category,
+                base_alcohol="Gin",
+            )
+            self.cocktail1.ingredients.set([self.ing1, self.ing2])
+            self.cocktail2 = Cocktail.objects.create(
+                name="ExpensiveCocktail",
+                price="15.00",
+                description="Expensive",
+                category=self.category,
+                base_alcohol="Vodka",
+            )
+            self.cocktail2.ingredients.set([self.ing1])
 
     def test_str(self):
         """Ensure __str__ returns formatted string with price and base alcohol."""
@@ -91,6 +125,33 @@ class CocktailModelTest(TestCase):
         self.assertIn(self.cocktail1, cheap_qs)
         self.assertNotIn(self.cocktail2, cheap_qs)
 
+    def test_menu_sections(self):
+        """Ensure menu_sections() groups cocktails by base alcohol in choice order."""
+        with self.assertNumQueries(1):
+            sections = dict(Cocktail.objects.menu_sections())
+        self.assertEqual(list(sections), ["Gin", "Vodka", "Rum", "Tequila", "Whisky"])
+        self.assertEqual(sections["Gin"], [self.cocktail1])
+        self.assertEqual(sections["Vodka"], [self.cocktail2])
+        self.assertEqual(sections["Rum"], [])
+
+    def test_cocktails_view_query_count(self):
+        """Ensure the cocktails page loads every section with two queries:
+        the menu snapshot and one aggregate for the conditional GET validators."""
+        cache.clear()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('cocktails'))
+        self.assertContains(response, "CheapCocktail")
+        self.assertContains(response, "Whisky Based Cocktails")
+
+    def test_detail_view_query_count(self):
+        """Ensure the detail page loads category and ingredients without N+1 queries."""
+        url = reverse('cocktail-details', kwargs={'pk': self.cocktail1.pk})
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertContains(response, "Gin")
+        self.assertContains(response, "Vodka")
+
 
 class FoodModelTest(TestCase):
     """TestCase for the Food model, including the cheap() manager."""
@@ -151,3 +212,705 @@ class WaterPipeModelTest(TestCase):
         """Ensure get_absolute_url returns the correct detail URL."""
         url = reverse('water-pipe-detail', kwargs={'pk': self.pipe.pk})
         self.assertEqual(self.pipe.get_absolute_url(), url)
+
+
+class MenuPageCacheTest(TestCase):
+    """TestCase for the versioned menu page cache."""
+
+    def setUp(self):
+        """Commit a food item and start from an empty cache."""
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name="FoodCat")
+            self.food = Food.objects.create(
+                name="Bread",
+                price="2.50",
+                description="Tasty",
+                category=self.category,
+            )
+
+    def test_cached_page_needs_no_queries(self):
+        """Ensure a repeated menu request is served without database queries."""
+        self.client.get(reverse('food'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('food'))
+        self.assertContains(response, "Bread")
+
+    def test_write_invalidates_cached_page(self):
+        """Ensure saving a catalog object serves a freshly rendered page."""
+        self.client.get(reverse('food'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.food.name = "Baguette"
+            self.food.save()
+        response = self.client.get(reverse('food'))
+        self.assertContains(response, "Baguette")
+
+    def test_ingredient_change_invalidates_cached_page(self):
+        """Ensure changing cocktail ingredients invalidates the cached menu."""
+        cocktail = Cocktail.objects.create(
+            name="Mojito",
+            price="6.00",
+            description="Fresh",
+            category=self.category,
+            base_alcohol="Rum",
+        )
+        self.client.get(reverse('cheap-cocktails'))
+        with self.captureOnCommitCallbacks(execute=True):
+            cocktail.ingredients.add(CocktailIngredient.objects.create(name="Mint"))
+        response = self.client.get(reverse('cheap-cocktails'))
+        self.assertContains(response, "Mint")
+
+
+class ConditionalGetTest(TestCase):
+    """TestCase for ETag / Last-Modified handling on menu and detail pages."""
+
+    def setUp(self):
+        """Commit a cocktail with an ingredient and start from an empty cache."""
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name="Cat")
+            self.ingredient = CocktailIngredient.objects.create(name="Lime")
+            self.cocktail = Cocktail.objects.create(
+                name="Daiquiri",
+                price="7.00",
+                description="Sour",
+                category=self.category,
+                base_alcohol="Rum",
+            )
+            self.cocktail.ingredients.add(self.ingredient)
+
+    def test_menu_not_modified(self):
+        """Ensure a matching If-None-Match returns 304 without rendering."""
+        response = self.client.get(reverse('cocktails'))
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('cocktails'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_detail_etag_changes_with_ingredients(self):
+        """Ensure editing an ingredient changes the cocktail detail ETag."""
+        url = reverse('cocktail-details', kwargs={'pk': self.cocktail.pk})
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.name = "Lemon"
+            self.ingredient.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, "Lemon")
+
+    async def test_async_views_under_asgi(self):
+        """Ensure the async views render, revalidate and 404 through the ASGI handler."""
+        response = await self.async_client.get(reverse('cocktails'))
+        self.assertContains(response, "Daiquiri")
+        response = await self.async_client.get(reverse('cocktails'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.get(reverse('cocktail-details', kwargs={'pk': self.cocktail.pk}))
+        self.assertContains(response, "Lime")
+        response = await self.async_client.get(reverse('cocktail-details', kwargs={'pk': self.cocktail.pk + 1}))
+        self.assertEqual(response.status_code, 404)
+
+        response = await self.async_client.get(reverse('cheap-cocktails'), {'max_price': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class MenuSnapshotTest(TestCase):
+    """TestCase for the precomputed menu sections."""
+
+    def setUp(self):
+        """Commit a category with food and a water pipe."""
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name="Cat")
+            self.food = Food.objects.create(name="Bread", price="2.50", description="Tasty", category=self.category)
+            WaterPipe.objects.create(name="Apple", price="20.00", flavour="Apple", tobacco="Dark",
+                                     category=self.category)
+
+    def test_write_rebuilds_only_its_section(self):
+        """Ensure saving food rebuilds the food section and leaves the others untouched."""
+        pipes_updated_at = MenuSnapshot.objects.get(pk='water_pipes').updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            self.food.price = "3.00"
+            self.food.save()
+        self.assertEqual(get_menu_snapshot('food')['items'][0]['price'], "3.00")
+        self.assertEqual(MenuSnapshot.objects.get(pk='water_pipes').updated_at, pipes_updated_at)
+
+    def test_cascade_rebuilds_each_section_once(self):
+        """Ensure deleting a category with many items schedules one rebuild per section."""
+        Food.objects.bulk_create([
+            Food(name=f"Food {i}", price="1.00", description="", category=self.category) for i in range(20)
+        ])
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.category.delete()
+        rebuilds = [callback.section for callback in callbacks if hasattr(callback, 'section')]
+        self.assertEqual(sorted(rebuilds), ['food', 'water_pipes'])
+        self.assertEqual(get_menu_snapshot('food')['items'], [])
+
+    def test_menu_served_from_snapshot(self):
+        """Ensure the menu page reads the snapshot instead of the food table."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('food'))
+        self.assertContains(response, "Bread")
+        self.assertFalse([query for query in queries if 'bar_food' in query['sql']])
+
+
+class MenuApiTest(TestCase):
+    """TestCase for the read-only JSON menu API."""
+
+    def setUp(self):
+        """Commit three cocktails and two water pipes."""
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name="Cat")
+            mint = CocktailIngredient.objects.create(name="Mint")
+            lime = CocktailIngredient.objects.create(name="Lime")
+            self.cocktails = []
+            for name, base_alcohol in (("Mojito", "Rum"), ("Daiquiri", "Rum"), ("Gimlet", "Gin")):
+                cocktail = Cocktail.objects.create(name=name, price="7.50", description="Fresh " * 40,
+                                                   category=self.category, base_alcohol=base_alcohol)
+                cocktail.ingredients.set([mint, lime])
+                self.cocktails.append(cocktail)
+            WaterPipe.objects.create(name="Apple", price="20.00", flavour="Apple", tobacco="Dark",
+                                     category=self.category)
+            WaterPipe.objects.create(name="Mint", price="20.00", flavour="Mint", tobacco="Light",
+                                     category=self.category)
+
+    def test_fields_and_filters(self):
+        """Ensure ?fields= selects columns and ?base_alcohol= filters, reading the page
+        and its ingredients with two queries (plus three validator aggregates)."""
+        cache.clear()
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('api-cocktails'), {'fields': 'name,ingredients', 'base_alcohol': 'Rum'})
+        self.assertEqual(response.json(), {
+            'results': [
+                {'name': "Mojito", 'ingredients': ["Lime", "Mint"]},
+                {'name': "Daiquiri", 'ingredients': ["Lime", "Mint"]},
+            ],
+            'next': None,
+        })
+        response = self.client.get(reverse('api-water-pipes'), {'tobacco': 'Light', 'fields': 'name,price'})
+        self.assertEqual(response.json()['results'], [{'name': "Mint", 'price': "20.00"}])
+
+    def test_invalid_parameters(self):
+        """Ensure unknown fields and filter values return a JSON 400 error."""
+        for query in ({'fields': 'name,secret'}, {'base_alcohol': 'Milk'}, {'limit': '0'}, {'max_price': 'x'}):
+            response = self.client.get(reverse('api-cocktails'), query)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+
+    def test_cursor_pagination(self):
+        """Ensure `next` continues after the last primary key of the page."""
+        response = self.client.get(reverse('api-cocktails'), {'fields': 'id', 'limit': 2})
+        page = response.json()
+        self.assertEqual([row['id'] for row in page['results']], [c.pk for c in self.cocktails[:2]])
+        page = self.client.get(page['next']).json()
+        self.assertEqual(page, {'results': [{'id': self.cocktails[2].pk}], 'next': None})
+
+    def test_etag_and_gzip(self):
+        """Ensure responses revalidate with their ETag and are gzip-compressed on request."""
+        response = self.client.get(reverse('api-cocktails'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 3)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('api-cocktails'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class LiveMenuTest(TestCase):
+    """TestCase for the live menu events."""
+
+    def setUp(self):
+        """Commit a category with one water pipe."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name="Cat")
+            self.pipe = WaterPipe.objects.create(name="Mint", price="20.00", flavour="Mint", tobacco="Light",
+                                                 category=self.category)
+
+    def test_committed_changes_are_published(self):
+        """Ensure price changes, additions and removals become events."""
+        with mock.patch.object(broadcaster, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.pipe.price = "22.00"
+                self.pipe.save()
+                added = WaterPipe.objects.create(name="Apple", price="18.00", flavour="Apple", tobacco="Light",
+                                                 category=self.category)
+            self.assertEqual(publish.call_args.args[0], [
+                {'section': 'water_pipes', 'type': 'added', 'id': added.pk, 'group': 'Light', 'before': self.pipe.pk,
+                 'item': {'id': added.pk, 'name': 'Apple', 'price': '18.00', 'flavour': 'Apple'}},
+                {'section': 'water_pipes', 'type': 'changed', 'id': self.pipe.pk,
+                 'item': {'id': self.pipe.pk, 'name': 'Mint', 'price': '22.00', 'flavour': 'Mint'}},
+            ])
+
+            pk = self.pipe.pk
+            with self.captureOnCommitCallbacks(execute=True):
+                self.pipe.delete()
+            self.assertEqual(publish.call_args.args[0], [
+                {'section': 'water_pipes', 'type': 'removed', 'id': pk},
+            ])
+
+    def test_menu_page_markup(self):
+        """Ensure the menu page exposes the items and the stream to the client script."""
+        response = self.client.get(reverse('water-pipe'))
+        self.assertContains(response, f'data-item-id="{self.pipe.pk}"')
+        self.assertContains(response, 'data-live-url="/menu_events/"')
+        self.assertContains(response, 'bar/js/live_menu')
+
+    @override_settings(LIVE_MENU_LISTEN_DATABASE={'HOST': 'db.internal', 'PORT': '5432'})
+    def test_listen_connection_bypasses_pooler(self):
+        """Ensure the LISTEN connection uses LIVE_MENU_LISTEN_DATABASE without changing the default connection."""
+        listener = listen_connection()
+        self.addCleanup(listener.close)
+        self.assertEqual((listener.settings_dict['HOST'], listener.settings_dict['PORT']), ('db.internal', '5432'))
+        self.assertEqual(listener.settings_dict['NAME'], connection.settings_dict['NAME'])
+        self.assertNotEqual(connection.settings_dict['HOST'], 'db.internal')
+
+    def test_wsgi_stream_is_disabled(self):
+        """Ensure the stream answers 204 when not served by ASGI."""
+        self.assertEqual(self.client.get(reverse('menu-events')).status_code, 204)
+
+    async def test_event_stream(self):
+        """Ensure events are streamed and missed events are replayed by Last-Event-ID."""
+        response = await self.async_client.get(reverse('menu-events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b"retry: 3000\n\n")
+        event = {'section': 'food', 'type': 'removed', 'id': 1}
+        broadcaster.publish([event])
+        message = (await anext(stream)).decode()
+        event_id = message.split("\n")[0].removeprefix("id: ")
+        self.assertEqual(json.loads(message.split("data: ")[1]), event)
+        await stream.aclose()
+
+        broadcaster.publish([{'section': 'food', 'type': 'removed', 'id': 2}])
+        response = await self.async_client.get(reverse('menu-events'), headers={'Last-Event-ID': event_id})
+        stream = response.streaming_content
+        await anext(stream)
+        self.assertIn('"id":2', (await anext(stream)).decode())
+        await stream.aclose()
+
+        response = await self.async_client.get(reverse('menu-events'), headers={'Last-Event-ID': "unknown-1"})
+        stream = response.streaming_content
+        await anext(stream)
+        self.assertIn('"type":"reload"', (await anext(stream)).decode())
+        await stream.aclose()
+
+
+class MenuSearchTest(TestCase):
+    """TestCase for the menu search (in-memory engine outside PostgreSQL)."""
+
+    def setUp(self):
+        """Commit cocktails, food and a water pipe to search."""
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name="Cat")
+            self.mint = CocktailIngredient.objects.create(name="Mint")
+            self.mojito = Cocktail.objects.create(name="Mojito", price="6.00", description="Rum with lime",
+                                                  category=self.category, base_alcohol="Rum")
+            self.mojito.ingredients.add(self.mint)
+            self.daiquiri = Cocktail.objects.create(name="Daiquiri", price="7.00", description="Like a mojito",
+                                                    category=self.category, base_alcohol="Rum")
+            Food.objects.create(name="Nachos", price="5.00", description="With lime salsa", category=self.category)
+            WaterPipe.objects.create(name="Fresh", price="20.00", flavour="Mint and lime", tobacco="Light",
+                                     category=self.category)
+
+    def test_ranking_and_typos(self):
+        """Ensure name matches rank first and misspelled words still match."""
+        self.assertEqual(list(search_queryset(Cocktail.objects.all(), "mojito")), [self.mojito, self.daiquiri])
+        self.assertEqual(list(search_queryset(Cocktail.objects.all(), "mojitto")), [self.mojito, self.daiquiri])
+        self.assertEqual(list(search_queryset(Cocktail.objects.all(), "mint")), [self.mojito])
+        self.assertFalse(search_queryset(Cocktail.objects.all(), "whisky").exists())
+
+    def test_index_follows_catalog_changes(self):
+        """Ensure the index is rebuilt after a committed change."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mint.name = "Basil"
+            self.mint.save()
+        self.assertFalse(search_queryset(Cocktail.objects.all(), "mint").exists())
+        self.assertEqual(list(search_queryset(Cocktail.objects.all(), "basil")), [self.mojito])
+
+    def test_close_match_cache_is_bounded(self):
+        """Ensure the fuzzy matches of at most CLOSE_MATCH_CACHE_SIZE query tokens are kept."""
+        index = MemorySearchIndex.build()
+        with mock.patch('bar.search.get_close_matches', wraps=get_close_matches) as close_matches:
+            for number in range(CLOSE_MATCH_CACHE_SIZE + 10):
+                index.search(Cocktail, f"mojito{number}")
+            index.search(Cocktail, "mojitto")
+            index.search(Cocktail, "mojitto")
+        self.assertEqual(index.candidates.cache_info().currsize, CLOSE_MATCH_CACHE_SIZE)
+        self.assertEqual(close_matches.call_count, CLOSE_MATCH_CACHE_SIZE + 11)
+        self.assertEqual(index.candidates("mojitto"), {"mojito": 0.5})
+
+    def test_search_page(self):
+        """Ensure the search page lists matches of every section."""
+        response = self.client.get(reverse('search'), {'q': 'lime'})
+        self.assertContains(response, "Mojito")
+        self.assertContains(response, "Nachos")
+        self.assertContains(response, 'Flavour: <span data-field="flavour">Mint and lime</span>')
+        self.assertNotContains(response, "Daiquiri")
+
+
+class MenuFragmentCacheTest(TestCase):
+    """TestCase for the cached menu item markup."""
+
+    def setUp(self):
+        """Create two food items and start from an empty fragment cache."""
+        get_fragment_cache().clear()
+        category = Category.objects.create(name="FoodCat")
+        self.foods = [
+            Food.objects.create(name=name, price="3.00", description="Tasty", category=category)
+            for name in ("Bread", "Soup")
+        ]
+
+    def test_unchanged_items_reuse_markup(self):
+        """Ensure an item is rendered again only when its updated_at changes."""
+        html = render_menu_items(self.foods, 'bar.food', description='description')
+        self.assertIn("Bread", html)
+        self.assertIn('data-field="description">Tasty</span>', html)
+
+        self.foods[0].name = "Baguette"
+        self.assertIn("Bread", render_menu_items(self.foods, 'bar.food', description='description'))
+        self.foods[0].save()
+        html = render_menu_items(self.foods, 'bar.food', description='description')
+        self.assertIn("Baguette", html)
+        self.assertIn("Soup", html)
+
+    def test_menu_page_reuses_markup(self):
+        """Ensure a fresh render of the menu page reads every item from the fragment cache."""
+        rebuild_menu_snapshot('food')
+        self.client.get(reverse('food'))
+        cache.clear()
+        with mock.patch('bar.fragments._item_fields') as item_fields:
+            response = self.client.get(reverse('food'))
+        item_fields.assert_not_called()
+        self.assertContains(response, 'class="menu-item"', count=2)
+
+    def test_ingredient_rename_refreshes_cocktails(self):
+        """Ensure renaming an ingredient re-renders the cocktails listing it."""
+        with self.captureOnCommitCallbacks(execute=True):
+            mint = CocktailIngredient.objects.create(name="Mint")
+            cocktail = Cocktail.objects.create(name="Mojito", price="6.00", description="Fresh",
+                                               category=self.foods[0].category, base_alcohol="Rum")
+            cocktail.ingredients.add(mint)
+        self.assertContains(self.client.get(reverse('cheap-cocktails')), "Mint")
+        with self.captureOnCommitCallbacks(execute=True):
+            mint.name = "Basil"
+            mint.save()
+        self.assertContains(self.client.get(reverse('cheap-cocktails')), "Basil")
+
+    def test_bulk_reverse(self):
+        """Ensure bulk URLs match reverse() for every pk."""
+        self.assertEqual(bulk_reverse('cocktail-details', [1, 42]), {
+            1: reverse('cocktail-details', kwargs={'pk': 1}),
+            42: reverse('cocktail-details', kwargs={'pk': 42}),
+        })
+
+
+class PriceRangeViewTest(TestCase):
+    """TestCase for the price-range filtering of the cheap views."""
+
+    def setUp(self):
+        """Create food items at several prices and start from an empty cache."""
+        cache.clear()
+        self.category = Category.objects.create(name="FoodCat")
+        for name, price in [("Bread", "2.50"), ("Soup", "9.00"), ("Steak", "25.00")]:
+            Food.objects.create(name=name, price=price, description="Tasty", category=self.category)
+
+    def test_default_max_price(self):
+        """Ensure the cheap food page defaults to items up to 10.00, cheapest first."""
+        response = self.client.get(reverse('cheap-food'))
+        names = [food.name for food in response.context['cheap_foods']]
+        self.assertEqual(names, ["Bread", "Soup"])
+
+    def test_min_and_max_price(self):
+        """Ensure min_price and max_price bound the listing."""
+        response = self.client.get(reverse('cheap-food'), {'min_price': '5', 'max_price': '30'})
+        names = [food.name for food in response.context['cheap_foods']]
+        self.assertEqual(names, ["Soup", "Steak"])
+
+    def test_invalid_price(self):
+        """Ensure invalid or inverted bounds are rejected with 400."""
+        self.assertEqual(self.client.get(reverse('cheap-food'), {'max_price': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('cheap-food'), {'max_price': '-1'}).status_code, 400)
+        response = self.client.get(reverse('cheap-food'), {'min_price': '9', 'max_price': '3'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_min_price_only(self):
+        """Ensure a minimum alone keeps the default maximum, and one above it is rejected."""
+        response = self.client.get(reverse('cheap-food'), {'min_price': '5'})
+        self.assertEqual([food.name for food in response.context['cheap_foods']], ["Soup"])
+        response = self.client.get(reverse('cheap-food'), {'min_price': '11'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_price_range_validated_once(self):
+        """Ensure the query parameters are parsed once per request."""
+        with mock.patch('bar.views.PriceRangeForm', wraps=PriceRangeForm) as form:
+            response = self.client.get(reverse('cheap-food'), {'min_price': '5', 'max_price': '30'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(form.call_count, 1)
+
+
+class StaticAssetsTest(TestCase):
+    """TestCase for the collectstatic build step and its template tags."""
+
+    def test_minify_css(self):
+        """Ensure comments and redundant whitespace are dropped, significant spaces kept."""
+        css = "/* menu */\n.a > b ,\n.c {\n  margin : 0 auto;\n  width: calc(100% - 2px);\n}\ndiv :first-child { color: red; }"
+        self.assertEqual(minify_css(css),
+                         ".a>b,.c{margin :0 auto;width:calc(100% - 2px)}div :first-child{color:red}")
+
+    @override_settings(STATIC_CSS_BUNDLES={'site/css/bundle.css': ['site/css/a.css', 'lib/b.css']},
+                       STATIC_IMAGE_PREFIXES=['site/images/'], STATIC_IMAGE_WIDTHS=[8, 64])
+    def test_post_process_builds_assets(self):
+        """Ensure bundles and image variants are written and fingerprinted."""
+        with tempfile.TemporaryDirectory() as static_root:
+            # collectstatic copies the found files into STATIC_ROOT before post-processing.
+            storage = StaticAssetsStorage(location=static_root)
+            image = BytesIO()
+            Image.new('RGB', (32, 16)).save(image, 'JPEG')
+            storage.save('site/css/a.css', ContentFile(b".a {\n  background: url('../images/bg.jpg');\n}\n"))
+            storage.save('lib/b.css', ContentFile(b"/* b */ .b { color: red; }"))
+            storage.save('site/images/bg.jpg', ContentFile(image.getvalue()))
+            paths = {name: (storage, name) for name in ('site/css/a.css', 'lib/b.css', 'site/images/bg.jpg')}
+            list(storage.post_process(paths))
+
+            with storage.open('site/css/bundle.css') as bundle:
+                self.assertEqual(bundle.read().decode(), ".a{background:url('../images/bg.jpg')}\n.b{color:red}")
+            self.assertIn('site/css/bundle.css', storage.hashed_files)
+            for name in ('site/images/renditions/bg-8.webp', 'site/images/renditions/bg-32.webp'):
+                self.assertIn(name, storage.hashed_files)
+                with storage.open(name) as variant:
+                    self.assertEqual(Image.open(variant).format, 'WEBP')
+
+    def test_pages_use_built_assets(self):
+        """Ensure pages link the stylesheet bundle and offer WebP backgrounds."""
+        response = self.client.get(reverse('main2'))
+        self.assertContains(response, 'bar/css/bundle.')
+        self.assertNotContains(response, 'bar/css/menu.')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'bar/images/renditions/Bar_picture_AI_generated-480.')
+
+
+class PublicRequestTest(TestCase):
+    """TestCase for the session-free path of anonymous public requests."""
+
+    def test_anonymous_menu_request_skips_session(self):
+        """Ensure anonymous menu pages get no session and no Vary: Cookie."""
+        response = self.client.get(reverse('food'))
+        request = response.wsgi_request
+        self.assertTrue(request.is_public)
+        self.assertFalse(hasattr(request, 'session'))
+        self.assertFalse(request.user.is_authenticated)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertFalse(response.cookies)
+
+    def test_logged_in_and_admin_requests_use_full_stack(self):
+        """Ensure requests with a session and non-bar URLs keep sessions and auth."""
+        response = self.client.get(reverse('main'))
+        self.assertFalse(response.wsgi_request.is_public)
+        self.assertRedirects(response, f"{reverse('login')}?next={reverse('main')}")
+
+        user = get_user_model().objects.create_user(username="staff", password="secret")
+        self.client.force_login(user)
+        response = self.client.get(reverse('food'))
+        self.assertFalse(response.wsgi_request.is_public)
+        self.assertEqual(response.wsgi_request.user, user)
+
+
+class TieredCacheTest(TestCase):
+    """TestCase for the two-tier cache, its namespaces and single-flight recomputation."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_local_tier_and_namespaces(self):
+        """Ensure reads are served by the local tier and namespace invalidation changes keys."""
+        cache.set('greeting', 'hello')
+        cache.shared.delete('greeting')
+        self.assertEqual(cache.get('greeting'), 'hello')
+        self.assertEqual(cache.get_many(['greeting', 'other']), {'greeting': 'hello'})
+
+        key = namespaced_key('catalog', 'page')
+        invalidate_namespace('catalog')
+        self.assertNotEqual(namespaced_key('catalog', 'page'), key)
+        self.assertEqual(namespaced_key('catalog', 'page'), namespaced_key('catalog', 'page'))
+
+    def test_single_flight(self):
+        """Ensure concurrent misses compute the value once."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'menu'
+
+        with ThreadPoolExecutor(5) as pool:
+            results = list(pool.map(lambda _: get_or_compute('menu-key', compute), range(5)))
+        self.assertEqual(results, ['menu'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_waiters_stop_on_uncacheable_value(self):
+        """Ensure callers waiting for a value that is not stored compute it without waiting WAIT_TIMEOUT."""
+        def compute():
+            time.sleep(0.2)
+            return 'not found'
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(5) as pool:
+            results = list(pool.map(
+                lambda _: get_or_compute('missing-key', compute, cacheable=lambda value: False), range(5)
+            ))
+        self.assertEqual(results, ['not found'] * 5)
+        self.assertLess(time.monotonic() - start, WAIT_TIMEOUT / 2)
+        self.assertIsNone(cache.get('missing-key'))
+
+    async def test_async_waiters_stop_on_uncacheable_value(self):
+        """Ensure async callers stop waiting once the lock holder stored nothing."""
+        async def compute():
+            await asyncio.sleep(0.2)
+            return 'not found'
+
+        start = time.monotonic()
+        results = await asyncio.gather(*[
+            aget_or_compute('missing-key', compute, cacheable=lambda value: False) for _ in range(5)
+        ])
+        self.assertEqual(results, ['not found'] * 5)
+        self.assertLess(time.monotonic() - start, WAIT_TIMEOUT / 2)
+
+
+class TemplateLoadingTest(TestCase):
+    """TestCase for the template warm-up and the debug timing panel."""
+
+    def test_warm_templates_fills_cached_loader(self):
+        """Ensure warming compiles every bar and adm template into the cached loader."""
+        loader = engines['django'].engine.template_loaders[0]
+        loader.reset()
+        names = warm_templates()
+        self.assertIn('bar/bar_pages/main_page.html', names)
+        self.assertIn('adm/adm_base.html', names)
+        self.assertIn('bar/bar_pages/main_page.html', loader.get_template_cache)
+
+    def test_debug_timing_panel(self):
+        """Ensure DEBUG pages show the load and render times of their templates."""
+        timed = [{**settings.TEMPLATES[0], 'BACKEND': 'main.templating.TimedDjangoTemplates',
+                  'OPTIONS': {**settings.TEMPLATES[0]['OPTIONS'], 'loaders': settings.TEMPLATE_LOADERS}}]
+        with override_settings(DEBUG=True, TEMPLATES=timed,
+                               MIDDLEWARE=[*settings.MIDDLEWARE, 'main.templating.TemplateTimingMiddleware']):
+            response = self.client.get(reverse('main2'))
+        self.assertContains(response, 'id="template-timings"')
+        self.assertContains(response, '<td>load</td><td>bar/bar_base.html</td>')
+        self.assertContains(response, '<td>render</td><td>bar/bar_pages/main_page.html</td>')
+
+
+class RequestMetricsTest(TestCase):
+    """TestCase for the per-view request metrics and the Server-Timing header."""
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        category = Category.objects.create(name="Classics")
+        with self.captureOnCommitCallbacks(execute=True):
+            Cocktail.objects.create(name="Mojito", price="9.00", category=category)
+
+    def test_histogram_buckets(self):
+        """Ensure observations are counted in cumulative buckets with their sum."""
+        histogram = Histogram((1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(1, 2), (5, 3), ('+Inf', 4)])
+        self.assertEqual(histogram.sum, 14.5)
+
+    def test_request_recorded_per_view(self):
+        """Ensure a page records its queries, template time and size under its URL name."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cocktails'))
+        self.assertRegex(response['Server-Timing'], rf'^db;dur=[\d.]+;desc="{len(queries)} queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+
+        collected = registry.collect()
+        self.assertEqual(collected['http_request_db_queries']['cocktails'][1], len(queries))
+        self.assertEqual(collected['http_response_size_bytes']['cocktails'][1], len(response.content))
+        self.assertGreater(collected['http_request_template_duration_seconds']['cocktails'][1], 0)
+        self.assertEqual(collected['http_request_duration_seconds']['cocktails'][2], 1)
+
+        self.client.get('/no-such-page/')
+        self.assertIn('<unmatched>', registry.collect()['http_request_duration_seconds'])
+
+    async def test_async_request(self):
+        """Ensure requests served through ASGI are measured as well."""
+        response = await self.async_client.get(reverse('food'))
+        self.assertIn('Server-Timing', response)
+        self.assertIn('food', registry.collect()['http_request_duration_seconds'])
+
+
+class QueryAnalysisTest(TestCase):
+    """TestCase for the slow query / N+1 analysis and the query budgets."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Classics")
+        with self.captureOnCommitCallbacks(execute=True):
+            Cocktail.objects.create(name="Mojito", price="9.00", category=self.category)
+
+    def test_fingerprint(self):
+        """Ensure queries differing only in their parameters share a fingerprint."""
+        self.assertEqual(
+            fingerprint("SELECT \"t1\".\"id\" FROM \"t1\" WHERE \"name\" = 'Mojito' AND \"id\" IN (%s, %s) LIMIT 21"),
+            'SELECT "t1"."id" FROM "t1" WHERE "name" = ? AND "id" IN (...) LIMIT ?',
+        )
+
+    @override_settings(QUERY_ANALYSIS=True, N_PLUS_ONE_THRESHOLD=3, SLOW_QUERY_MS=0)
+    def test_repeated_and_slow_queries_logged(self):
+        """Ensure repeated and slow queries are logged with their code and template lines."""
+        template = engines['django'].from_string('{% for c in categories %}{{ c.cocktail_set.count }}{% endfor %}')
+
+        def view(request):
+            categories = [Category.objects.get(pk=self.category.pk) for _ in range(3)]
+            return HttpResponse(template.render({'categories': categories}))
+
+        with self.assertLogs('main.queries', 'WARNING') as logs:
+            QueryAnalysisMiddleware(view)(RequestFactory().get('/'))
+        repeated = [line for line in logs.output if 'Possible N+1' in line]
+        self.assertEqual(len(repeated), 2)
+        self.assertRegex('\n'.join(repeated), r'(?m)3 x SELECT "bar_category".* at bar/tests\.py:\d+$')
+        self.assertRegex('\n'.join(repeated), r'(?m)3 x SELECT COUNT.* at bar/tests\.py:\d+ \(<unknown source>:1\)$')
+        self.assertTrue(any('Slow query' in line for line in logs.output))
+
+    def test_query_budget_enforced(self):
+        """Ensure the test runner fails requests of views going over their budget."""
+        self.assertTrue(settings.QUERY_BUDGETS_ENFORCED)
+        self.client.get(reverse('cocktails'))
+        cache.clear()
+        with mock.patch.object(CocktailsView, 'query_budget', 1):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'ran 2 queries, its view allows 1'):
+                self.client.get(reverse('cocktails'))
+
+    def test_runner_restores_settings(self):
+        """Ensure the test runner turns budget enforcement off again on teardown."""
+        runner = QueryBudgetTestRunner()
+        with override_settings(QUERY_BUDGETS_ENFORCED=False), \
+                mock.patch.object(DiscoverRunner, 'setup_test_environment'), \
+                mock.patch.object(DiscoverRunner, 'teardown_test_environment'):
+            runner.setup_test_environment()
+            self.assertTrue(settings.QUERY_BUDGETS_ENFORCED)
+            runner.teardown_test_environment()
+            self.assertFalse(settings.QUERY_BUDGETS_ENFORCED)
+
+
+class BenchmarkSuiteTest(TestCase):
+    """TestCase for the route benchmark suite on a tiny catalog."""
+
+    def test_suite_covers_routes(self):
+        """Ensure every bar and adm route renders and regressions are detected."""
+        results = run_suite([20], repeat=1)
+        routes = results["20"]
+        self.assertIn("cocktails", routes)
+        self.assertIn("list-cocktail", routes)
+        self.assertTrue(all(result['status'] == 200 for result in routes.values()))
+
+        baseline = {"20": {name: dict(result) for name, result in routes.items()}}
+        self.assertEqual(find_regressions(results, baseline), [])
+        baseline["20"]["cocktails"]["queries"] -= 1
+        self.assertEqual(len(find_regressions(results, baseline)), 1)
@@ -6,12 +6,17 @@ Includes routes for:
 - Cocktails (all, detail, and cheap)
 - Food (all and cheap)
 - Water pipes (all)
+- Menu search
 - Contact page
+- Read-only JSON API (see bar.api)
+- Live menu event stream (see bar.live)
 """
 
 from django.urls import path
 from bar.views import (MainPageView, CocktailsView,CocktailDetailView, FoodListView, WaterPipeView,
-                       ContactView, CheapCocktailListView, CheapFoodListView,)
+                       ContactView, CheapCocktailListView, CheapFoodListView, SearchView,)
+from bar.api import CategoryApiView, CocktailApiView, FoodApiView, WaterPipeApiView
+from bar.live import MenuEventsView
 
 
 urlpatterns = [
@@ -34,7 +39,22 @@ urlpatterns = [
     path('water_pipe/', WaterPipeView.as_view(), name='water-pipe'),
 # BAR Water Pipes paths END
 
+# BAR Search path
+    path('search/', SearchView.as_view(), name='search'),
+# BAR Search path END
+
 # BAR Contact page path
     path('contact/', ContactView.as_view(), name='contact'),
 # BAR Contact page path END
-]
\ No newline at end of file
+
+# BAR JSON API paths
+    path('api/cocktails/', CocktailApiView.as_view(), name='api-cocktails'),
+    path('api/food/', FoodApiView.as_view(), name='api-food'),
+    path('api/water_pipes/', WaterPipeApiView.as_view(), name='api-water-pipes'),
+    path('api/categories/', CategoryApiView.as_view(), name='api-categories'),
+# BAR JSON API paths END
+
+# BAR Live menu events path
+    path('menu_events/', MenuEventsView.as_view(), name='menu-events'),
+# BAR Live menu events path END
+]
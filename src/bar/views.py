@@ -4,21 +4,93 @@ View definitions for the public-facing bar section of the website.
 Includes:
 - Main page view
 - Cocktail category and detail views
-- Filtered views for cheap cocktails and food
+- Price-range views for cheap cocktails and food (`?min_price=`, `?max_price=`)
 - Water pipe selection by tobacco type
+- Menu search (`?q=`, see bar.search)
 - Contact page view
+
+The cocktail, food and water pipe menus are read from precomputed menu
+snapshots (see bar.snapshots). Menu pages are served from the rendered-page
+cache in bar.cache, and the menu and detail pages answer conditional GET
+requests (see bar.conditional).
+
+The menu, price-range and detail views are async and read the database with
+the async ORM, so under ASGI (main.asgi) a slow query does not hold a worker
+thread. They work unchanged under WSGI, where Django runs them in an event
+loop per request.
 """
 
+from decimal import Decimal
+
+from django.core.exceptions import BadRequest
+from django.http import Http404
 from django.shortcuts import render
-from django.views.generic import ListView, DetailView
+from django.utils.functional import cached_property
 from django.views import View
-from bar.models import Category, Cocktail, CocktailIngredient, WaterPipe, Food
+from bar.cache import MenuPageCacheMixin
+from bar.conditional import ConditionalGetMixin
+from bar.forms import PriceRangeForm
+from bar.models import Category, Cocktail, CocktailIngredient, MenuSnapshot, Food
+from bar.search import search_catalog
+from bar.snapshots import aget_menu_snapshot
+
+
+class PriceRangeMixin:
+    """
+    Lists the items within the `min_price` and `max_price` query parameters.
+
+    When no maximum is given, `default_max_price` is used. Invalid values,
+    including a minimum above the default maximum when no maximum is given,
+    result in a 400 Bad Request response. The range is validated once per
+    request and kept in `price_range`. The items are exposed to
+    `template_name` as `context_object_name`.
+    """
+    model = None
+    template_name = None
+    context_object_name = None
+    default_max_price = None
+
+    def get_price_range(self):
+        """
+        Returns the validated (min_price, max_price) pair as Decimals or None.
+        """
+        form = PriceRangeForm(self.request.GET, default_max_price=self.default_max_price)
+        if not form.is_valid():
+            raise BadRequest(form.errors.as_text())
+        return form.cleaned_data['min_price'], form.cleaned_data['max_price']
+
+    @cached_property
+    def price_range(self):
+        return self.get_price_range()
+
+    def get_queryset(self):
+        """
+        Returns the items within the requested price range, ordered by price.
+        """
+        min_price, max_price = self.price_range
+        return self.model.objects.price_range(min_price, max_price)
+
+    async def get_object_list(self):
+        return [item async for item in self.get_queryset().aiterator()]
+
+    async def get(self, request):
+        """
+        Renders the items within the requested price range.
+        """
+        min_price, max_price = self.price_range
+        return render(request, self.template_name, {
+            self.context_object_name: await self.get_object_list(),
+            'min_price': min_price,
+            'max_price': max_price,
+        })
 
 
 class MainPageView(View):
     """
     Displays the main page of the bar.
     """
+    query_budget = 0
+
     def get(self, request):
         """
         Renders the main page template.
@@ -26,89 +98,143 @@ class MainPageView(View):
         return render(request, 'bar/bar_pages/main_page.html')
 
 
-class CocktailsView(View):
+class CocktailsView(ConditionalGetMixin, MenuPageCacheMixin, View):
     """
     Displays cocktails grouped by base alcohol type.
     """
-    def get(self, request):
+    query_budget = 2
+
+    def get_validator_querysets(self):
+        return [MenuSnapshot.objects.filter(pk='cocktails')]
+
+    async def get(self, request):
         """
-        Renders the cocktails page with cocktails filtered by base alcohol.
+        Renders the cocktails page with one section per base alcohol,
+        loaded from the cocktail menu snapshot.
         """
-        cocktails_gin = Cocktail.objects.filter(base_alcohol="Gin")
-        cocktails_rum = Cocktail.objects.filter(base_alcohol="Rum")
-        cocktails_vodka = Cocktail.objects.filter(base_alcohol="Vodka")
-        cocktails_whisky = Cocktail.objects.filter(base_alcohol="Whisky")
-        cocktails_tequila = Cocktail.objects.filter(base_alcohol="Tequila")
         return render(request, 'bar/bar_pages/cocktails_page.html', {
-            'cocktails_gin': cocktails_gin,
-            'cocktails_rum': cocktails_rum,
-            'cocktails_vodka': cocktails_vodka,
-            'cocktails_whisky': cocktails_whisky,
-            'cocktails_tequila': cocktails_tequila,
+            'cocktail_sections': (await aget_menu_snapshot('cocktails'))['sections'],
         })
 
 
-class CocktailDetailView(DetailView):
+class CocktailDetailView(ConditionalGetMixin, View):
     """
     Displays detailed information about a single cocktail.
     """
     model = Cocktail
-    template_name = 'bar/bar_pages/cocktail_details_page.html'
-    context_object_name = 'cocktail'
+    query_budget = 5
 
+    def get_validator_label(self):
+        return f"cocktail:{self.kwargs['pk']}"
 
-class CheapCocktailListView(ListView):
+    def get_validator_querysets(self):
+        """
+        Returns the cocktail together with its ingredients and category.
+        """
+        pk = self.kwargs['pk']
+        return [
+            Cocktail.objects.filter(pk=pk),
+            CocktailIngredient.objects.filter(cocktail=pk),
+            Category.objects.filter(cocktail=pk),
+        ]
+
+    async def get(self, request, pk):
+        """
+        Renders the cocktail with its category and ingredients.
+
+        Raises:
+            Http404: If the cocktail does not exist.
+        """
+        try:
+            cocktail = await Cocktail.objects.with_menu_relations().aget(pk=pk)
+        except Cocktail.DoesNotExist:
+            raise Http404("No cocktail found matching the query.")
+        return render(request, 'bar/bar_pages/cocktail_details_page.html', {'cocktail': cocktail})
+
+
+class CheapCocktailListView(MenuPageCacheMixin, PriceRangeMixin, View):
     """
-    Displays a list of cocktails that are cheaper than a specified price.
+    Displays a list of cocktails within a price range (up to 8.00 by default).
     """
     model = Cocktail
     template_name = "bar/bar_pages/cocktails_cheap_page.html"
     context_object_name = "cheap_cocktails"
+    default_max_price = Decimal('8.00')
+    query_budget = 2
 
-    def get_queryset(self):
+    async def get_object_list(self):
         """
-        Returns a queryset of cocktails priced under 8.00.
+        Returns the cocktails within the price range with their ingredients.
+
+        aiterator() does not prefetch, so the queryset is iterated as a whole.
         """
-        return Cocktail.objects.cheap(8.00)
+        return [cocktail async for cocktail in self.get_queryset().with_menu_relations()]
 
 
-class FoodListView(ListView):
+class FoodListView(ConditionalGetMixin, MenuPageCacheMixin, View):
     """
     Displays a list of all available food items.
     """
-    model = Food
-    template_name = 'bar/bar_pages/food_page.html'
-    context_object_name = 'foods'
+    query_budget = 2
+
+    def get_validator_querysets(self):
+        return [MenuSnapshot.objects.filter(pk='food')]
+
+    async def get(self, request):
+        """
+        Renders the food items stored in the food menu snapshot.
+        """
+        return render(request, 'bar/bar_pages/food_page.html', {
+            'foods': (await aget_menu_snapshot('food'))['items'],
+        })
 
 
-class CheapFoodListView(ListView):
+class CheapFoodListView(MenuPageCacheMixin, PriceRangeMixin, View):
     """
-    Displays a list of food items that are cheaper than a specified price.
+    Displays a list of food items within a price range (up to 10.00 by default).
     """
     model = Food
     template_name = "bar/bar_pages/food_cheap_page.html"
     context_object_name = "cheap_foods"
+    default_max_price = Decimal('10.00')
+    query_budget = 1
 
-    def get_queryset(self):
+
+class WaterPipeView(ConditionalGetMixin, MenuPageCacheMixin, View):
+    """
+    Displays water pipes grouped by tobacco type (Light or Dark).
+    """
+    query_budget = 2
+
+    def get_validator_querysets(self):
+        return [MenuSnapshot.objects.filter(pk='water_pipes')]
+
+    async def get(self, request):
         """
-        Returns a queryset of food items priced under 10.00.
+        Renders the water pipes page with pipes grouped by tobacco type,
+        loaded from the water pipe menu snapshot.
         """
-        return Food.objects.cheap(10.00)
+        sections = (await aget_menu_snapshot('water_pipes'))['sections']
+        return render(request, 'bar/bar_pages/water_pipes_page.html', {
+            'water_pipes_light': sections['Light'],
+            'water_pipes_dark': sections['Dark'],
+        })
 
 
-class WaterPipeView(View):
+class SearchView(MenuPageCacheMixin, View):
     """
-    Displays water pipes grouped by tobacco type (Light or Dark).
+    Displays cocktails, food and water pipes matching the `q` parameter.
     """
+    query_budget = 4
+
     def get(self, request):
         """
-        Renders the water pipes page with pipes grouped by tobacco type.
+        Renders the search page with the best matches of each menu section.
         """
-        water_pipes_light = WaterPipe.objects.filter(tobacco='Light')
-        water_pipes_dark = WaterPipe.objects.filter(tobacco='Dark')
-        return render(request, 'bar/bar_pages/water_pipes_page.html', {
-            'water_pipes_light': water_pipes_light,
-            'water_pipes_dark': water_pipes_dark,
+        query = request.GET.get('q', '').strip()
+        return render(request, 'bar/bar_pages/search_page.html', {
+            'query': query,
+            'results': search_catalog(query) if query else None,
         })
 
 
@@ -116,6 +242,8 @@ class ContactView(View):
     """
     Displays the contact page of the bar.
     """
+    query_budget = 0
+
     def get(self, request):
         """
         Renders the contact page template.
@@ -0,0 +1,46 @@
+"""
+Gunicorn configuration, loaded automatically from the working directory.
+
+Every worker thread holds one persistent database connection (CONN_MAX_AGE in
+main/settings.py), so PostgreSQL sees at most WEB_CONCURRENCY * GUNICORN_THREADS
+connections. Size both so that this stays below the database connection limit,
+or put PgBouncer in front of the database (pgbouncer.ini, with its sizing).
+The expected number of connections is logged when gunicorn starts.
+
+SERVER_MODE selects the application:
+- "wsgi" (default): main.wsgi with sync (or threaded) workers.
+- "asgi": main.asgi with uvicorn workers. The menu views are async, so one
+  worker keeps serving other requests while a query is waiting, and the live
+  menu event stream is available. GUNICORN_THREADS does not apply; every
+  request running database code uses a thread (and a connection) of its own.
+
+Every worker compiles the bar and adm templates before it accepts requests
+(post_worker_init), so its first requests do not pay for template parsing.
+"""
+
+import os
+
+
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+if SERVER_MODE == "asgi":
+    wsgi_app = "main.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "main.wsgi:application"
+    threads = int(os.getenv("GUNICORN_THREADS", "1"))
+
+
+def post_worker_init(worker):
+    from main.templating import warm_templates
+    warm_templates()
+
+
+def on_starting(server):
+    if SERVER_MODE == "asgi":
+        server.log.info("Database connections: one per concurrent request running database code")
+    else:
+        server.log.info("Database connections: up to %d (%d workers * %d threads)",
+                        workers * threads, workers, threads)
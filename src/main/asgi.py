@@ -2,6 +2,8 @@
 ASGI config for main project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve the project with it (e.g. ``uvicorn main.asgi:application``) to enable
+the live menu event stream (bar.live), which needs long-lived async responses.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -0,0 +1,208 @@
+"""
+Query-count and latency benchmarks for every route in bar.urls and adm.urls.
+
+Includes:
+- seed_catalog: fill the database with a synthetic catalog of a given size.
+- iter_routes: every named route of the bar and adm URL configurations,
+  resolved to a concrete URL for the seeded catalog.
+- run_suite: measure query count, p50 / p99 render time and response size
+  of each route for several catalog sizes.
+- find_regressions: compare results with a checked-in baseline.
+
+The rendered-page cache is cleared before every request, so each sample is a
+cold render. The menu item markup (bar.fragments) lives in its own cache and
+stays warm, as it does between catalog writes in production. Run through
+`python manage.py run_benchmarks`.
+"""
+
+import gc
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from adm.urls import urlpatterns as adm_urlpatterns
+from bar.models import CHOICES_COCKTAIL, CHOICES_TOBACCO, Category, Cocktail, CocktailIngredient, Food, WaterPipe
+from bar.search import refresh_search_vectors
+from bar.snapshots import rebuild_all_menu_snapshots
+from bar.urls import urlpatterns as bar_urlpatterns
+
+
+BATCH_SIZE = 2000
+INGREDIENTS_PER_COCKTAIL = 4
+
+# Query strings needed by routes that do nothing useful without parameters.
+ROUTE_QUERY = {
+    'ingredient-search': {'q': 'Ingredient 1'},
+    'search': {'q': 'Cocktail 000042'},
+}
+
+# Routes that are not page renders (the live menu stream stays open, and the
+# metrics depend on the requests served before).
+SKIPPED_ROUTES = {'menu-events', 'metrics'}
+
+# Absolute p99 targets (ms) checked in addition to the baseline.
+LATENCY_TARGETS_MS = {
+    'search': 100.0,
+}
+
+
+def seed_catalog(size):
+    """
+    Replace the catalog with `size` synthetic items: half cocktails (with
+    ingredients), a quarter food and a quarter water pipes, and refresh the
+    search vectors and menu snapshots.
+    """
+    for model in (Cocktail, Food, WaterPipe, CocktailIngredient, Category):
+        model.objects.all().delete()
+
+    categories = Category.objects.bulk_create([Category(name=f"Category {i}") for i in range(5)])
+    ingredients = CocktailIngredient.objects.bulk_create(
+        [CocktailIngredient(name=f"Ingredient {i}") for i in range(max(10, size // 100))],
+        batch_size=BATCH_SIZE,
+    )
+    spirits = [value for value, _ in CHOICES_COCKTAIL if value != "None"]
+    tobaccos = [value for value, _ in CHOICES_TOBACCO if value != "None"]
+
+    cocktails = Cocktail.objects.bulk_create([
+        Cocktail(
+            name=f"Cocktail {i:06}",
+            price=Decimal(5 + i % 20),
+            description="Synthetic cocktail",
+            category=categories[i % len(categories)],
+            base_alcohol=spirits[i % len(spirits)],
+        )
+        for i in range(size // 2)
+    ], batch_size=BATCH_SIZE)
+    through = Cocktail.ingredients.through
+    through.objects.bulk_create([
+        through(cocktail_id=cocktail.pk, cocktailingredient_id=ingredients[(i + j) % len(ingredients)].pk)
+        for i, cocktail in enumerate(cocktails)
+        for j in range(INGREDIENTS_PER_COCKTAIL)
+    ], batch_size=BATCH_SIZE)
+    Food.objects.bulk_create([
+        Food(
+            name=f"Food {i:06}",
+            price=Decimal(3 + i % 20),
+            description="Synthetic food",
+            category=categories[i % len(categories)],
+        )
+        for i in range(size // 4)
+    ], batch_size=BATCH_SIZE)
+    WaterPipe.objects.bulk_create([
+        WaterPipe(
+            name=f"Water pipe {i:06}",
+            price=Decimal(20 + i % 20),
+            flavour="Apple",
+            tobacco=tobaccos[i % len(tobaccos)],
+            category=categories[i % len(categories)],
+        )
+        for i in range(size // 4)
+    ], batch_size=BATCH_SIZE)
+    for model in (Cocktail, Food, WaterPipe):
+        refresh_search_vectors(model.objects.all())
+    rebuild_all_menu_snapshots()
+
+
+def iter_routes():
+    """
+    Yield (name, url, login_required) for every named route of bar and adm,
+    except SKIPPED_ROUTES.
+
+    Routes taking a primary key use the first object of the view's model.
+    """
+    for urlpatterns, login_required in ((bar_urlpatterns, False), (adm_urlpatterns, True)):
+        for pattern in urlpatterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in SKIPPED_ROUTES:
+                continue
+            kwargs = {}
+            if 'pk' in pattern.pattern.converters:
+                kwargs['pk'] = pattern.callback.view_class.model.objects.values_list('pk', flat=True).first()
+            url = reverse(pattern.name, kwargs=kwargs)
+            yield pattern.name, url, login_required
+
+
+def measure_route(client, url, query, repeat):
+    """
+    Return query count, p50 / p99 render time (ms) and response size of a route.
+
+    One untimed warm-up request runs first, so template compilation and other
+    one-off costs do not end up in the samples. As in timeit, the garbage
+    collector is paused while a sample is timed, so a collection pause does
+    not show up as the p99 of an unrelated route.
+    """
+    client.get(url, query)
+    timings = []
+    for _ in range(repeat):
+        cache.clear()
+        gc.collect()
+        gc.disable()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.get(url, query)
+                content = b''.join(response.streaming_content) if response.streaming else response.content
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            gc.enable()
+    timings.sort()
+    return {
+        'status': response.status_code,
+        'queries': len(queries),
+        'p50_ms': round(statistics.median(timings), 2),
+        'p99_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 2),
+        'bytes': len(content),
+    }
+
+
+def run_suite(sizes, repeat=10):
+    """
+    Return {size: {route name: measurements}} for each catalog size.
+    """
+    user, _ = get_user_model().objects.get_or_create(username='benchmark')
+    anonymous, staff = Client(), Client()
+    staff.force_login(user)
+
+    results = {}
+    for size in sizes:
+        seed_catalog(size)
+        results[str(size)] = {
+            name: measure_route(staff if login_required else anonymous, url, ROUTE_QUERY.get(name, {}), repeat)
+            for name, url, login_required in iter_routes()
+        }
+    return results
+
+
+def find_regressions(results, baseline, tolerance=2.0, slack_ms=5.0):
+    """
+    Return messages describing every regression against the baseline.
+
+    Status codes must match and query counts must not grow. Render time (p99) may grow up to `tolerance`
+    times the baseline plus `slack_ms`, since it depends on the machine;
+    response size may grow up to `tolerance` times the baseline. Routes listed
+    in LATENCY_TARGETS_MS must also stay under their p99 target.
+    """
+    regressions = []
+    for size, routes in results.items():
+        for name, current in routes.items():
+            target = LATENCY_TARGETS_MS.get(name)
+            if target is not None and current['p99_ms'] > target:
+                regressions.append(f"[{size}] {name}: p99 {current['p99_ms']} ms, target {target} ms")
+            expected = baseline.get(size, {}).get(name)
+            if expected is None:
+                continue
+            if current['status'] != expected['status']:
+                regressions.append(f"[{size}] {name}: status {current['status']}, baseline {expected['status']}")
+            if current['queries'] > expected['queries']:
+                regressions.append(f"[{size}] {name}: {current['queries']} queries, baseline {expected['queries']}")
+            if current['p99_ms'] > expected['p99_ms'] * tolerance + slack_ms:
+                regressions.append(f"[{size}] {name}: p99 {current['p99_ms']} ms, baseline {expected['p99_ms']} ms")
+            if current['bytes'] > expected['bytes'] * tolerance:
+                regressions.append(f"[{size}] {name}: {current['bytes']} bytes, baseline {expected['bytes']}")
+    return regressions
@@ -0,0 +1,296 @@
+"""
+Two-tier cache shared by the web workers.
+
+Includes:
+- TieredCache: cache backend keeping a bounded in-process LRU copy (with a
+  short TTL) of the entries of a shared backend, the file-based cache or a
+  Redis server (see CACHES in main/settings.py).
+- namespace_version / invalidate_namespace: per-namespace versions, stored
+  in the shared tier only, so every worker sees an invalidation at once.
+  Keys built with namespaced_key() include the version, so entries of an
+  invalidated namespace are never read again and simply expire.
+- is_shared_between_processes: whether another process (such as the media
+  worker) sees the entries and namespace versions of this one.
+- get_or_compute / aget_or_compute: read-through caching with single-flight
+  recomputation. On a miss only one caller (in any worker) computes the
+  value; the others wait for it instead of stampeding the database.
+
+The helpers accept any cache backend; with a TieredCache they work on its
+shared tier.
+
+Values of keys that are overwritten in place (not namespaced) may be served
+from the local tier of another worker for up to LOCAL_TIMEOUT seconds.
+"""
+
+import asyncio
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+NAMESPACE_KEY_PREFIX = 'namespace'
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 5
+WAIT_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    """
+    LRU in front of a shared cache.
+
+    OPTIONS:
+    - SHARED: alias of the shared cache (required).
+    - LOCAL_MAX_ENTRIES: size of the in-process LRU (default 1000).
+    - LOCAL_TIMEOUT: seconds an entry is kept in the LRU (default 10).
+
+    Writes go to both tiers. Values are pickled in the LRU, as in
+    LocMemCache, so callers never share mutable objects.
+    """
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options['SHARED']
+        self.local_max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 10)
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _local_key(self, key, version):
+        return self.make_and_validate_key(key, version)
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return _MISSING
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._local[key]
+                return _MISSING
+            self._local.move_to_end(key)
+        return pickle.loads(value)
+
+    def _local_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        timeout = self.local_timeout if timeout in (DEFAULT_TIMEOUT, None) else min(timeout, self.local_timeout)
+        if timeout <= 0:
+            self._local_delete(key)
+            return
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[key] = (time.monotonic() + timeout, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        value = self._local_get(local_key)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING, version)
+            if value is _MISSING:
+                return default
+            self._local_set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._local_get(self._local_key(key, version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(missing, version)
+            for key, value in shared.items():
+                self._local_set(self._local_key(key, version), value)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self._local_set(self._local_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(self._local_key(key, version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._local_set(self._local_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_delete(self._local_key(key, version))
+        self.shared.delete_many(keys, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.incr(key, delta, version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+
+def _shared_tier(cache):
+    return getattr(cache, 'shared', cache)
+
+
+def is_shared_between_processes(cache=None):
+    """
+    Returns False when the shared tier of the cache is kept in process
+    memory (LocMemCache), so other processes cannot see its entries.
+    """
+    return not isinstance(_shared_tier(cache or caches['default']), LocMemCache)
+
+
+def _namespace_key(namespace):
+    return f"{NAMESPACE_KEY_PREFIX}:{namespace}"
+
+
+def namespace_version(namespace, cache=None):
+    """
+    Returns the current version of a namespace, initialising it when missing.
+    """
+    store = _shared_tier(cache or caches['default'])
+    key = _namespace_key(namespace)
+    version = store.get(key)
+    if version is None:
+        store.add(key, 1, timeout=None)
+        version = store.get(key, 1)
+    return version
+
+
+async def anamespace_version(namespace, cache=None):
+    """
+    Async version of namespace_version().
+    """
+    store = _shared_tier(cache or caches['default'])
+    key = _namespace_key(namespace)
+    version = await store.aget(key)
+    if version is None:
+        await store.aadd(key, 1, timeout=None)
+        version = await store.aget(key, 1)
+    return version
+
+
+def invalidate_namespace(namespace, cache=None):
+    """
+    Increments the version of a namespace, so its entries are not read again.
+    """
+    store = _shared_tier(cache or caches['default'])
+    try:
+        store.incr(_namespace_key(namespace))
+    except ValueError:
+        store.set(_namespace_key(namespace), 2, timeout=None)
+
+
+def namespaced_key(namespace, key, cache=None):
+    return f"{namespace}:{namespace_version(namespace, cache)}:{key}"
+
+
+async def anamespaced_key(namespace, key, cache=None):
+    return f"{namespace}:{await anamespace_version(namespace, cache)}:{key}"
+
+
+def get_or_compute(key, compute, timeout=DEFAULT_TIMEOUT, cache=None, cacheable=None):
+    """
+    Returns the cached value of `key`, computing and storing it on a miss.
+
+    A lock entry added to the shared tier makes sure that one caller
+    computes the value; concurrent callers poll for it for up to
+    WAIT_TIMEOUT seconds and then compute it themselves. Values for which
+    `cacheable(value)` is false are returned without being stored; as the
+    holder stores its value before releasing the lock, callers stop polling
+    and compute the value themselves as soon as the lock is gone.
+    """
+    cache = cache or caches['default']
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f"{key}:lock"
+    locked = _shared_tier(cache).add(lock_key, 1, LOCK_TIMEOUT)
+    if not locked:
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            lock_held = _shared_tier(cache).get(lock_key) is not None
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            if not lock_held:
+                break
+    try:
+        value = compute()
+        if cacheable is None or cacheable(value):
+            cache.set(key, value, timeout)
+    finally:
+        if locked:
+            _shared_tier(cache).delete(lock_key)
+    return value
+
+
+async def aget_or_compute(key, compute, timeout=DEFAULT_TIMEOUT, cache=None, cacheable=None):
+    """
+    Async version of get_or_compute(); `compute` is a coroutine function.
+    """
+    cache = cache or caches['default']
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f"{key}:lock"
+    locked = await _shared_tier(cache).aadd(lock_key, 1, LOCK_TIMEOUT)
+    if not locked:
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(WAIT_INTERVAL)
+            lock_held = await _shared_tier(cache).aget(lock_key) is not None
+            value = await cache.aget(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            if not lock_held:
+                break
+    try:
+        value = await compute()
+        if cacheable is None or cacheable(value):
+            await cache.aset(key, value, timeout)
+    finally:
+        if locked:
+            await _shared_tier(cache).adelete(lock_key)
+    return value
@@ -0,0 +1,248 @@
+"""
+Request metrics per view, for the Server-Timing header and Prometheus.
+
+Includes:
+- Histogram: counts of observations in fixed buckets, plus their sum, so its
+  memory does not grow with the traffic.
+- MetricsRegistry / registry: the histograms of every view served by this
+  process, keyed by URL name. The number of series is bounded by the URL
+  configuration (requests that resolve to no view share one series).
+- collect_queries / record_queries: execute wrapper counting the database
+  queries of the current request and the time spent in them. It is
+  installed on every database connection when it is created.
+- RequestMetricsMiddleware: measures the latency, queries, template time
+  (see main.templating) and response size of each request, records them
+  and adds a Server-Timing header with them.
+- render_prometheus: the registry in the Prometheus text format, served at
+  /adm/metrics (see adm.views.MetricsView).
+
+Every worker process keeps its own registry; series carry a `process`
+label, so Prometheus can add up the workers that it scrapes.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from main.templating import collect_template_timings, template_time
+
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+UNMATCHED_VIEW = '<unmatched>'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760)
+
+# (name, help, buckets) of the histograms recorded for every view.
+METRICS = (
+    ('http_request_duration_seconds', 'Time to produce the response.', LATENCY_BUCKETS),
+    ('http_request_db_queries', 'Database queries per request.', QUERY_BUCKETS),
+    ('http_request_db_duration_seconds', 'Time spent in database queries per request.', LATENCY_BUCKETS),
+    ('http_request_template_duration_seconds', 'Time spent loading and rendering templates per request.',
+     LATENCY_BUCKETS),
+    ('http_response_size_bytes', 'Size of the response body (streamed responses are not counted).', SIZE_BUCKETS),
+)
+
+_query_stats = ContextVar('query_stats', default=None)
+
+
+class Histogram:
+    """
+    Prometheus-style histogram with fixed upper bounds.
+    """
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Returns [(upper bound, observations up to it), ...], ending with +Inf.
+        """
+        buckets = []
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            buckets.append((bound, total))
+        buckets.append(('+Inf', self.count))
+        return buckets
+
+
+class MetricsRegistry:
+    """
+    Histograms of METRICS per view, safe to update from several threads.
+    """
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, values):
+        """
+        Records {metric name: value} for `view`; None values are skipped.
+        """
+        with self._lock:
+            histograms = self._views.get(view)
+            if histograms is None:
+                histograms = self._views[view] = {name: Histogram(buckets) for name, _, buckets in METRICS}
+            for name, value in values.items():
+                if value is not None:
+                    histograms[name].observe(value)
+
+    def collect(self):
+        """
+        Returns {metric name: {view: (cumulative buckets, sum, count)}}.
+        """
+        with self._lock:
+            return {
+                name: {
+                    view: (histograms[name].cumulative(), histograms[name].sum, histograms[name].count)
+                    for view, histograms in sorted(self._views.items())
+                }
+                for name, _, _ in METRICS
+            }
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+class QueryStats:
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+
+@contextmanager
+def collect_queries():
+    """
+    Counts the queries run in the block, also from the threads that
+    sync_to_async() hands database code to, which copy the context.
+    """
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def record_queries(execute, sql, params, many, context):
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - start
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNMATCHED_VIEW
+    return match.url_name or match.view_name
+
+
+class RequestMetricsMiddleware:
+    """
+    Records the metrics of each request in `registry` and, unless
+    METRICS_SERVER_TIMING is off, sends them in a Server-Timing header.
+
+    Works in both sync and async mode. Place it after WhiteNoise, so static
+    files are not measured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_recorder, dispatch_uid='main.metrics.record_queries')
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection=connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with collect_queries() as queries, collect_template_timings() as timings:
+            response = self.get_response(request)
+        return self.record(request, response, time.perf_counter() - start, queries, timings)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with collect_queries() as queries, collect_template_timings() as timings:
+            response = await self.get_response(request)
+        return self.record(request, response, time.perf_counter() - start, queries, timings)
+
+    def record(self, request, response, duration, queries, timings):
+        templates = template_time(timings) / 1000
+        registry.observe(_view_name(request), {
+            'http_request_duration_seconds': duration,
+            'http_request_db_queries': queries.count,
+            'http_request_db_duration_seconds': queries.duration,
+            'http_request_template_duration_seconds': templates,
+            'http_response_size_bytes': None if response.streaming else len(response.content),
+        })
+        if getattr(settings, 'METRICS_SERVER_TIMING', True):
+            response['Server-Timing'] = (
+                f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries", '
+                f'tpl;dur={templates * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+        return response
+
+
+def _label(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def render_prometheus(metrics=registry):
+    """
+    Returns the histograms of `metrics` in the Prometheus text exposition format.
+    """
+    process = os.getpid()
+    lines = []
+    collected = metrics.collect()
+    for name, help_text, _ in METRICS:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for view, (buckets, total, count) in collected[name].items():
+            labels = f'view="{_label(view)}",process="{process}"'
+            for bound, value in buckets:
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {value}')
+            lines.append(f"{name}_sum{{{labels}}} {total}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,239 @@
+"""
+Query pattern analysis for development and the test suite.
+
+Includes:
+- fingerprint: the SQL of a query with its literals, placeholders and
+  placeholder lists replaced, so queries differing only in their parameters
+  match.
+- query_origin: where a query comes from, as the innermost line of project
+  code and, when it runs while a template renders, the template line.
+- QueryLog: the queries of one request, grouped by fingerprint.
+- unbudgeted: leaves the queries of a block out of the query budget, for
+  one-off work such as building a missing menu snapshot.
+- QueryAnalysisMiddleware: logs (to the "main.queries" logger) the slow
+  queries of each request (SLOW_QUERY_MS) and the fingerprints repeated
+  N_PLUS_ONE_THRESHOLD times or more, the usual sign of an N+1 pattern.
+  With QUERY_BUDGETS_ENFORCED, a GET or HEAD request running more queries
+  than the `query_budget` of its view raises QueryBudgetExceeded.
+
+main.testing.QueryBudgetTestRunner enforces the budgets in the test suite,
+so a view going over its budget fails the test that requests it.
+
+The middleware is active with QUERY_ANALYSIS (on in DEBUG) or when budgets
+are enforced; otherwise it removes itself. Queries run while a streamed
+response is sent (the catalog export) are not seen.
+"""
+
+import logging
+import re
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Node
+
+
+logger = logging.getLogger(__name__)
+
+_query_log = ContextVar('query_log', default=None)
+_unbudgeted = ContextVar('unbudgeted_queries', default=False)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|%\(\w+\)s|\?')
+_PLACEHOLDER_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+# Frames of these files are skipped when looking for the line running a query.
+_SKIPPED_FILES = tuple(str(Path(__file__).with_name(name)) for name in ('queries.py', 'metrics.py', 'templating.py'))
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised for a request running more queries than its view's budget.
+    """
+
+
+def fingerprint(sql):
+    """
+    Returns the normalised SQL of a query, e.g.
+    `SELECT ... WHERE "id" IN (?, ?)` becomes `SELECT ... WHERE "id" IN (...)`.
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def query_origin():
+    """
+    Returns "file.py:line" of the innermost project frame running the current
+    query, followed by "(template.html:line)" when it runs inside a template.
+    """
+    base_dir = str(settings.BASE_DIR)
+    code_line = template_line = None
+    frame = sys._getframe(1)
+    while frame is not None and code_line is None:
+        if template_line is None and frame.f_code is Node.render_annotated.__code__:
+            node = frame.f_locals.get('self')
+            token, origin = getattr(node, 'token', None), getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                template_line = f"{origin.template_name or origin.name}:{token.lineno}"
+        filename = frame.f_code.co_filename
+        if filename.startswith(base_dir) and 'site-packages' not in filename and not filename.startswith(_SKIPPED_FILES):
+            code_line = f"{Path(filename).relative_to(base_dir).as_posix()}:{frame.f_lineno}"
+        frame = frame.f_back
+    origin = code_line or 'unknown'
+    return f"{origin} ({template_line})" if template_line else origin
+
+
+@contextmanager
+def unbudgeted():
+    """
+    Runs the block without counting its queries against the view's budget.
+    They are still analysed.
+    """
+    token = _unbudgeted.set(True)
+    try:
+        yield
+    finally:
+        _unbudgeted.reset(token)
+
+
+class QueryLog:
+    """
+    Queries of one request: {fingerprint: [count, total seconds, origin]}.
+
+    The origin of a fingerprint is looked up once it repeats
+    `repeat_threshold` times, as walking the stack for every query is slow.
+    """
+    def __init__(self, repeat_threshold, slow_seconds):
+        self.repeat_threshold = repeat_threshold
+        self.slow_seconds = slow_seconds
+        self.count = 0
+        self.unbudgeted = 0
+        self.fingerprints = {}
+        self.slow = []
+
+    def record(self, sql, duration):
+        self.count += 1
+        if _unbudgeted.get():
+            self.unbudgeted += 1
+        entry = self.fingerprints.setdefault(fingerprint(sql), [0, 0, None])
+        entry[0] += 1
+        entry[1] += duration
+        if entry[0] == self.repeat_threshold:
+            entry[2] = query_origin()
+        if duration >= self.slow_seconds:
+            self.slow.append((duration, query_origin(), sql))
+
+    def repeated(self):
+        """
+        Returns [(count, fingerprint, origin), ...] of the repeated queries, most frequent first.
+        """
+        return sorted(
+            ((count, sql, origin) for sql, (count, _, origin) in self.fingerprints.items()
+             if count >= self.repeat_threshold),
+            reverse=True,
+        )
+
+    def summary(self):
+        return '\n'.join(
+            f"  {count}x {sql}" for sql, (count, _, _) in
+            sorted(self.fingerprints.items(), key=lambda item: -item[1][0])
+        )
+
+
+def analyze_queries(execute, sql, params, many, context):
+    log = _query_log.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log.record(sql, time.perf_counter() - start)
+
+
+def install_query_analyzer(sender=None, connection=None, **kwargs):
+    if analyze_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(analyze_queries)
+
+
+def query_budget(request):
+    """
+    Returns the `query_budget` declared by the view of the request, or None.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view = getattr(match.func, 'view_class', match.func)
+    return getattr(view, 'query_budget', None)
+
+
+class QueryAnalysisMiddleware:
+    """
+    Analyses the queries of each request (see the module docstring).
+    Works in both sync and async mode.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.analyze = getattr(settings, 'QUERY_ANALYSIS', False)
+        self.enforce_budgets = getattr(settings, 'QUERY_BUDGETS_ENFORCED', False)
+        if not (self.analyze or self.enforce_budgets):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_analyzer, dispatch_uid='main.queries.analyze_queries')
+        for connection in connections.all(initialized_only=True):
+            install_query_analyzer(connection=connection)
+
+    def new_log(self):
+        return QueryLog(
+            getattr(settings, 'N_PLUS_ONE_THRESHOLD', 5),
+            getattr(settings, 'SLOW_QUERY_MS', 100) / 1000,
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _query_log.set(self.new_log())
+        try:
+            response = self.get_response(request)
+            self.check(request, _query_log.get())
+        finally:
+            _query_log.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        token = _query_log.set(self.new_log())
+        try:
+            response = await self.get_response(request)
+            self.check(request, _query_log.get())
+        finally:
+            _query_log.reset(token)
+        return response
+
+    def check(self, request, log):
+        if self.analyze:
+            for duration, origin, sql in log.slow:
+                logger.warning("Slow query (%.1f ms) in %s at %s: %s", duration * 1000, request.path, origin, sql)
+            for count, sql, origin in log.repeated():
+                logger.warning("Possible N+1 in %s: %d x %s at %s", request.path, count, sql, origin)
+        budget = query_budget(request)
+        counted = log.count - log.unbudgeted
+        if self.enforce_budgets and budget is not None and counted > budget and request.method in ('GET', 'HEAD'):
+            raise QueryBudgetExceeded(
+                f"{request.path} ran {counted} queries, its view allows {budget}:\n{log.summary()}"
+            )
@@ -21,6 +21,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_extensions',
     'adm',
     'bar',
@@ -28,24 +29,41 @@ INSTALLED_APPS = [
     'cloudinary_storage',
 ]
 
+# Anonymous GET requests of the public bar pages skip the session, auth and
+# messages work (see bar/middleware.py), so their responses do not vary on Cookie.
+# Requests other than static files are measured per view (see main/metrics.py), and
+# their queries analysed in DEBUG and in the tests (see main/queries.py).
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'main.metrics.RequestMetricsMiddleware',
+    'main.queries.QueryAnalysisMiddleware',
+    'bar.middleware.PublicRequestMiddleware',
+    'bar.middleware.PublicSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'bar.middleware.PublicAuthenticationMiddleware',
+    'bar.middleware.PublicMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'main.urls'
 
+# Templates are compiled once per worker by the cached loader (and warmed when a
+# gunicorn worker starts, see main/templating.py). In DEBUG they are read again
+# on every use, so edits show up at once, and every HTML page gets a panel with
+# the template load and render times. The timed backend also reports the template
+# time of every request to the request metrics.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'main.templating.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
@@ -53,14 +71,30 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'adm.context_processors.created_by'
             ],
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
         },
     },
 ]
 
+if DEBUG:
+    MIDDLEWARE.append('main.templating.TemplateTimingMiddleware')
+
 WSGI_APPLICATION = 'main.wsgi.application'
 
+# "wsgi" or "asgi", see gunicorn.conf.py. Under ASGI, database code runs in a new
+# thread per request, so connections are not kept between requests by default.
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+
 DB_LIVE = os.getenv("DB_LIVE")
 
+# Each worker thread keeps its connection for DB_CONN_MAX_AGE seconds and checks it
+# before reuse, so requests skip the TCP/TLS/auth handshake. With gunicorn the number
+# of open connections is workers * threads (see gunicorn.conf.py). When connections
+# go through PgBouncer in transaction mode, set DB_DISABLE_SERVER_SIDE_CURSORS=True.
+DB_OPTIONS = {'connect_timeout': int(os.getenv("DB_CONNECT_TIMEOUT", "10"))}
+if os.getenv("DB_SSLMODE"):
+    DB_OPTIONS['sslmode'] = os.getenv("DB_SSLMODE")
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -69,6 +103,10 @@ DATABASES = {
         'PASSWORD': os.getenv("DB_PASSWORD"),
         'HOST': os.getenv("DB_HOST"),
         'PORT': os.getenv("DB_PORT"),
+        'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", "0" if SERVER_MODE == "asgi" else "60")),
+        'CONN_HEALTH_CHECKS': os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True",
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv("DB_DISABLE_SERVER_SIDE_CURSORS") == "True",
+        'OPTIONS': DB_OPTIONS,
     }
 }
 
@@ -86,7 +124,110 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+STATICFILES_STORAGE = 'main.storage.StaticAssetsStorage'
+
+# Built by collectstatic (see main/storage.py): minified stylesheet bundles and
+# resized AVIF/WebP copies of the background images.
+STATIC_CSS_BUNDLES = {
+    'bar/css/bundle.css': ['adm/css/nav_bar.css', 'bar/css/menu.css'],
+}
+STATIC_IMAGE_PREFIXES = ['bar/images/']
+STATIC_IMAGE_WIDTHS = [480, 960, 1600]
+
+# The default cache keeps a small in-process LRU in front of the "shared" cache
+# (see main/cache.py). CACHE_BACKEND selects the shared tier:
+# - "locmem" (default): per process, enough for a single worker; not usable with the
+#   media worker of the Procfile, whose catalog invalidations the web process would
+#   not see (process_media_jobs refuses to start with it);
+# - "file": files in CACHE_DIR, shared by the workers of one host;
+# - "redis": the Redis-protocol server at CACHE_URL, shared by every host.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+SHARED_CACHES = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("CACHE_DIR", os.path.join(BASE_DIR, '..', 'cache', 'shared')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv("CACHE_URL", "redis://127.0.0.1:6379/0"),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'main.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "1000")),
+            'LOCAL_TIMEOUT': int(os.getenv("CACHE_LOCAL_TIMEOUT", "10")),
+        },
+    },
+    'shared': SHARED_CACHES[CACHE_BACKEND],
+    # Rendered menu items (see bar/fragments.py), sized for the whole catalog.
+    'menu_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'menu-fragments',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+MENU_FRAGMENT_CACHE = 'menu_fragments'
+
+# Sessions of the admin panel. SESSION_BACKEND selects:
+# - "cached_db" (default): read from the "sessions" cache, written through to the
+#   database, so a session survives a cache restart;
+# - "signed_cookies": kept in a signed cookie, with no server-side storage;
+# - "db": Django's database backend, one session query per request.
+# The "sessions" cache is per process ("locmem", default) or shared by the workers
+# of one host ("file", stored in SESSION_CACHE_DIR).
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "cached_db")
+SESSION_ENGINE = f"django.contrib.sessions.backends.{SESSION_BACKEND}"
+SESSION_CACHE_ALIAS = 'sessions'
+if os.getenv("SESSION_CACHE", "locmem") == "file":
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("SESSION_CACHE_DIR", os.path.join(BASE_DIR, '..', 'cache', 'sessions')),
+    }
+else:
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+# Request metrics (see main/metrics.py): the Server-Timing header of every response,
+# and /adm/metrics in the Prometheus text format, for logged-in users or scrapers
+# sending "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "True") == "True"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Query analysis (see main/queries.py): with QUERY_ANALYSIS (default: DEBUG) every
+# query slower than SLOW_QUERY_MS and every query repeated N_PLUS_ONE_THRESHOLD times
+# in one request is logged with the code and template line running it. The test
+# runner fails requests of views running more queries than their `query_budget`.
+QUERY_ANALYSIS = os.getenv("QUERY_ANALYSIS", str(DEBUG)) == "True"
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+QUERY_BUDGETS_ENFORCED = False
+TEST_RUNNER = 'main.testing.QueryBudgetTestRunner'
+
+# Deliver live menu events to every web process through PostgreSQL LISTEN/NOTIFY
+# (needed when more than one process serves the event stream).
+LIVE_MENU_NOTIFY = os.getenv("LIVE_MENU_NOTIFY") == "True"
+
+# LISTEN needs a session-long server connection, which PgBouncer in transaction
+# pooling (src/pgbouncer.ini) does not give: when DB_HOST/DB_PORT point at PgBouncer,
+# set DB_LISTEN_HOST/DB_LISTEN_PORT to PostgreSQL itself for the listener connection.
+LIVE_MENU_LISTEN_DATABASE = {
+    key: value for key, value in (('HOST', os.getenv("DB_LISTEN_HOST")), ('PORT', os.getenv("DB_LISTEN_PORT")))
+    if value
+}
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -103,4 +244,6 @@ CLOUDINARY_STORAGE = {
     'API_SECRET': 'Yt046P-LW_q5Ho9zeyaECv-_cdw',
 }
 
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
\ No newline at end of file
+# Set MEDIA_STORAGE=django.core.files.storage.FileSystemStorage to keep uploads and
+# image renditions in MEDIA_ROOT, e.g. for offline development.
+DEFAULT_FILE_STORAGE = os.getenv("MEDIA_STORAGE", 'cloudinary_storage.storage.MediaCloudinaryStorage')
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+Static files storage with a build step run by `collectstatic`.
+
+Includes:
+- minify_css: strip comments and redundant whitespace from a stylesheet.
+- StaticAssetsStorage: before files are fingerprinted and compressed by
+  WhiteNoise, concatenates and minifies the STATIC_CSS_BUNDLES and writes
+  resized AVIF/WebP copies of the images under STATIC_IMAGE_PREFIXES at each
+  of STATIC_IMAGE_WIDTHS (as `<dir>/renditions/<name>-<width>.<format>`).
+- static_image_sources: the generated copies of an image, for <picture>
+  sources (see bar.templatetags.static_assets).
+
+Generated files are hashed like every other static file, and WhiteNoise
+writes .gz copies of them (and .br copies when the `brotli` package is
+installed).
+"""
+
+import posixpath
+import re
+from functools import lru_cache
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from bar.renditions import RENDITION_FORMATS, available_formats, encode_rendition
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+RENDITIONS_DIR = 'renditions'
+
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE_RE = re.compile(r'\s+')
+_CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*')
+_CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_VARIANT_RE = re.compile(r'-(\d+)\.(\w+)$')
+
+
+def minify_css(css):
+    """
+    Returns the stylesheet without comments and redundant whitespace.
+
+    Whitespace before a colon is kept, since it is significant in selectors
+    such as `div :first-child`.
+    """
+    css = _CSS_COMMENT_RE.sub('', css)
+    css = _CSS_SPACE_RE.sub(' ', css)
+    css = _CSS_PUNCTUATION_RE.sub(r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def _rebase_css_urls(css, source, bundle):
+    """
+    Rewrites relative url() references of `source` so they stay valid from `bundle`.
+    """
+    def rebase(match):
+        quote, url = match.groups()
+        if re.match(r'^([a-z]+:|/|#|data:)', url):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(source), url))
+        return f"url({quote}{posixpath.relpath(target, posixpath.dirname(bundle))}{quote})"
+    return _CSS_URL_RE.sub(rebase, css)
+
+
+def _variant_name(name, width, extension):
+    path = PurePosixPath(name)
+    return str(path.parent / RENDITIONS_DIR / f"{path.stem}-{width}.{extension}")
+
+
+class StaticAssetsStorage(CompressedManifestStaticFilesStorage):
+    """
+    CompressedManifestStaticFilesStorage that bundles stylesheets and
+    generates image variants before post-processing.
+    """
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            self.build_css_bundles(paths)
+            self.build_image_variants(paths)
+        yield from super().post_process(paths, dry_run, **options)
+
+    def _save_generated(self, paths, name, content):
+        if self.exists(name):
+            self.delete(name)
+        self.save(name, ContentFile(content))
+        paths[name] = (self, name)
+
+    def _read(self, paths, name):
+        storage, path = paths[name]
+        with storage.open(path) as source:
+            return source.read()
+
+    def build_css_bundles(self, paths):
+        for bundle, sources in getattr(settings, 'STATIC_CSS_BUNDLES', {}).items():
+            css = '\n'.join(
+                minify_css(_rebase_css_urls(self._read(paths, source).decode(), source, bundle))
+                for source in sources
+            )
+            self._save_generated(paths, bundle, css.encode())
+
+    def build_image_variants(self, paths):
+        prefixes = tuple(getattr(settings, 'STATIC_IMAGE_PREFIXES', ()))
+        widths = getattr(settings, 'STATIC_IMAGE_WIDTHS', ())
+        extensions = [extension for extension in available_formats() if extension != 'jpeg']
+        names = [name for name in paths
+                 if name.startswith(prefixes) and name.lower().endswith(IMAGE_EXTENSIONS)
+                 and f"/{RENDITIONS_DIR}/" not in name]
+        for name in names:
+            storage, path = paths[name]
+            with storage.open(path) as source, Image.open(source) as original:
+                original = ImageOps.exif_transpose(original)
+                original.load()
+            for width in sorted({min(width, original.width) for width in widths}):
+                for extension in extensions:
+                    content, _, _ = encode_rendition(original, width, extension)
+                    self._save_generated(paths, _variant_name(name, width, extension), content)
+
+
+@lru_cache(maxsize=None)
+def static_image_sources(name):
+    """
+    Returns [(mime type, [(width, variant name), ...]), ...] of the variants
+    generated for a static image, best format first.
+
+    Empty in DEBUG, where files are served from the app directories and no
+    variants exist, or when the storage keeps no manifest.
+    """
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', None)
+    if settings.DEBUG or not hashed_files:
+        return []
+    path = PurePosixPath(name)
+    prefix = f"{path.parent / RENDITIONS_DIR / path.stem}-"
+    variants = {}
+    for variant in hashed_files:
+        match = _VARIANT_RE.search(variant) if variant.startswith(prefix) else None
+        if match and variant == f"{prefix}{match.group(1)}.{match.group(2)}":
+            variants.setdefault(match.group(2), []).append((int(match.group(1)), variant))
+    return [
+        (RENDITION_FORMATS[extension][1], sorted(variants[extension]))
+        for extension in RENDITION_FORMATS if extension in variants
+    ]
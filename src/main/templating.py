@@ -0,0 +1,166 @@
+"""
+Template loading for production, and template timings for request metrics
+and the development panel.
+
+Includes:
+- warm_templates: compile every template of the given apps into the cached
+  template loader, so a fresh worker does not parse them on its first
+  requests. Called for every gunicorn worker (gunicorn.conf.py) and by
+  `python manage.py warm_templates`.
+- TimedDjangoTemplates: template backend recording how long each template
+  takes to load and compile, and to render, while timings are collected.
+- collect_template_timings / template_time: the timings of the current
+  request, shared by main.metrics (render time per view, in every
+  environment) and TemplateTimingMiddleware.
+- TemplateTimingMiddleware: adds a panel with the timings of the request to
+  the bottom of HTML pages in DEBUG.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.apps import apps
+from django.template.backends.django import DjangoTemplates
+from django.template.loader import get_template
+from django.utils.html import format_html, format_html_join
+
+
+WARM_TEMPLATE_APPS = ('bar', 'adm')
+
+_timings = ContextVar('template_timings', default=None)
+_depth = ContextVar('template_depth', default=0)
+
+
+def warm_templates(app_labels=WARM_TEMPLATE_APPS):
+    """
+    Loads every .html template of the given apps and returns their names.
+    """
+    names = []
+    for label in app_labels:
+        root = Path(apps.get_app_config(label).path) / 'templates'
+        for path in sorted(root.rglob('*.html')):
+            name = path.relative_to(root).as_posix()
+            get_template(name)
+            names.append(name)
+    return names
+
+
+@contextmanager
+def collect_template_timings():
+    """
+    Collects the timings of the templates used in the block, as a list of
+    (stage, name, milliseconds, depth) tuples. Nested blocks share the list.
+    """
+    timings = _timings.get()
+    if timings is not None:
+        yield timings
+        return
+    token = _timings.set([])
+    try:
+        yield _timings.get()
+    finally:
+        _timings.reset(token)
+
+
+def template_time(timings):
+    """
+    Returns the milliseconds spent in templates, without counting a template
+    loaded or rendered inside another one twice.
+    """
+    return sum(elapsed for _, _, elapsed, depth in timings if depth == 0)
+
+
+@contextmanager
+def _timed(stage, name):
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.append((stage, name, (time.perf_counter() - start) * 1000, depth))
+        _depth.reset(token)
+
+
+class TimedTemplate:
+    """
+    Backend template recording its render time.
+    """
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        with _timed('render', self._template.origin.template_name):
+            return self._template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates backend recording template load (and compile) and render
+    times of the current request (see collect_template_timings).
+
+    Loads include the templates pulled in by {% extends %} and {% include %};
+    renders are counted for the templates requested from the backend (pages
+    and the cached menu items of bar.fragments) and include their children.
+    """
+    def __init__(self, params):
+        super().__init__(params)
+        find_template = self.engine.find_template
+
+        def timed_find_template(name, dirs=None, skip=None):
+            with _timed('load', name):
+                return find_template(name, dirs, skip)
+
+        self.engine.find_template = timed_find_template
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class TemplateTimingMiddleware:
+    """
+    Appends the template timings of a request to HTML responses.
+
+    Timings are aggregated per stage and template, slowest first. Only
+    templates served by TimedDjangoTemplates are measured.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_template_timings() as timings:
+            response = self.get_response(request)
+        if (timings and not response.streaming
+                and response.get('Content-Type', '').startswith('text/html')
+                and b'</body>' in response.content):
+            panel = self.render_panel(timings).encode()
+            response.content = response.content.replace(b'</body>', panel + b'</body>', 1)
+            if response.has_header('Content-Length'):
+                response['Content-Length'] = len(response.content)
+        return response
+
+    def render_panel(self, timings):
+        totals = {}
+        for stage, name, elapsed, _ in timings:
+            count, total = totals.get((stage, name), (0, 0))
+            totals[(stage, name)] = (count + 1, total + elapsed)
+        rows = sorted(totals.items(), key=lambda row: -row[1][1])
+        return format_html(
+            '<details id="template-timings" style="position:fixed;bottom:0;right:0;z-index:1000;'
+            'max-height:50vh;overflow:auto;background:#fff;color:#000;font:12px monospace;padding:4px">'
+            '<summary>Templates: {} ms load, {} ms render</summary><table>{}</table></details>',
+            f"{sum(elapsed for stage, _, elapsed, _ in timings if stage == 'load'):.1f}",
+            f"{sum(elapsed for stage, _, elapsed, _ in timings if stage == 'render'):.1f}",
+            format_html_join('', '<tr><td>{}</td><td>{}</td><td>{}&times;</td><td>{} ms</td></tr>', (
+                (stage, name, count, f"{total:.2f}") for (stage, name), (count, total) in rows
+            )),
+        )
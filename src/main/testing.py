@@ -0,0 +1,25 @@
+"""
+Test runner of the project (TEST_RUNNER in main/settings.py).
+
+Includes:
+- QueryBudgetTestRunner: Django's test runner, with the query budgets of the
+  views enforced (see main.queries).
+"""
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """
+    DiscoverRunner failing a test when a page it requests runs more queries
+    than the `query_budget` of its view.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._enforce_budgets = override_settings(QUERY_BUDGETS_ENFORCED=True)
+        self._enforce_budgets.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._enforce_budgets.disable()
+        super().teardown_test_environment(**kwargs)
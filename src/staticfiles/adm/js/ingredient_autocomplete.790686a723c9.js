@@ -0,0 +1,64 @@
+// Ingredient picker for the cocktail forms.
+// Typing into the search box queries the ingredient search endpoint and lists
+// matching ingredients; clicking a result adds it as a checked checkbox.
+// Unchecking a checkbox removes the ingredient from the cocktail on save.
+
+document.addEventListener('DOMContentLoaded', function() {
+  document.querySelectorAll('.ingredient-autocomplete').forEach(function(picker) {
+    const grid = picker.querySelector('.ingredients-grid');
+    const search = picker.querySelector('.ingredient-search');
+    const results = picker.querySelector('.ingredient-results');
+    let timer = null;
+
+    function selectedValues() {
+      return Array.from(grid.querySelectorAll('input[type=checkbox]')).map(function(input) {
+        return input.value;
+      });
+    }
+
+    function addIngredient(ingredient) {
+      const label = document.createElement('label');
+      const input = document.createElement('input');
+      label.className = 'ingredient-item';
+      input.type = 'checkbox';
+      input.name = picker.dataset.name;
+      input.value = ingredient.id;
+      input.checked = true;
+      label.appendChild(input);
+      label.appendChild(document.createTextNode(' ' + ingredient.name));
+      grid.appendChild(label);
+    }
+
+    function showResults(ingredients) {
+      const selected = selectedValues();
+      results.innerHTML = '';
+      ingredients.forEach(function(ingredient) {
+        if (selected.includes(String(ingredient.id))) {
+          return;
+        }
+        const item = document.createElement('li');
+        item.textContent = ingredient.name;
+        item.addEventListener('click', function() {
+          addIngredient(ingredient);
+          results.innerHTML = '';
+          search.value = '';
+        });
+        results.appendChild(item);
+      });
+    }
+
+    search.addEventListener('input', function() {
+      clearTimeout(timer);
+      const query = search.value.trim();
+      if (!query) {
+        results.innerHTML = '';
+        return;
+      }
+      timer = setTimeout(function() {
+        fetch(picker.dataset.searchUrl + '?q=' + encodeURIComponent(query))
+          .then(function(response) { return response.json(); })
+          .then(function(data) { showResults(data.results); });
+      }, 200);
+    });
+  });
+});
@@ -0,0 +1,99 @@
+/*
+ * Live menu updates: applies the events of the menu event stream
+ * (bar.live.MenuEventsView) to the menu on the page, so menu boards
+ * never need a full reload.
+ *
+ * The menu root carries data-live-menu (section name) and data-live-url.
+ * Items are elements with data-item-id; their data-field children show
+ * the item fields. New items are cloned from an item already on the page
+ * and inserted into the data-live-group container of their group; a menu
+ * without any item is reloaded instead.
+ */
+(function () {
+    'use strict';
+
+    var root = document.querySelector('[data-live-menu]');
+    if (!root || !window.EventSource) {
+        return;
+    }
+    var section = root.dataset.liveMenu;
+
+    function findItem(id) {
+        return root.querySelector('[data-item-id="' + id + '"]');
+    }
+
+    function findGroup(name) {
+        var groups = root.querySelectorAll('[data-live-group]');
+        for (var i = 0; i < groups.length; i++) {
+            if (groups[i].dataset.liveGroup === (name === null ? '' : String(name))) {
+                return groups[i];
+            }
+        }
+        return null;
+    }
+
+    function fill(node, item) {
+        node.dataset.itemId = item.id;
+        if (node.dataset.hrefField) {
+            node.href = item[node.dataset.hrefField];
+        }
+        node.querySelectorAll('[data-field]').forEach(function (slot) {
+            slot.textContent = item[slot.dataset.field];
+        });
+    }
+
+    function updateEmpty(group) {
+        var empty = group && group.querySelector('[data-live-empty]');
+        if (empty) {
+            empty.hidden = group.querySelector('[data-item-id]') !== null;
+        }
+    }
+
+    function apply(event) {
+        if (event.type === 'reload') {
+            window.location.reload();
+            return;
+        }
+        var node = findItem(event.id);
+        if (event.type === 'removed') {
+            if (node) {
+                var group = node.parentNode;
+                node.remove();
+                updateEmpty(group);
+            }
+        } else if (event.type === 'changed') {
+            if (node) {
+                fill(node, event.item);
+            }
+        } else if (event.type === 'added') {
+            var target = findGroup(event.group);
+            var model = root.querySelector('[data-item-id]');
+            if (!target || !model) {
+                window.location.reload();
+                return;
+            }
+            var fresh = model.cloneNode(true);
+            if (node) {
+                var previous = node.parentNode;
+                node.remove();
+                updateEmpty(previous);
+            }
+            fill(fresh, event.item);
+            var before = event.before === null ? null : findItem(event.before);
+            if (before && before.parentNode === target) {
+                target.insertBefore(fresh, before);
+            } else {
+                target.insertBefore(fresh, target.querySelector('[data-live-empty]'));
+            }
+            updateEmpty(target);
+        }
+    }
+
+    var source = new EventSource(root.dataset.liveUrl);
+    source.onmessage = function (message) {
+        var event = JSON.parse(message.data);
+        if (event.section === section || (event.type === 'reload' && event.section === null)) {
+            apply(event);
+        }
+    };
+})();